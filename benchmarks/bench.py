@@ -0,0 +1,290 @@
+"""
+Benchmarks of the client against a local stand-in server, see pymediaflux.standin.
+
+The server runs in a child process so that it does not compete with the client for the GIL or
+show up in its memory use.  Each benchmark is timed over several repeats, keeping the best,
+then run once more under tracemalloc for the peak of the Python heap.  tracemalloc does not see
+memory allocated by libxml2, so each benchmark is also run once in a fresh process for its peak
+resident set size.  Results are written as JSON so that runs on different commits can be
+compared with --compare.
+
+    python -m benchmarks.bench --size 2000 --depth 2 --output before.json
+    python -m benchmarks.bench --size 2000 --depth 2 --compare before.json
+"""
+
+import functools
+import gc
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+import click
+from lxml import etree
+
+from pymediaflux import metrics, orm
+from pymediaflux.standin import StandIn
+from pymediaflux.xml import ASSET_SCHEMA, etree_to_dict, iter_dicts
+
+# A benchmark returns the number of items it processed
+Benchmark = Callable[[], int]
+
+
+def serve(conn, size: int, depth: int, fanout: int, latency: float) -> None:
+    """Runs a populated stand-in server until told to stop, in the child process"""
+    with StandIn(latency) as server:
+        root = server.populate(size, depth, fanout)
+        conn.send((server.url, root))
+        conn.recv()
+
+
+def benchmarks(root: str, size: int) -> dict[str, Benchmark]:
+    """The benchmarks, by name"""
+    collection = f"asset in collection {root}"
+
+    @functools.cache
+    def captured() -> tuple[bytes, "etree._Element"]:
+        """A get-meta response for the offline parsing benchmarks, fetched when first needed"""
+        args = [("where", collection), ("action", "get-meta"), ("size", size)]
+        response = orm.Request.send(orm.Request.build_request("asset.query", args)).content
+        return response, orm.Request.parse_xml(response)
+
+    def query() -> int:
+        return sum(1 for _ in orm.Asset.query_iter(collection, page_size=1000))
+
+    def query_lookahead() -> int:
+        return sum(1 for _ in orm.Asset.query_iter(collection, page_size=1000, lookahead=True))
+
+    def get_assets() -> int:
+        orm.Request.cache.clear()
+        return sum(1 for _ in orm.Collection(root).get_assets())
+
+    def get_assets_prefetch() -> int:
+        orm.Request.cache.clear()
+        return sum(1 for _ in orm.Collection(root).get_assets(prefetch=4))
+
+    def get_assets_fields() -> int:
+        return sum(1 for _ in orm.Collection(root).get_assets(fields=["name", "size", "mimetype"]))
+
+    def assets_all() -> int:
+        orm.Request.cache.clear()
+        return sum(1 for _ in orm.Collection(root).assets_all)
+
+    def parse() -> int:
+        return len(orm.Request.parse_xml(captured()[0]))
+
+    def parse_iter() -> int:
+        return sum(1 for _ in orm.Request.iter_xml(io.BytesIO(captured()[0])))
+
+    def to_dict() -> int:
+        return len(etree_to_dict(captured()[1])["asset"])
+
+    def to_dict_schema() -> int:
+        return len(etree_to_dict(captured()[1], ASSET_SCHEMA)["asset"])
+
+    def dicts_iter() -> int:
+        return sum(1 for _ in iter_dicts(captured()[0], schema=ASSET_SCHEMA))
+
+    return {
+        "query": query,
+        "query_lookahead": query_lookahead,
+        "get_assets": get_assets,
+        "get_assets_prefetch": get_assets_prefetch,
+        "get_assets_fields": get_assets_fields,
+        "assets_all": assets_all,
+        "parse": parse,
+        "parse_iter": parse_iter,
+        "etree_to_dict": to_dict,
+        "etree_to_dict_schema": to_dict_schema,
+        "iter_dicts": dicts_iter,
+    }
+
+
+def measure(fn: Benchmark, repeat: int) -> dict:
+    """Best time of repeat runs, then the peak Python heap and service calls of one more"""
+    best = float("inf")
+    items = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        items = fn()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with metrics.scope() as calls:
+            fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    summary = calls.to_dict()
+    return {
+        "items": items,
+        "seconds": best,
+        "items_per_second": items / best if best else None,
+        "python_peak_bytes": peak,
+        "calls": sum(s["calls"] for s in summary.values()),
+        "response_bytes": sum(s["response_bytes"] for s in summary.values()),
+    }
+
+
+def max_rss() -> int:
+    """
+    Peak resident set size of this process in bytes.
+
+    Linux carries ru_maxrss across exec, so a spawned process would report the peak of the
+    process it was forked from.  VmHWM is the peak of its own memory, so it is used when there.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, others KiB
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def measure_rss(conn, name: str, url: str, root: str, size: int) -> None:
+    """
+    Runs one benchmark in a fresh process, sending back its peak RSS and the growth of that over
+    the interpreter with the modules loaded.  The growth includes any data the benchmark fetches.
+    """
+    orm.Request.url = url
+    orm.Request.headers = {"Content-Type": "application/xml"}
+    fn = benchmarks(root, size)[name]
+    gc.collect()
+    before = max_rss()
+    fn()
+    peak = max_rss()
+    conn.send({"peak_rss_bytes": peak, "rss_growth_bytes": peak - before})
+
+
+def measure_process(name: str, url: str, root: str, size: int) -> dict:
+    """Peak RSS of a benchmark run in a spawned process, so no earlier run has raised it"""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(target=measure_rss, args=(child, name, url, root, size))
+    process.start()
+    try:
+        return parent.recv()
+    finally:
+        process.join(10)
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    size: int = 1000,
+    depth: int = 1,
+    fanout: int = 2,
+    latency: float = 0.0,
+    repeat: int = 3,
+    only: Optional[list[str]] = None,
+) -> dict:
+    """
+    Runs the benchmarks against a fresh stand-in server.
+
+    Args:
+        size (int): Assets in every collection of the synthetic tree.
+        depth (int): Levels of sub-collections below the root.
+        fanout (int): Sub-collections in every collection above the last level.
+        latency (float): Seconds the server waits before answering each call.
+        repeat (int): Timed runs of each benchmark, the best is kept.
+        only (list): Names of the benchmarks to run, all by default.
+
+    Returns:
+        dict: The configuration and environment, and the results by benchmark name.
+    """
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(child, size, depth, fanout, latency), daemon=True)
+    server.start()
+    url, headers = orm.Request.url, orm.Request.headers
+    try:
+        orm.Request.url, root = parent.recv()
+        orm.Request.headers = {"Content-Type": "application/xml"}
+        results = {}
+        for name, fn in benchmarks(root, size).items():
+            if only and name not in only:
+                continue
+            results[name] = measure(fn, repeat)
+            results[name].update(measure_process(name, orm.Request.url, root, size))
+            click.echo(f"{name:24} {results[name]['items_per_second']:12.0f} items/s", err=True)
+    finally:
+        parent.send("stop")
+        server.join(10)
+        orm.Request.url, orm.Request.headers = url, headers
+
+    return {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "lxml": ".".join(map(str, etree.LXML_VERSION)),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"size": size, "depth": depth, "fanout": fanout, "latency": latency, "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """Lines comparing the throughput and peak RSS of the benchmarks in both runs"""
+    lines = [f"{'benchmark':24} {'items/s':>12} {'change':>8} {'RSS KiB':>10} {'change':>8}"]
+    if old.get("config") != new.get("config"):
+        lines.insert(0, f"Warning: configurations differ, {old.get('config')} and {new.get('config')}")
+    for name, result in new["results"].items():
+        before = old.get("results", {}).get(name)
+        speed = result["items_per_second"] or 0
+        line = f"{name:24} {speed:12.0f}"
+        if before:
+            line += f" {speed / before['items_per_second'] - 1:+8.1%}" if before["items_per_second"] else f" {'':>8}"
+            line += f" {result['peak_rss_bytes'] / 1024:10.0f}"
+            # Runs saved before RSS was measured have no figure to compare with
+            if before.get("peak_rss_bytes"):
+                line += f" {result['peak_rss_bytes'] / before['peak_rss_bytes'] - 1:+8.1%}"
+        else:
+            line += f" {'new':>8} {result['peak_rss_bytes'] / 1024:10.0f}"
+        lines.append(line)
+    return lines
+
+
+@click.command()
+@click.option("--size", type=int, default=1000, help="Assets in every collection")
+@click.option("--depth", type=int, default=1, help="Levels of sub-collections below the root")
+@click.option("--fanout", type=int, default=2, help="Sub-collections in every collection")
+@click.option("--latency", type=float, default=0.0, help="Seconds the server waits before each answer")
+@click.option("--repeat", type=int, default=3, help="Timed runs of each benchmark")
+@click.option("--only", multiple=True, help="Run only this benchmark, may be repeated")
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="Write the results as JSON to this file")
+@click.option("--compare", "baseline", type=click.File("r"), default=None, help="Compare with the results in this file")
+def main(size, depth, fanout, latency, repeat, only, output, baseline) -> None:
+    """Benchmarks queries, collection walks and parsing against a local stand-in server"""
+    results = run(size, depth, fanout, latency, repeat, list(only))
+    if output is None:
+        json.dump(results, sys.stdout, indent=2)
+        click.echo()
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        for line in compare(json.load(baseline), results):
+            click.echo(line, err=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from lxml import etree
+import os
+from typing import AsyncGenerator, Optional, Union, cast
+import weakref
+
+from . import metrics, orm
+
+
+class AsyncRequest(orm.Request):
+    """
+    Asyncio flavour of Request.
+
+    Calls are built and parsed exactly as in the synchronous API, and sent on the pooled
+    per-thread sessions from a dedicated executor.  A semaphore per event loop bounds the
+    number of calls in flight.
+    """
+
+    concurrency = 100
+
+    _async_executor: Optional[ThreadPoolExecutor] = None
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    @classmethod
+    def configure_async(cls, concurrency: int) -> None:
+        """Sets the number of calls allowed in flight at once."""
+        if AsyncRequest._async_executor is not None:
+            AsyncRequest._async_executor.shutdown(wait=False)
+            AsyncRequest._async_executor = None
+        AsyncRequest.concurrency = concurrency
+        AsyncRequest._semaphores = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def async_executor(cls) -> ThreadPoolExecutor:
+        """The threads apost sends calls on, separate from Request.executor()"""
+        if AsyncRequest._async_executor is None:
+            AsyncRequest._async_executor = ThreadPoolExecutor(
+                max_workers=AsyncRequest.concurrency, thread_name_prefix="mediaflux-async"
+            )
+        return AsyncRequest._async_executor
+
+    @classmethod
+    def semaphore(cls) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = AsyncRequest._semaphores.get(loop)
+        if sem is None:
+            sem = AsyncRequest._semaphores[loop] = asyncio.Semaphore(AsyncRequest.concurrency)
+        return sem
+
+    @classmethod
+    async def apost(
+        cls,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+    ) -> "etree._Element":
+        """Async version of Request.post"""
+        payload = cls.build_request(name, args, xml)
+        with metrics.start(name, payload) as call:
+            async with cls.semaphore():
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(cls.async_executor(), cls.send, payload, False, name)
+            return call.parse(cls.parse_response, payload, call.received(response))
+
+
+class AsyncAsset(AsyncRequest, orm.Asset):
+    """
+    Asyncio flavour of Asset.
+
+    The coroutines are named after the synchronous methods with an "a" prefix, so the methods
+    inherited from Asset keep working as they do there.
+    """
+
+    @classmethod
+    async def aquery_name(cls, name: str) -> Union["AsyncAsset", "AsyncCollection"]:
+        """Async version of Asset.query_name"""
+        rv = await cls.apost("asset.query", [("where", f"name = '{name}'"), ("action", "get-meta")])
+        asset = sorted(
+            rv.xpath("./asset"),
+            key=lambda obj: int(obj.xpath("./ctime/@millisec")[0]),
+        )[-1]
+        return cast(Union[AsyncAsset, AsyncCollection], cls.from_result(asset))
+
+    @classmethod
+    async def aquery(cls, query: str) -> list[Union["AsyncAsset", "AsyncCollection"]]:
+        """Async version of Asset.query"""
+        qr = await cls.apost("asset.query", [("where", query), ("action", "get-meta")])
+        return [cast(Union[AsyncAsset, AsyncCollection], cls.from_result(asset)) for asset in qr.xpath("./asset")]
+
+    async def adata(self) -> "etree._Element":
+        """Async version of the data property"""
+        if self._data is None:
+            self._data = orm.Request.cache.get(self.cache_key)
+        if self._data is None:
+            r = await self.apost("asset.get", [("id", self.id)])
+            self._data = None if r is None else r.getchildren()[0]
+            orm.Request.cache.put(self.cache_key, self._data)
+        return cast(etree._Element, self._data)
+
+
+class AsyncCollection(AsyncAsset, orm.Collection):
+    """
+    Asyncio flavour of Collection, with aget_assets to stream the members on the event loop.
+    The synchronous get_assets, iter_assets and walk are inherited unchanged.
+    """
+
+    # Number of member pages aget_assets requests ahead of the one being consumed
+    aprefetch = 4
+
+    async def acount(self, get_all: bool = False) -> int:
+        """Async version of the count and count_all properties"""
+        args: list[tuple] = [("id", self.id)]
+        if get_all:
+            args.append(("include-subcollections", "true"))
+        rv = await self.apost("asset.collection.members.count", args)
+        return int(rv.xpath("./count/text()")[0])
+
+    async def aget_batch(self, ids: list[str], on_error: orm.ErrorCallback) -> list[orm.Asset]:
+        """Async version of Collection.get_batch"""
+        cached: dict[str, orm.Asset] = {}
+        for id in ids:
+            data = orm.Request.cache.get(("asset", id))
+            if data is not None:
+                cached[id] = AsyncAsset.from_xml(data)
+        failed = set()
+
+        def report(id: str, error: Exception) -> None:
+            failed.add(id)
+            on_error(id, error)
+
+        fetched = {a.id: a for a in await self.afetch_batch([id for id in ids if id not in cached], report)}
+        rv = []
+        for id in ids:
+            asset = cached[id] if id in cached else fetched.get(id)
+            if asset is not None:
+                rv.append(asset)
+            elif id not in failed:
+                on_error(id, ValueError(f"Asset {id} is missing from the asset.get reply"))
+        return rv
+
+    async def afetch_batch(self, ids: list[str], on_error: orm.ErrorCallback) -> list[orm.Asset]:
+        """Async version of Collection.fetch_batch, bisecting failing batches concurrently"""
+        if len(ids) == 0:
+            return []
+        try:
+            assets = await self.apost("asset.get", [("id", id) for id in ids])
+        except ValueError as e:
+            if len(ids) == 1:
+                on_error(ids[0], e)
+                return []
+            mid = len(ids) // 2
+            left, right = await asyncio.gather(
+                self.afetch_batch(ids[:mid], on_error), self.afetch_batch(ids[mid:], on_error)
+            )
+            return left + right
+        return [AsyncAsset.from_xml(a) for a in assets.getchildren()]
+
+    async def aget_page(
+        self, ix: int, get_all: bool = False, on_error: Optional[orm.ErrorCallback] = None
+    ) -> list[orm.Asset]:
+        """Async version of Collection.get_page"""
+        rv = await self.apost("asset.collection.members", self.page_args(ix, get_all))
+        ids = rv.xpath("./id/text()")
+        if len(ids) == 0:
+            return []
+        return await self.aget_batch(ids, self.record_error if on_error is None else on_error)
+
+    async def aget_assets(
+        self, get_all=False, on_error: Optional[orm.ErrorCallback] = None
+    ) -> AsyncGenerator[orm.Asset, None]:
+        """Async version of Collection.get_assets, requesting aprefetch pages ahead"""
+        offsets = range(0, await self.acount(get_all), 1000)
+        pending: list[asyncio.Task] = []
+        try:
+            for ix in offsets:
+                pending.append(asyncio.ensure_future(self.aget_page(ix, get_all, on_error)))
+                if len(pending) <= self.aprefetch:
+                    continue
+                for a in await pending.pop(0):
+                    yield a
+            while pending:
+                for a in await pending.pop(0):
+                    yield a
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+AsyncAsset.collection_class = AsyncCollection
+
+
+def after_fork() -> None:
+    # As orm.after_fork, a forked process starts its own threads
+    AsyncRequest._async_executor = None
+    AsyncRequest._semaphores = weakref.WeakKeyDictionary()
+
+
+os.register_at_fork(after_in_child=after_fork)
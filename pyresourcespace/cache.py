@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from lxml import etree
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Iterable, Optional
+
+
+class MetadataCache:
+    """
+    Thread-safe LRU cache of metadata with optional expiry.
+
+    Request.cache holds the process-wide instance used as an identity map: data properties and
+    single lookups store elements under keys such as ("asset", id), so objects for the same
+    asset share one metadata element and repeated lookups make no service calls.  Bulk fetchers
+    look elements up but do not store what they stream, which would evict everything else.
+    """
+
+    def __init__(self, maxsize: int = 100000, ttl: Optional[float] = 300) -> None:
+        """
+        Args:
+            maxsize (int): Maximum number of entries, least recently used entries are evicted
+                first.  0 disables caching.
+            ttl (float): Seconds an entry stays valid, None never expires entries.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, count: bool = True) -> Any:
+        """Returns the entry for key, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0 or value is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class DiskCache:
+    """
+    Persistent cache of asset metadata shared between runs and processes.
+
+    Each asset's XML is stored in SQLite along with its stime, which Mediaflux bumps on every
+    change, so a cached document can be validated by fetching only the stime.
+
+    It is used by collection member fetches and Asset.query.  Single lookups, Asset.data and
+    Asset.query_name, only go through the in-memory MetadataCache.
+    """
+
+    def __init__(self, path: str, timeout: float = 30) -> None:
+        """
+        Args:
+            path (str): The SQLite database file, created if missing.
+            timeout (float): Seconds to wait for another process holding the database lock.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS assets (id TEXT PRIMARY KEY, stime TEXT, xml BLOB)")
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, a forked process opens its own"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, ids: list[str]) -> dict[str, tuple[str, bytes]]:
+        """Returns {id: (stime, xml)} for the ids present in the cache"""
+        rv: dict[str, tuple[str, bytes]] = {}
+        conn = self.connection()
+        # Stay well under SQLite's bound parameter limit
+        for ix in range(0, len(ids), 500):
+            chunk = ids[ix : ix + 500]
+            rows = conn.execute(
+                f"SELECT id, stime, xml FROM assets WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for id, stime, xml in rows:
+                rv[id] = (stime, xml)
+        return rv
+
+    def put_many(self, assets: Iterable["etree._Element"]) -> None:
+        """Stores <asset> elements, keyed by their id and stime"""
+        rows = [(a.get("id"), a.findtext("stime"), etree.tostring(a)) for a in assets]
+        if len(rows) == 0:
+            return
+        with self.connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO assets (id, stime, xml) VALUES (?, ?, ?)", rows)
+
+    def invalidate(self, id: str) -> None:
+        with self.connection() as conn:
+            conn.execute("DELETE FROM assets WHERE id = ?", (id,))
+
+    def clear(self) -> None:
+        with self.connection() as conn:
+            conn.execute("DELETE FROM assets")
@@ -0,0 +1,36 @@
+import os
+from typing import Optional
+
+import click
+from dotenv import load_dotenv
+
+from . import orm
+
+
+def connect(host: Optional[str] = None, port: Optional[str] = None, token: Optional[str] = None) -> None:
+    """
+    Points Request at a server, taking anything not given from API_HOST, API_PORT and
+    API_TOKEN in the environment or a .env file.
+    """
+    # Load environment variables from .env file
+    load_dotenv()
+
+    host = host or os.getenv("API_HOST")
+    port = port or os.getenv("API_PORT")
+    token = token or os.getenv("API_TOKEN")
+
+    # Validate required parameters
+    if not host or not token:
+        raise click.UsageError("API_HOST and API_TOKEN are required.")
+
+    # Construct the base URL
+    if port:
+        orm.Request.url = f"http://{host}:{port}/__mflux_svc__"
+    else:
+        orm.Request.url = f"http://{host}/__mflux_svc__"
+
+    orm.Request.headers = {
+        "Content-Type": "application/xml",
+        "mediaflux.api.token": f"{token}",
+        "mediaflux.api.token.app": "api",
+    }
@@ -0,0 +1,200 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+from lxml import etree
+import os
+import sys
+import threading
+from typing import Callable, Iterable, Optional, Union, cast
+
+import click
+
+from . import cli, orm
+from .util import crc32_file
+
+
+class IngestItem:
+    """A local file to ingest, with the name and metadata of the asset to create"""
+
+    __slots__ = ("path", "name", "meta")
+
+    def __init__(self, path: str, name: Optional[str] = None, meta: Optional["etree._Element"] = None) -> None:
+        """
+        Args:
+            path (str): The local file.
+            name (str): Name of the asset, defaults to the file name.
+            meta (Element): A <meta> element passed to asset.create.
+        """
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.meta = meta
+
+
+class IngestResult:
+    """Outcome for one item, status is one of "created", "skipped" or "failed"."""
+
+    __slots__ = ("path", "status", "id", "error")
+
+    def __init__(self, path: str, status: str, id: Optional[str] = None, error: Optional[str] = None) -> None:
+        self.path = path
+        self.status = status
+        self.id = id
+        self.error = error
+
+    def to_json(self) -> str:
+        return json.dumps({"path": self.path, "status": self.status, "id": self.id, "error": self.error})
+
+
+class IngestReport:
+    def __init__(self) -> None:
+        self.created: list[IngestResult] = []
+        self.skipped: list[IngestResult] = []
+        self.failed: list[IngestResult] = []
+
+    def add(self, result: IngestResult) -> None:
+        getattr(self, result.status).append(result)
+
+    @property
+    def ok(self) -> bool:
+        return len(self.failed) == 0
+
+    def summary(self) -> str:
+        return f"{len(self.created)} created, {len(self.skipped)} skipped, {len(self.failed)} failed"
+
+
+class Journal:
+    """
+    Append-only JSON lines record of finished items, so an interrupted ingest can be re-run and
+    carry on where it stopped.  Failed items are recorded too but are retried on the next run.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def done(self) -> dict[str, IngestResult]:
+        """Returns the items already created or skipped, keyed by path"""
+        rv: dict[str, IngestResult] = {}
+        if not os.path.exists(self.path):
+            return rv
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short when the previous run was killed
+                    continue
+                if entry["status"] in ("created", "skipped"):
+                    rv[entry["path"]] = IngestResult(entry["path"], "skipped", entry["id"])
+        return rv
+
+    def record(self, result: IngestResult) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(result.to_json() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def existing_assets(collection: orm.Collection) -> dict[str, tuple[Optional[str], Optional[int]]]:
+    """Returns {name: (id, CRC32)} for the assets directly in a collection"""
+    rv: dict[str, tuple[Optional[str], Optional[int]]] = {}
+    for record in collection.get_assets(fields=["is_collection", "name", "csum16"]):
+        if not record.is_collection and record.name:
+            csum16 = record.checksum(16)
+            rv[record.name] = (record.id, int(csum16, 16) if csum16 else None)
+    return rv
+
+
+def ingest_item(
+    item: IngestItem,
+    collection: orm.Collection,
+    existing: dict[str, tuple[Optional[str], Optional[int]]],
+) -> IngestResult:
+    """Creates the asset for one item unless an asset of the same name and checksum exists"""
+    try:
+        found = existing.get(item.name)
+        if found is not None and found[1] == crc32_file(item.path):
+            return IngestResult(item.path, "skipped", found[0])
+        asset = orm.Asset.create(item.path, cast(str, collection.id), item.name, item.meta)
+        return IngestResult(item.path, "created", asset.id)
+    except (ValueError, OSError) as e:
+        # OSError covers unreadable files and requests' connection and HTTP errors
+        return IngestResult(item.path, "failed", error=str(e))
+
+
+def ingest(
+    items: Iterable[Union[str, IngestItem]],
+    collection: orm.Collection,
+    workers: int = 8,
+    journal: Optional[str] = None,
+    skip_existing: bool = True,
+    on_result: Optional[Callable[[IngestResult], None]] = None,
+) -> IngestReport:
+    """
+    Uploads local files as new assets in a collection.
+
+    Uploads run on a bounded thread pool, each streaming its file from disk as the body of an
+    asset.create call.  Items are consumed lazily so very large ingests hold only a window of
+    pending uploads in memory.
+
+    Args:
+        items: Paths or IngestItems.
+        collection (Collection): The collection the assets are created in.
+        workers (int): Number of uploads in flight at once.
+        journal (str): Path of a progress journal, items it records as done are skipped.
+        skip_existing (bool): Skip files whose name and CRC32 match an asset already in the
+            collection.
+        on_result (Callable): Called with each result as it completes.
+
+    Returns:
+        An IngestReport.
+    """
+    report = IngestReport()
+    log = None if journal is None else Journal(journal)
+    done = {} if log is None else log.done()
+    existing = existing_assets(collection) if skip_existing else {}
+
+    def finish(result: IngestResult) -> None:
+        report.add(result)
+        if log is not None and result.path not in done:
+            log.record(result)
+        if on_result is not None:
+            on_result(result)
+
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mediaflux-ingest") as pool:
+        for item in items:
+            if not isinstance(item, IngestItem):
+                item = IngestItem(item)
+            if item.path in done:
+                finish(done[item.path])
+                continue
+            pending.append(pool.submit(ingest_item, item, collection, existing))
+            if len(pending) >= workers * 2:
+                finish(pending.popleft().result())
+        while pending:
+            finish(pending.popleft().result())
+    return report
+
+
+@click.command()
+@click.argument("collection")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", type=int, default=8, help="Uploads in flight at once")
+@click.option("--journal", type=click.Path(dir_okay=False), default=None, help="Progress journal for resuming")
+@click.option("--no-skip", is_flag=True, help="Upload files even if an identical asset exists")
+def main(collection: str, paths: tuple[str, ...], workers: int, journal: Optional[str], no_skip: bool) -> None:
+    """Uploads PATHS as new assets in COLLECTION"""
+    cli.connect()
+
+    def echo(result: IngestResult) -> None:
+        if result.status == "failed":
+            click.echo(f"FAILED: {result.path}: {result.error}", err=True)
+
+    report = ingest(paths, orm.Collection(collection), workers, journal, not no_skip, echo)
+    click.echo(report.summary())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+from bisect import bisect_left
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Callable, Generator, Iterable, Optional, Protocol
+
+# Upper bounds in seconds of the latency histogram buckets, the last one catches the rest
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+class Call:
+    """
+    Measurements of one service call, filled in as it runs and handed to the sinks when done.
+
+    seconds is the time until the response arrived, including retries.  parse_seconds is the
+    time spent parsing it, which for streamed calls includes reading the body as it is parsed.
+    response_bytes counts the bytes read off the wire, so compressed responses count as sent.
+    """
+
+    __slots__ = ("name", "request_bytes", "response_bytes", "seconds", "parse_seconds", "error", "_start", "_response", "_sinks")
+
+    def __init__(self, name: str, request_bytes: int, sinks: tuple) -> None:
+        self.name = name
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.seconds: Optional[float] = None
+        self.parse_seconds = 0.0
+        # Name of the exception type the call failed with
+        self.error: Optional[str] = None
+        self._start = 0.0
+        self._response: Any = None
+        self._sinks = sinks
+
+    def __enter__(self) -> "Call":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self._start
+        # A streamed call abandoned by its consumer did not fail
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.error = exc_type.__name__
+        self.response_bytes = response_bytes(self._response)
+        self._response = None
+        for sink in self._sinks:
+            sink.record(self)
+
+    def received(self, response):
+        """Notes the arrival of the response, returning it"""
+        self.seconds = time.perf_counter() - self._start
+        self._response = response
+        return response
+
+    def parse(self, fn: Callable, *args):
+        """Calls the parser fn, timing it"""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.parse_seconds += time.perf_counter() - start
+
+    def timed(self, items: Iterable) -> Generator:
+        """Yields from a streaming parser, timing it but not the consumer"""
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.parse_seconds += time.perf_counter() - start
+            yield item
+
+
+class NoCall:
+    """Stands in for Call when nothing is recording, doing nothing"""
+
+    def __enter__(self) -> "NoCall":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    def received(self, response):
+        return response
+
+    def parse(self, fn: Callable, *args):
+        return fn(*args)
+
+    def timed(self, items: Iterable) -> Iterable:
+        return items
+
+
+NO_CALL = NoCall()
+
+
+def response_bytes(response) -> int:
+    if response is None:
+        return 0
+    raw = getattr(response, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        return raw.tell()
+    return len(response.content or b"")
+
+
+class ServiceStats:
+    """Totals and a latency histogram of the calls to one service"""
+
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "parse_seconds", "request_bytes", "response_bytes", "histogram")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.histogram = [0] * len(BUCKETS)
+
+    def record(self, call: Call) -> None:
+        seconds = call.seconds or 0.0
+        self.calls += 1
+        self.errors += call.error is not None
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.parse_seconds += call.parse_seconds
+        self.request_bytes += call.request_bytes
+        self.response_bytes += call.response_bytes
+        self.histogram[bisect_left(BUCKETS, seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the histogram bucket holding the p (0 to 1) percentile"""
+        rank = p * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS, self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max_seconds)
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "parse_seconds": self.parse_seconds,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "histogram": {str(bound): count for bound, count in zip(BUCKETS, self.histogram) if count},
+        }
+
+
+class Sink(Protocol):
+    """Receives every finished call"""
+
+    def record(self, call: Call) -> None: ...
+
+
+class Summary(Sink):
+    """Keeps ServiceStats per service name in memory"""
+
+    def __init__(self) -> None:
+        self.services: dict[str, ServiceStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, call: Call) -> None:
+        with self._lock:
+            stats = self.services.get(call.name)
+            if stats is None:
+                stats = self.services[call.name] = ServiceStats()
+            stats.record(call)
+
+    def __getitem__(self, name: str) -> ServiceStats:
+        return self.services[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.services.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self.services.items())}
+
+    def report(self) -> str:
+        """A table of the services, slowest in total first"""
+        lines = [f"{'service':40} {'calls':>7} {'errors':>6} {'total s':>9} {'p50 ms':>8} {'p99 ms':>8} {'parse s':>8} {'KiB out':>9} {'KiB in':>9}"]
+        with self._lock:
+            services = sorted(self.services.items(), key=lambda item: -item[1].seconds)
+            for name, s in services:
+                lines.append(
+                    f"{name:40} {s.calls:7} {s.errors:6} {s.seconds:9.3f} {s.percentile(0.5) * 1000:8.1f} "
+                    f"{s.percentile(0.99) * 1000:8.1f} {s.parse_seconds:8.3f} {s.request_bytes / 1024:9.1f} "
+                    f"{s.response_bytes / 1024:9.1f}"
+                )
+        return "\n".join(lines)
+
+
+class LogSink(Sink):
+    """Logs a line per call"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG) -> None:
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self.level = level
+
+    def record(self, call: Call) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                "%s %.1f ms parse %.1f ms out %d in %d bytes%s",
+                call.name,
+                (call.seconds or 0.0) * 1000,
+                call.parse_seconds * 1000,
+                call.request_bytes,
+                call.response_bytes,
+                "" if call.error is None else f" failed {call.error}",
+            )
+
+
+class CallbackSink(Sink):
+    """Passes each call to a function, which must not keep it"""
+
+    def __init__(self, fn: Callable[[Call], None]) -> None:
+        self.fn = fn
+
+    def record(self, call: Call) -> None:
+        self.fn(call)
+
+
+# Sinks receiving every call in the process, replaced rather than changed so calls can read
+# it without a lock
+_sinks: tuple = ()
+_sinks_lock = threading.Lock()
+# Summaries of the scopes the current context is in, innermost last
+_scopes: contextvars.ContextVar[tuple] = contextvars.ContextVar("pymediaflux_metric_scopes", default=())
+
+
+def add_sink(sink: Sink) -> Sink:
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+    return sink
+
+
+def remove_sink(sink: Sink) -> None:
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+@contextmanager
+def scope(summary: Optional[Summary] = None) -> Generator[Summary, None, None]:
+    """
+    Collects the calls made within the block, including those made on the worker threads of
+    get_assets, walk and query, into a Summary.
+
+    Example:
+        with metrics.scope() as stats:
+            for asset in orm.Collection(id).get_assets(get_all=True):
+                ...
+        print(stats.report())
+    """
+    summary = Summary() if summary is None else summary
+    token = _scopes.set(_scopes.get() + (summary,))
+    try:
+        yield summary
+    finally:
+        _scopes.reset(token)
+
+
+def start(name: str, payload: bytes):
+    """Returns a Call to measure a service call with, or NO_CALL when nothing is recording"""
+    sinks = _sinks + _scopes.get()
+    if not sinks:
+        return NO_CALL
+    return Call(name, len(payload), sinks)
+
+
+def submit(pool: Executor, fn: Callable, *args) -> Future:
+    """Submits fn to the pool in the current context, so its calls count in the current scopes"""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
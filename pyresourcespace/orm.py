@@ -1,22 +1,244 @@
+import atexit
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
 import copy
+import functools
+import gzip
+import io
+import itertools
+import json
 from lxml import etree
+import os
 import requests
-from typing import Generator, Optional, Union, cast
-from xml.sax.saxutils import escape
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from typing import Any, Callable, Generator, Iterable, Optional, Protocol, TypeVar, Union, cast
+import urllib.parse
+import urllib3
+from urllib3.fields import format_multipart_header_param
+import uuid
+from xml.sax.saxutils import escape, quoteattr
+import zlib
+
+from . import metrics
+from .cache import DiskCache, MetadataCache
+from .policy import LatencyTracker, Policy, default_policies, find_policy
+from .transport import HTTPTransport, Transport
+from .util import MergeDict, crc32_file
+from .xml import Schema, iter_dicts
+
+# Called with the id and exception for each asset that could not be fetched
+ErrorCallback = Callable[[str, Exception], None]
+
+T = TypeVar("T")
+
+# Failures reading a streamed response, which may be retried if nothing was parsed yet
+STREAM_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError)
+
+
+def latency_key(name: str, stream: bool) -> str:
+    """Streamed calls are timed to the first byte, so their response times are kept apart"""
+    return f"{name}:stream" if stream else name
+
+
+def close_response(future: Future) -> None:
+    """Done callback closing the response of a hedged call that lost"""
+    if future.exception() is None:
+        future.result().close()
+
+# Precompiled paths for the Asset fields, shared by Asset and AssetRecord
+XPATH_CHECKSUM = etree.XPath("./content/csum[@base=$base]/text()")
+XPATH_EXTENSION = etree.XPath("./name/@ext")
+XPATH_HAS_EXIF = etree.XPath("boolean(./meta/mf-image-exif)")
+XPATH_MF_NAME = etree.XPath("./meta/mf-name/name/text()")
+XPATH_MF_SOURCE_NAME = etree.XPath("./meta/mf-source-name/name/text()")
+XPATH_MIMETYPE = etree.XPath("./content/type/text()")
+XPATH_NAME = etree.XPath("./name/text()")
+XPATH_PARENT = etree.XPath("./parent/text()")
+XPATH_SIZE = etree.XPath("./content/size/text()")
+XPATH_TYPE = etree.XPath("./type/text()")
+
+
+# asset.query action and xpath computing each metric of Asset.aggregate
+METRICS = {
+    "count": ("count", None),
+    "size": ("sum", "content/size"),
+}
+
+
+# Server side xpaths of the AssetRecord fields that can be requested with fields=[...]
+FIELD_XPATHS = {
+    "csum10": "content/csum[@base='10']",
+    "csum16": "content/csum[@base='16']",
+    "extension": "name/@ext",
+    "is_collection": "@collection",
+    "mf_name": "meta/mf-name/name",
+    "mf_source_name": "meta/mf-source-name/name",
+    "mimetype": "content/type",
+    "name": "name",
+    "parent": "parent",
+    "size": "content/size",
+    "type": "type",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def service_tags(name: str) -> tuple[bytes, bytes]:
+    """The serialised request wrapper for a service, cached as calls repeat"""
+    return (f"<request><service name={quoteattr(name)}>".encode("utf-8"), b"</service></request>")
+
+
+@functools.lru_cache(maxsize=256)
+def arg_tags(name: str) -> tuple[bytes, bytes]:
+    """The serialised open and close tags of an argument, cached as calls repeat"""
+    return (f"<{name}>".encode("utf-8"), f"</{name}>".encode("utf-8"))
+
+
+def transform_type_elements(root: "etree._Element") -> "etree._Element":
+    """
+    Modifies all <type> elements in the given XML tree, as asset.filter.create expects them:
+    - Moves <name> value to an attribute "type"
+    - Removes the <name> element
+
+    :param root: lxml.etree._Element (Root of the XML document)
+    :return: root
+    """
+    for type_elem in root.findall(".//type"):  # Find all <type> elements
+        name_elem = type_elem.find("name")  # Find the <name> element inside <type>
+        if name_elem is not None:
+            type_value = name_elem.text.strip() if name_elem.text else ""
+            type_elem.set("type", type_value)  # Set as attribute
+            type_elem.remove(name_elem)  # Remove <name> element
+
+        # Check if <type> has no remaining child elements
+        if not list(type_elem):
+            type_elem.text = None
+    return root
+
+
+def first(values: list, default=""):
+    """Returns the first result of an XPath, or default if there are none"""
+    return default if len(values) == 0 else values[0]
+
+
+def within(root: str, path: str) -> bool:
+    """Whether path names something strictly inside the directory root"""
+    root, path = os.path.abspath(root), os.path.abspath(path)
+    return path != root and os.path.commonpath([root, path]) == root
 
 
 class Request:
     url = ""
     headers: dict[str, str] = {}
 
+    # HTTP session settings, shared by every subclass.  Use configure() to change them so
+    # that sessions already open in other threads get rebuilt.
+    pool_size = 10
+    keep_alive = True
+    timeout: Optional[Union[float, tuple[float, float]]] = None
+
+    # Opt-in gzip compression of request bodies of at least compress_min_size bytes
+    compress = False
+    compress_min_size = 1024
+    compress_level = 5
+
+    # Timeout, retry and hedging policies by service name or fnmatch pattern, see set_policy
+    policies: dict[str, Policy] = default_policies()
+    # Policy of services that match no pattern: only retried if the server never saw the call
+    default_policy = Policy()
+    # Response times used to pick hedging delays
+    latency = LatencyTracker()
+    # Threads sending hedged calls
+    hedge_workers = 32
+    _hedge_executor: Optional[ThreadPoolExecutor] = None
+    # Threads shared by page prefetching, collection walks and query lookahead, see executor()
+    workers = 16
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    # Sessions opened on the threads of each pool above, closed when the pool is retired
+    _worker_sessions: dict[ThreadPoolExecutor, set[requests.Session]] = {}
+
+    # Process-wide identity map of metadata elements shared by all data properties
+    cache = MetadataCache()
+    # Optional cache of asset metadata persisted between runs, see cache.DiskCache
+    disk_cache: Optional[DiskCache] = None
+
+    # Carries service calls to the server, HTTPTransport on the sessions below by default.
+    # Set it to a transport.Recorder to record or replay calls, see transport.
+    transport: Transport
+
+    # requests.Session is not thread-safe, so each thread keeps its own
+    _local = threading.local()
+    _generation = 0
+
     @classmethod
-    def parse_xml(cls, response_xml: str) -> "etree._Element":
+    def configure(
+        cls,
+        pool_size: Optional[int] = None,
+        keep_alive: Optional[bool] = None,
+        timeout: Optional[Union[float, tuple[float, float]]] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        """
+        Changes the HTTP session settings used by all service calls.
+
+        Args:
+            pool_size (int): Number of pooled connections kept per host.
+            keep_alive (bool): Whether connections are reused between calls.
+            timeout (float or tuple): Seconds to wait for the server, or a (connect, read) pair.
+            workers (int): Number of threads shared by prefetching, walks and lookahead.  Work
+                already submitted finishes on the previous threads, whose sessions are then
+                closed.
+        """
+        if pool_size is not None:
+            Request.pool_size = pool_size
+        if keep_alive is not None:
+            Request.keep_alive = keep_alive
+        if timeout is not None:
+            Request.timeout = timeout
+        if workers is not None and workers != Request.workers:
+            Request.workers = workers
+            with Request._executor_lock:
+                if Request._executor is not None:
+                    threading.Thread(target=Request.retire, args=(Request._executor,), daemon=True).start()
+                    Request._executor = None
+        Request._generation += 1
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        """Returns the calling thread's pooled session, creating it if needed."""
+        local = Request._local
+        sess = getattr(local, "session", None)
+        if sess is None or local.generation != Request._generation:
+            sessions = getattr(local, "worker_sessions", None)
+            if sess is not None:
+                sess.close()
+                if sessions is not None:
+                    sessions.discard(sess)
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=Request.pool_size, pool_maxsize=Request.pool_size)
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            sess.headers["Accept-Encoding"] = "gzip, deflate"
+            if not Request.keep_alive:
+                sess.headers["Connection"] = "close"
+            if sessions is not None:
+                sessions.add(sess)
+            local.session = sess
+            local.generation = Request._generation
+        return sess
+
+    @classmethod
+    def parse_xml(cls, response_xml: Union[str, bytes]) -> "etree._Element":
         """
         Parses the given XML string, returning the <result> content if <reply type="result"> is found.
         Raises an exception if the <reply> type is not "result".
 
         Args:
-            response_xml (str): The XML string to parse.
+            response_xml (str or bytes): The XML to parse.
 
         Returns:
             dict: A dictionary representation of the <result> content.
@@ -24,11 +246,12 @@ class Request:
         Raises:
             ValueError: If the <reply> type is not "result".
         """
-        # Convert the XML string to bytes to handle encoding declarations
-        response_bytes = response_xml.encode("utf-8")
+        # Parse bytes so that encoding declarations are honoured
+        if isinstance(response_xml, str):
+            response_xml = response_xml.encode("utf-8")
 
         # Parse the XML response
-        root = etree.fromstring(response_bytes)
+        root = etree.fromstring(response_xml)
 
         # Find the <reply> element
         reply_element = root.find("reply")
@@ -41,7 +264,7 @@ class Request:
             m = reply_element.find("message")
             raise ValueError(f"Call failed: {'None' if m is None else m.text}")
         if reply_type != "result":
-            raise ValueError(f"Unexpected reply type: {reply_type} ({response_xml})")
+            raise ValueError(f"Unexpected reply type: {reply_type} ({response_xml.decode('utf-8', 'replace')})")
 
         # Convert the <result> element into a dictionary
         result_element = reply_element.find("result")
@@ -51,44 +274,523 @@ class Request:
         return result_element
 
     @classmethod
-    def post(
+    def build_request(
         cls,
         name: str,
         args: Optional[list[tuple]] = None,
         xml: Optional[list["etree._Element"]] = None,
-    ) -> "etree._Element":
-        argstr = ""
+    ) -> bytes:
+        """Serialises the <request> payload for a service call, escaping argument values."""
+        head, tail = service_tags(name)
+        parts = [head]
         if args is not None or xml is not None:
-            argstr = "<args>"
-            if args is not None:
-                argstr += "".join(f"<{arg[0]}>{arg[1]}</{arg[0]}>" for arg in args)
-            if xml is not None:
-                argstr += "".join(etree.tostring(x, encoding="utf-8").decode("utf-8") for x in xml)
-            argstr += "</args>"
-
-        payload = f"""
-            <request>
-                <service name="{name}">{argstr}</service>
-            </request>"""
-
-        response = requests.post(cls.url, headers=cls.headers, data=payload)
+            parts.append(b"<args>")
+            for arg in args or []:
+                open_tag, close_tag = arg_tags(arg[0])
+                parts += (open_tag, escape(str(arg[1])).encode("utf-8"), close_tag)
+            for x in xml or []:
+                parts.append(etree.tostring(x, encoding="utf-8"))
+            parts.append(b"</args>")
+        parts.append(tail)
+        return b"".join(parts)
+
+    @classmethod
+    def set_policy(cls, pattern: str, policy: Policy) -> None:
+        """
+        Sets the policy of the services matching an fnmatch pattern, replacing any policy for
+        the same pattern.  Exact names take precedence, then patterns in the order first set.
+
+        Example:
+            Request.set_policy("asset.get", Policy(timeout=(5, 60), idempotent=True, hedge_percentile=0.95))
+        """
+        Request.policies[pattern] = policy
+
+    @classmethod
+    def policy(cls, name: Optional[str]) -> Policy:
+        return find_policy(Request.policies, name, Request.default_policy)
+
+    @classmethod
+    def hedge_executor(cls) -> ThreadPoolExecutor:
+        with Request._executor_lock:
+            if Request._hedge_executor is None:
+                Request._hedge_executor = Request.worker_pool(Request.hedge_workers, "mediaflux-hedge")
+            return Request._hedge_executor
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        """
+        Returns the threads shared by page prefetching, collection walks and query lookahead,
+        Request.workers of them, so that their sessions and connections are reused from call
+        to call.  Work submitted here must not wait on other work submitted here.
+        """
+        with Request._executor_lock:
+            if Request._executor is None:
+                Request._executor = Request.worker_pool(Request.workers, "mediaflux-worker")
+            return Request._executor
+
+    @classmethod
+    def worker_pool(cls, workers: int, prefix: str) -> ThreadPoolExecutor:
+        """A pool whose threads' sessions are tracked, so that retire() can close them"""
+        sessions: set[requests.Session] = set()
+        pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=prefix, initializer=mark_worker, initargs=(sessions,)
+        )
+        Request._worker_sessions[pool] = sessions
+        return pool
+
+    @classmethod
+    def retire(cls, pool: ThreadPoolExecutor) -> None:
+        """Waits for the work submitted to a pool, then closes the sessions its threads opened"""
+        pool.shutdown(wait=True)
+        for sess in list(Request._worker_sessions.get(pool, ())):
+            sess.close()
+        # Dropped only once closed, so a pool missing here has no open sessions
+        with Request._executor_lock:
+            Request._worker_sessions.pop(pool, None)
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stops the shared worker threads, waiting for their work, and closes their sessions"""
+        with Request._executor_lock:
+            pools = [p for p in (Request._executor, Request._hedge_executor) if p is not None]
+            Request._executor = Request._hedge_executor = None
+        for pool in pools:
+            Request.retire(pool)
+
+    @classmethod
+    def send(
+        cls,
+        payload: bytes,
+        stream: bool = False,
+        name: Optional[str] = None,
+        policy: Optional[Policy] = None,
+    ) -> requests.Response:
+        """
+        Sends a payload on the calling thread's session, raising on HTTP errors.
+
+        The policy, by default that of the service name, sets the timeout, and failed attempts
+        are retried with jittered exponential backoff as far as it allows.  Calls may also be
+        hedged, see Policy, streamed calls on the time to the first byte of the response.
+        """
+        policy = cls.policy(name) if policy is None else policy
+        if policy.hedge_percentile is not None:
+            return cls.retried(policy, cls.send_hedged, payload, stream, name, policy)
+        return cls.retried(policy, cls.send_once, payload, stream, name, policy)
+
+    @classmethod
+    def retried(cls, policy: Policy, fn: Callable[..., T], *args) -> T:
+        """Calls fn(*args), retrying failed attempts with jittered exponential backoff as the policy allows"""
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                if attempt >= policy.retries or not policy.retryable(e):
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+
+    @classmethod
+    def send_once(cls, payload: bytes, stream: bool, name: Optional[str], policy: Policy) -> requests.Response:
+        headers = cls.headers
+        if Request.compress and len(payload) >= Request.compress_min_size:
+            payload = gzip.compress(payload, compresslevel=Request.compress_level)
+            headers = {**headers, "Content-Encoding": "gzip"}
+        timeout = Request.timeout if policy.timeout is None else policy.timeout
+        start = time.monotonic()
+        response = Request.transport.post(cls.url, headers, payload, timeout, stream)
+        if response.status_code >= 400:
+            response.close()
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx and 5xx)
+        if name is not None:
+            # Streamed responses return once the headers arrive, so this is the time to first byte
+            Request.latency.record(latency_key(name, stream), time.monotonic() - start)
+        return response
+
+    @classmethod
+    def send_hedged(cls, payload: bytes, stream: bool, name: Optional[str], policy: Policy) -> requests.Response:
+        """
+        Sends the call, and again if no answer arrives within the policy's percentile of recent
+        response times, returning the first successful response.  The other response of a
+        streamed call is closed when it arrives.
+        """
+        pool = cls.hedge_executor()
+        first = pool.submit(cls.send_once, payload, stream, name, policy)
+        percentile = cast(float, policy.hedge_percentile)
+        delay = None if name is None else Request.latency.percentile(latency_key(name, stream), percentile)
+        if delay is None:
+            return first.result()
+        try:
+            return first.result(timeout=max(delay, policy.hedge_min_delay))
+        except FutureTimeout:
+            pass
+
+        second = pool.submit(cls.send_once, payload, stream, name, policy)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is None:
+            for loser in done | pending:
+                loser.add_done_callback(close_response)
+            return winner.result()
+        # The first answer was a failure, so the other one decides
+        other = pending.pop() if pending else done.pop()
+        return other.result()
 
+    @classmethod
+    def parse_response(cls, payload: bytes, response: requests.Response) -> "etree._Element":
         try:
-            return cls.parse_xml(response.text)
+            return cls.parse_xml(response.content)
         except ValueError:
-            raise ValueError(f'Unexpected response from "{payload}" of "{response.text}"')
+            raise ValueError(f'Unexpected response from "{payload.decode("utf-8", "replace")}" of "{response.text}"')
+
+    @classmethod
+    def post(
+        cls,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+        policy: Optional[Policy] = None,
+    ) -> "etree._Element":
+        payload = cls.build_request(name, args, xml)
+        with metrics.start(name, payload) as call:
+            response = call.received(cls.send(payload, name=name, policy=policy))
+            return call.parse(cls.parse_response, payload, response)
+
+    @classmethod
+    def post_content(
+        cls,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+        path: str = "",
+        filename: Optional[str] = None,
+    ) -> "etree._Element":
+        """Calls a service with the file at path attached as its input, streamed from disk"""
+        payload = cls.build_request(name, args, xml)
+        body = MultipartBody(payload, path, filename)
+        with metrics.start(name, payload) as call:
+            call.request_bytes = len(body)
+            try:
+                response = Request.transport.post(
+                    cls.url,
+                    {**cls.headers, "Content-Type": body.content_type},
+                    body,
+                    cls.policy(name).timeout or Request.timeout,
+                    False,
+                )
+            finally:
+                body.close()
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx and 5xx)
+            return call.parse(cls.parse_response, payload, call.received(response))
+
+    @classmethod
+    def iter_xml(cls, source, tag: str = "asset") -> Generator["etree._Element", None, None]:
+        """
+        Incrementally parses a response, yielding each <tag> element of the <result> as soon
+        as it is complete.
+
+        Yielded elements are detached from the response document, so each one is freed once
+        the consumer drops it and memory use does not grow with the size of the reply.
+
+        Args:
+            source: A file-like object with the raw response.
+            tag (str): The tag of the <result> children to yield.
+
+        Raises:
+            ValueError: If the <reply> type is not "result".
+        """
+        depth = 0
+        reply_type = None
+        for event, elem in etree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and elem.tag == "reply":
+                    reply_type = elem.get("type")
+                continue
+
+            depth -= 1
+            if depth == 3 and reply_type == "result" and elem.tag == tag:
+                cast("etree._Element", elem.getparent()).remove(elem)
+                yield elem
+            elif depth == 1 and elem.tag == "reply":
+                if reply_type == "error":
+                    m = elem.find("message")
+                    raise ValueError(f"Call failed: {'None' if m is None else m.text}")
+                if reply_type != "result":
+                    raise ValueError(f"Unexpected reply type: {reply_type}")
+                return
+
+        raise ValueError("No <reply> element found in the response.")
+
+    @classmethod
+    def post_iter(
+        cls,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+        tag: str = "asset",
+    ) -> Generator["etree._Element", None, None]:
+        """Streaming version of post, yielding the <tag> children of the result as they arrive"""
+        yield from cls.stream(name, cls.build_request(name, args, xml), lambda raw: cls.iter_xml(raw, tag))
+
+    @classmethod
+    def post_dicts(
+        cls,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+        tag: str = "asset",
+        schema: Optional[Schema] = None,
+    ) -> Generator[Any, None, None]:
+        """
+        Streaming version of post, yielding the <tag> children of the result as dicts as they
+        arrive, see xml.iter_dicts.
+        """
+        yield from cls.stream(name, cls.build_request(name, args, xml), lambda raw: iter_dicts(raw, tag, schema))
+
+    @classmethod
+    def stream(cls, name: str, payload: bytes, parse: Callable[[Any], Iterable]) -> Generator[Any, None, None]:
+        """
+        Sends a payload, yielding the items parse finds in the raw response as it arrives.
+
+        Calls the policy of the service marks idempotent are sent again if the response breaks
+        off before the first item was yielded, as far as the policy's retries allow.  Failures
+        after that are raised, as the consumer has already seen part of the result.
+        """
+        policy = cls.policy(name)
+        attempt = 0
+        with metrics.start(name, payload) as call:
+            while True:
+                response = call.received(cls.send(payload, stream=True, name=name, policy=policy))
+                started = False
+                try:
+                    response.raw.decode_content = True
+                    for item in call.timed(parse(response.raw)):
+                        started = True
+                        yield item
+                    return
+                except STREAM_ERRORS:
+                    if started or not policy.idempotent or attempt >= policy.retries:
+                        raise
+                except ValueError as e:
+                    raise ValueError(f'Unexpected response from "{payload.decode("utf-8", "replace")}": {e}')
+                finally:
+                    response.close()
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+
+    # Metadata element of an object, None until data fetches it
+    _data: Optional["etree._Element"]
 
     @property
     def data(self) -> "etree._Element":
         """Abstract property that must be implemented in subclasses."""
         return cast("etree._Element", None)
 
+    @property
+    def cache_key(self) -> tuple:
+        """Key of this object's metadata in Request.cache"""
+        return (type(self).__name__, id(self))
+
+    def cached(self, name: str, args: list[tuple]) -> "etree._Element":
+        """Returns the first element of a describe/get call, going through Request.cache"""
+        data = Request.cache.get(self.cache_key)
+        if data is None:
+            r = self.post(name, args)
+            data = None if r is None else r.getchildren()[0]
+            Request.cache.put(self.cache_key, data)
+        return data
+
+    def invalidate(self) -> None:
+        """Drops this object's metadata so the next access fetches it from the server"""
+        Request.cache.invalidate(self.cache_key)
+        self._data = None
+
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Generator["Batch", None, None]:
+        """
+        Queues service calls and sends them in a single round trip on exit.
+
+        Example:
+            with Request.batch() as batch:
+                calls = [batch.post("asset.filter.describe", [...]) for ...]
+            results = [c.result() for c in calls]
+        """
+        batch = Batch(cls)
+        yield batch
+        batch.send()
+
     def export(self, fn: str) -> None:
         with open(fn, "wb") as f:
             f.write(etree.tostring(self.data, pretty_print=True, encoding="utf-8", xml_declaration=True))
 
 
+def mark_worker(sessions: set[requests.Session]) -> None:
+    """Runs on each new thread of the shared pools, so that retire() can close its session"""
+    Request._local.worker_sessions = sessions
+
+
+def after_fork() -> None:
+    # Forked processes, such as process pool workers, must open their own connections rather
+    # than share the parent's sockets, and start their own threads
+    Request._local = threading.local()
+    Request._executor = Request._hedge_executor = None
+    Request._executor_lock = threading.Lock()
+    Request._worker_sessions = {}
+
+
+os.register_at_fork(after_in_child=after_fork)
+atexit.register(Request.shutdown)
+
+Request.transport = HTTPTransport(Request.session)
+
+
+class MultipartBody:
+    """
+    A multipart/form-data request with a file attached, read in blocks so that the file is
+    streamed from disk rather than buffered.
+    """
+
+    def __init__(self, payload: bytes, path: str, filename: Optional[str] = None) -> None:
+        self.boundary = uuid.uuid4().hex
+        self.path = path
+        self.head = (
+            f"--{self.boundary}\r\n"
+            'Content-Disposition: form-data; name="request"\r\n'
+            "Content-Type: text/xml\r\n\r\n"
+        ).encode("utf-8") + payload
+        # Quotes and line breaks in the name are percent-encoded as browsers do, so it cannot
+        # end the header or the part
+        disposition = format_multipart_header_param("filename", filename or os.path.basename(path))
+        self.head += (
+            f"\r\n--{self.boundary}\r\n"
+            'Content-Disposition: form-data; name="nb-data-attachments"\r\n\r\n'
+            f"1\r\n--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="filename"; {disposition}\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self.size = os.path.getsize(path)
+        self._parts: Optional[list] = None
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self.head) + self.size + len(self.tail)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._parts is None:
+            self._parts = [io.BytesIO(self.head), open(self.path, "rb"), io.BytesIO(self.tail)]
+        out = b""
+        while self._parts and (size < 0 or len(out) < size):
+            block = self._parts[0].read(-1 if size < 0 else size - len(out))
+            if not block:
+                self._parts.pop(0).close()
+                continue
+            out += block
+        return out
+
+    def close(self) -> None:
+        for part in self._parts or []:
+            part.close()
+        self._parts = []
+
+
+class BatchCall:
+    """A service call queued on a Batch, resolved when the batch is sent"""
+
+    def __init__(self, batch: "Batch", name: str, args: Optional[list[tuple]], xml: Optional[list["etree._Element"]]):
+        self.batch = batch
+        self.name = name
+        self.args = args
+        self.xml = xml
+        self._result: Optional["etree._Element"] = None
+        self._error: Optional[Exception] = None
+        self.done = False
+
+    def result(self) -> "etree._Element":
+        """Returns the call's <result>, sending the batch first if needed"""
+        if not self.done:
+            self.batch.send()
+        if self._error is not None:
+            raise self._error
+        return cast("etree._Element", self._result)
+
+    def element(self) -> "etree._Element":
+        """The <service> element for this call in a service.execute request"""
+        svc = etree.Element("service", name=self.name)
+        for arg in self.args or []:
+            etree.SubElement(svc, arg[0]).text = str(arg[1])
+        for x in self.xml or []:
+            svc.append(copy.deepcopy(x))
+        return svc
+
+    def resolve(self, result: Optional["etree._Element"], error: Optional[Exception] = None) -> None:
+        self._result = result
+        self._error = error
+        self.done = True
+
+
+class Batch:
+    """
+    Service calls queued by Request.batch(), sent together in one service.execute round trip.
+    """
+
+    def __init__(self, request: type[Request]) -> None:
+        self.request = request
+        self.calls: list[BatchCall] = []
+
+    def post(
+        self,
+        name: str,
+        args: Optional[list[tuple]] = None,
+        xml: Optional[list["etree._Element"]] = None,
+    ) -> BatchCall:
+        """Queues a service call, returning a handle to its result"""
+        call = BatchCall(self, name, args, xml)
+        self.calls.append(call)
+        return call
+
+    def send(self) -> None:
+        """Sends all queued calls that have not been sent yet"""
+        calls = [c for c in self.calls if not c.done]
+        if len(calls) == 0:
+            return
+        if len(calls) == 1:
+            try:
+                calls[0].resolve(self.request.post(calls[0].name, calls[0].args, calls[0].xml))
+            except ValueError as e:
+                calls[0].resolve(None, e)
+            return
+
+        # A batch of read-only calls can be retried like any one of them
+        policies = [self.request.policy(c.name) for c in calls]
+        policy = policies[0] if all(p.idempotent for p in policies) else None
+        try:
+            rv = self.request.post("service.execute", xml=[c.element() for c in calls], policy=policy)
+        except ValueError as e:
+            for c in calls:
+                c.resolve(None, e)
+            return
+
+        replies = rv.findall("reply")
+        for ix, call in enumerate(calls):
+            if ix >= len(replies):
+                call.resolve(None, ValueError(f"No reply for {call.name} in service.execute result"))
+                continue
+            reply = replies[ix]
+            error = reply.find("error")
+            if error is not None or reply.get("type") == "error":
+                m = reply.find(".//message")
+                call.resolve(None, ValueError(f"Call failed: {'None' if m is None else m.text}"))
+                continue
+            response = reply.find("response")
+            call.resolve(reply if response is None else response)
+
+
 class Namespace(Request):
     @classmethod
     def filter_spaces(cls) -> list["Namespace"]:
@@ -113,13 +815,19 @@ class Namespace(Request):
         val = self.data.xpath("./label/text()")
         return "" if len(val) == 0 else val[0]
 
+    @property
+    def cache_key(self) -> tuple:
+        return ("namespace", self.namespace)
+
     @property
     def data(self) -> "etree._Element":
         if self._data is None:
-            r = self.post("asset.filter.namespace.describe", [("namespace", self.namespace)])
-            self._data = None if r is None else r.getchildren()[0]
+            self._data = self.cached(*self.describe_call())
         return self._data
 
+    def describe_call(self) -> tuple:
+        return ("asset.filter.namespace.describe", [("namespace", self.namespace)])
+
     @property
     def filters(self):
         if self._filters is None:
@@ -127,6 +835,11 @@ class Namespace(Request):
             self._filters = None if r is None else [Filter(self.namespace, x) for x in r.xpath("./filter/text()")]
         return self._filters
 
+    def describe_filters(self) -> list["Filter"]:
+        """Returns the namespace's filters with their descriptions fetched in a single batch"""
+        Filter.describe_all(self.filters)
+        return self.filters
+
     @property
     def exists(self) -> bool:
         r = self.post(
@@ -135,21 +848,25 @@ class Namespace(Request):
         )
         return r.xpath("./exists/text()") == ["true"]
 
+    def destroy_call(self) -> tuple:
+        return ("asset.filter.namespace.destroy", [("namespace", self.namespace)])
+
+    def create_calls(self, exists: bool) -> list[tuple]:
+        """The (name, args, xml) calls that define the namespace, replacing it if it exists"""
+        calls = [self.destroy_call()] if exists else []
+        calls.append(("asset.filter.namespace.create", [("namespace", self.namespace)], self.data.getchildren()))
+        return calls
+
     def destroy(self) -> None:
         if self.exists:
-            self.post(
-                "asset.filter.namespace.destroy",
-                [("namespace", self.namespace)],
-            )
+            self.post(*self.destroy_call())
+            Request.cache.invalidate(self.cache_key)
 
     def create(self) -> None:
-        self.destroy()
-
-        self.post(
-            "asset.filter.namespace.create",
-            [("namespace", self.namespace)],
-            self.data.getchildren(),
-        )
+        with self.batch() as batch:
+            calls = [batch.post(*c) for c in self.create_calls(self.exists)]
+        Request.cache.invalidate(self.cache_key)
+        calls[-1].result()
 
 
 class FilterArg:
@@ -212,16 +929,33 @@ class Filter(Request):
             self._args = [FilterArg(x) for x in self.data.xpath("./arg")]
         return cast(list["FilterArg"], self._args)
 
+    @classmethod
+    def describe_all(cls, filters: list["Filter"]) -> None:
+        """Fetches the descriptions of the given filters that are not loaded yet in one batch"""
+        todo = []
+        with cls.batch() as batch:
+            for f in filters:
+                if f._data is None:
+                    f._data = Request.cache.get(f.cache_key)
+                if f._data is None:
+                    todo.append((f, batch.post(*f.describe_call())))
+        for f, call in todo:
+            f._data = call.result().getchildren()[0]
+            Request.cache.put(f.cache_key, f._data)
+
+    @property
+    def cache_key(self) -> tuple:
+        return ("filter", self.namespace, self.name)
+
     @property
     def data(self) -> "etree._Element":
         if self._data is None:
-            r = self.post(
-                "asset.filter.describe",
-                [("namespace", self.namespace), ("name", self.name)],
-            )
-            self._data = None if r is None else r.getchildren()[0]
+            self._data = self.cached(*self.describe_call())
         return self._data
 
+    def describe_call(self) -> tuple:
+        return ("asset.filter.describe", [("namespace", self.namespace), ("name", self.name)])
+
     @property
     def exists(self) -> bool:
         r = self.post(
@@ -230,51 +964,37 @@ class Filter(Request):
         )
         return r.xpath("./exists/text()") == ["true"]
 
+    def destroy_call(self) -> tuple:
+        return ("asset.filter.destroy", [("namespace", self.namespace), ("name", self.name)])
+
+    def create_calls(self, exists: bool) -> list[tuple]:
+        """The (name, args, xml) calls that define the filter, replacing it if it exists"""
+        # asset.filter.create takes <type type="..."> where describe returns <type><name>
+        xargs = transform_type_elements(copy.deepcopy(self.data))
+        calls = [self.destroy_call()] if exists else []
+        calls.append(("asset.filter.create", [("namespace", self.namespace), ("name", self.name)], xargs.getchildren()))
+        return calls
+
     def destroy(self) -> None:
         if self.exists:
-            self.post(
-                "asset.filter.destroy",
-                [("namespace", self.namespace), ("name", self.name)],
-            )
+            self.post(*self.destroy_call())
+            Request.cache.invalidate(self.cache_key)
 
     def create(self) -> None:
-        self.destroy()
-
-        # Need to transform <type>
-        xargs = copy.deepcopy(self.data)
-
-        def transform_type_elements(root):
-            """
-            Modifies all <type> elements in the given XML tree:
-            - Moves <name> value to an attribute "type"
-            - Removes the <name> element
-
-            :param root: lxml.etree._Element (Root of the XML document)
-            """
-            for type_elem in root.findall(".//type"):  # Find all <type> elements
-                name_elem = type_elem.find("name")  # Find the <name> element inside <type>
-                if name_elem is not None:
-                    type_value = name_elem.text.strip() if name_elem.text else ""
-                    type_elem.set("type", type_value)  # Set as attribute
-                    type_elem.remove(name_elem)  # Remove <name> element
-
-                # Check if <type> has no remaining child elements
-                if not list(type_elem):
-                    type_elem.text = None
-
-        transform_type_elements(xargs)
-
-        self.post(
-            "asset.filter.create",
-            [("namespace", self.namespace), ("name", self.name)],
-            xargs.getchildren(),
-        )
+        with self.batch() as batch:
+            calls = [batch.post(*c) for c in self.create_calls(self.exists)]
+        Request.cache.invalidate(self.cache_key)
+        calls[-1].result()
 
     def query_str(self, *args, **kwargs):
-        def e(v):
-            return escape(v, {'"': "&quot;", "'": "&apos;"}) if type(v) is str else v
+        """
+        Returns the where clause calling this filter with the given argument values.
 
-        args = ",".join(f"{e(k)}=\\'{e(v)}\\'" for k, v in kwargs.items())
+        Values are not XML escaped here, Request.post escapes every argument when it builds
+        the request, so callers must pass plain values: a value that is already escaped, such
+        as "&amp;", is escaped again and reaches the server as "&amp;amp;".
+        """
+        args = ",".join(f"{k}=\\'{v}\\'" for k, v in kwargs.items())
         return f"filter '{self.namespace}:{self.name}({args})'"
 
 
@@ -299,18 +1019,21 @@ class Form(Request):
     @property
     def label(self) -> str:
         label = self.data.xpath("./label/text()")
-        return "" if len(label) == 0 else desc[0]
+        return "" if len(label) == 0 else label[0]
+
+    @property
+    def cache_key(self) -> tuple:
+        return ("form", self.name)
 
     @property
     def data(self) -> "etree._Element":
         if self._data is None:
-            r = self.post(
-                "asset.form.describe",
-                [("name", self.name)],
-            )
-            self._data = None if r is None else r.getchildren()[0]
+            self._data = self.cached(*self.describe_call())
         return self._data
 
+    def describe_call(self) -> tuple:
+        return ("asset.form.describe", [("name", self.name)])
+
     @property
     def exists(self) -> bool:
         r = self.post(
@@ -319,52 +1042,309 @@ class Form(Request):
         )
         return r.xpath("./exists/text()") == ["true"]
 
+    def destroy_call(self) -> tuple:
+        return ("asset.form.destroy", [("name", self.name)])
+
+    def create_calls(self, exists: bool) -> list[tuple]:
+        """The (name, args, xml) calls that define the form, replacing it if it exists"""
+        calls = [self.destroy_call()] if exists else []
+        calls.append(("asset.form.create", [("name", self.name)], self.data.getchildren()))
+        return calls
+
     def destroy(self) -> None:
         if self.exists:
-            self.post(
-                "asset.form.destroy",
-                [("name", self.name)],
-            )
+            self.post(*self.destroy_call())
+            Request.cache.invalidate(self.cache_key)
 
     def create(self) -> None:
-        self.destroy()
-
-        self.post(
-            "asset.form.create",
-            [("name", self.name)],
-            self.data.getchildren(),
-        )
+        with self.batch() as batch:
+            calls = [batch.post(*c) for c in self.create_calls(self.exists)]
+        Request.cache.invalidate(self.cache_key)
+        calls[-1].result()
 
 
 class Asset(Request):
+    # Class used to wrap collection assets found by queries, set once Collection is defined
+    collection_class: type["Collection"]
+
+    # URL of an asset's content, formatted with the scheme and host of Request.url as base
+    content_url = "{base}/mflux/content.mfjp?id={id}"
+    # Name content downloads are given a policy and measured under, see Request.set_policy
+    content_service = "asset.content"
+    # Content is streamed to disk in blocks of this size
+    download_block_size = 1024 * 1024
+    # Content larger than this is downloaded as parallel byte ranges of this size
+    download_range_size = 64 * 1024 * 1024
+
     @classmethod
     def query_name(cls, name: str) -> Union["Asset", "Collection"]:
         """Finds the newest asset with the given name"""
-        rv = cls.post("asset.query", [("where", f"name = '{name}'"), ("action", "get-meta")])
-        assets = rv.xpath("./asset")
-        asset = sorted(
-            assets,
-            key=lambda obj: int(obj.xpath("./ctime/@millisec")[0]),
-        )[-1]
-        a = cls.from_xml(asset)
-        if a.is_collection:
-            return Collection(a.id)
-        return a
-
-    @classmethod
-    def query(cls, query: str) -> list[Union["Asset", "Collection"]]:
-        """Finds a list of assets matching the given query"""
+        asset = Request.cache.get(("query_name", name))
+        if asset is None:
+            rv = cls.post("asset.query", [("where", f"name = '{name}'"), ("action", "get-meta")])
+            assets = rv.xpath("./asset")
+            asset = sorted(
+                assets,
+                key=lambda obj: int(obj.xpath("./ctime/@millisec")[0]),
+            )[-1]
+            Request.cache.put(("query_name", name), asset)
+        return cls.from_result(asset)
+
+    @classmethod
+    def query(
+        cls, query: str, fields: Optional[list[str]] = None
+    ) -> Union[list[Union["Asset", "Collection"]], list["AssetRecord"]]:
+        """
+        Finds a list of assets matching the given query.
+
+        With Request.disk_cache set, only the ids are queried and the metadata of assets
+        unchanged since it was cached is read from disk, see Collection.get_batch.
+
+        Args:
+            query (str): The where clause.
+            fields (list): AssetRecord fields to fetch.  When given, only those values are
+                requested from the server and AssetRecords are returned.
+        """
+        if fields is not None:
+            return cls.project(query, fields)
+
+        if Request.disk_cache is not None:
+            ids = cls.post("asset.query", [("where", query), ("action", "get-id")]).xpath("./id/text()")
+
+            def fail(id: str, error: Exception) -> None:
+                raise error
+
+            batches = Collection(None)
+            rv = []
+            for ix in range(0, len(ids), 1000):
+                rv += [cls.from_result(a.data) for a in batches.get_batch(ids[ix : ix + 1000], fail)]
+            return rv
+
         qr = cls.post("asset.query", [("where", query), ("action", "get-meta")])
+        return [cls.from_result(asset) for asset in qr.xpath("./asset")]
+
+    @classmethod
+    def query_count(cls, query: str) -> int:
+        """Counts the assets matching the given query without fetching any metadata"""
+        rv = cls.post("asset.query", [("where", query), ("action", "count")])
+        return int(rv.xpath("./value/text()")[0])
+
+    @classmethod
+    def query_check(cls, query: str) -> bool:
+        """Runs the given query for at most one id, returning whether anything matches"""
+        rv = cls.post("asset.query", [("where", query), ("action", "get-id"), ("size", 1)])
+        return len(rv.xpath("./id")) > 0
+
+    @classmethod
+    def get_values(cls, query: str, xpaths: dict[str, str], size: Optional[int] = None) -> list["etree._Element"]:
+        """
+        Runs asset.query with the get-value action.
+
+        Args:
+            query (str): The where clause.
+            xpaths (dict): The xpaths to extract, keyed by the element name to return them as.
+            size (int): Maximum number of results.
+
+        Returns:
+            list: An <asset id="..."> element per match holding an element per xpath.
+        """
+        args: list[tuple] = [("where", query), ("action", "get-value")]
+        if size is not None:
+            args.append(("size", size))
+        xml = []
+        for ename, path in xpaths.items():
+            xpath = etree.Element("xpath", ename=ename)
+            xpath.text = path
+            xml.append(xpath)
+        return cls.post("asset.query", args, xml).xpath("./asset")
+
+    @classmethod
+    def project(cls, query: str, fields: list[str], size: Optional[int] = None) -> list["AssetRecord"]:
+        """Returns AssetRecords holding only the given fields for the assets matching query"""
+        unknown = [f for f in fields if f not in FIELD_XPATHS]
+        if unknown:
+            raise ValueError(f"Cannot request fields {unknown}, expecting some of {sorted(FIELD_XPATHS)}")
+        xpaths = {f: FIELD_XPATHS[f] for f in fields}
+        return [AssetRecord.from_values(a, fields) for a in cls.get_values(query, xpaths, size)]
 
-        assets = qr.xpath("./asset")
-        rv: list[Union["Asset", "Collection"]] = []
-        for asset in assets:
-            a = cls.from_xml(asset)
-            if a.is_collection:
-                rv.append(Collection(a.id))
+    @classmethod
+    def aggregate(
+        cls,
+        where: str,
+        by: Optional[str] = None,
+        metrics: Iterable[str] = ("count", "size"),
+    ) -> MergeDict:
+        """
+        Computes statistics of the assets matching a query on the server, so no asset metadata
+        is transferred.
+
+        Args:
+            where (str): The where clause.
+            by (str): An AssetRecord field to group by, such as "mimetype" or "extension".
+            metrics: Names from METRICS, "count" of assets and total content "size".
+
+        Returns:
+            MergeDict: {metric: value}, or {group: {metric: value}} when grouped.  Results for
+            different queries can be combined with +.
+
+        Example:
+            Asset.aggregate("asset in collection 1193191", by="mimetype")
+            # {"image/jpeg": {"count": 120, "size": 5023410}, ...}
+        """
+        metrics = list(metrics)
+        unknown = [m for m in metrics if m not in METRICS]
+        if unknown:
+            raise ValueError(f"Cannot compute metrics {unknown}, expecting some of {sorted(METRICS)}")
+        if by is not None and by not in FIELD_XPATHS:
+            raise ValueError(f'Cannot group by "{by}", expecting one of {sorted(FIELD_XPATHS)}')
+
+        groups: dict[Optional[str], str]
+        if by is None:
+            groups = {None: where}
+        else:
+            xpath = FIELD_XPATHS[by]
+            rv = cls.post("asset.query", [("where", where), ("action", "get-distinct-values"), ("xpath", xpath)])
+            groups = {}
+            for value in rv.xpath("./value/text()"):
+                quoted = value.replace("'", "\\'")
+                groups[value] = f"({where}) and xpath({xpath})='{quoted}'"
+
+        # One round trip for every metric of every group
+        with cls.batch() as batch:
+            calls = {
+                (group, metric): batch.post("asset.query", cls.metric_args(query, metric))
+                for group, query in groups.items()
+                for metric in metrics
+            }
+
+        result = MergeDict()
+        for (group, metric), call in calls.items():
+            value = int(float(first(call.result().xpath("./value/text()"), "0")))
+            if group is None:
+                result[metric] = value
             else:
-                rv.append(a)
-        return rv
+                result.setdefault(group, {})[metric] = value
+        return result
+
+    @staticmethod
+    def metric_args(where: str, metric: str) -> list[tuple]:
+        action, xpath = METRICS[metric]
+        args = [("where", where), ("action", action)]
+        if xpath is not None:
+            args.append(("xpath", xpath))
+        return args
+
+    @staticmethod
+    def id_query(ids: list[str]) -> str:
+        """Returns a where clause matching the given asset ids"""
+        return " or ".join(f"id={id}" for id in ids)
+
+    @classmethod
+    def stimes(cls, ids: list[str]) -> dict[str, str]:
+        """Returns the current stime of each of the given assets, which changes whenever they do"""
+        rv = cls.get_values(cls.id_query(ids), {"stime": "stime"}, len(ids))
+        return {a.get("id", ""): a.findtext("stime", "") for a in rv}
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        pid: str,
+        name: Optional[str] = None,
+        meta: Optional["etree._Element"] = None,
+    ) -> "Asset":
+        """
+        Creates an asset in a collection with a local file as its content.
+
+        Args:
+            path (str): The file to upload, streamed from disk.
+            pid (str): Id of the collection the asset is created in.
+            name (str): Name of the asset, defaults to the file name.
+            meta (Element): A <meta> element of document values to set on the asset.
+
+        Returns:
+            The new asset.
+        """
+        args = [("pid", pid), ("name", name or os.path.basename(path))]
+        rv = cls.post_content("asset.create", args, None if meta is None else [meta], path, name)
+        return cls(rv.xpath("./id/text()")[0])
+
+    @classmethod
+    def query_iter(
+        cls,
+        query: str,
+        page_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        lookahead: bool = False,
+    ) -> Generator[Union["Asset", "Collection"], None, None]:
+        """
+        Finds assets matching the given query, yielding each one as it is parsed.
+
+        Args:
+            query (str): The where clause.
+            page_size (int): Request results in pages of this size using idx/size, so the first
+                results arrive without waiting for the whole query.  None sends a single request.
+            limit (int): Stop after this many results.
+            lookahead (bool): Request the next page on a worker thread while the current one is
+                being consumed.  Only applies when page_size is set.
+        """
+
+        def page_args(idx: int, size: int) -> list[tuple]:
+            return [("where", query), ("action", "get-meta"), ("idx", idx), ("size", size)]
+
+        def fetch(idx: int, size: int) -> list[Union["Asset", "Collection"]]:
+            return [cls.from_result(a, cache=False) for a in cls.post_iter("asset.query", page_args(idx, size))]
+
+        if page_size is None:
+            args: list[tuple] = [("where", query), ("action", "get-meta")]
+            if limit is not None:
+                args.append(("size", limit))
+            for elem in cls.post_iter("asset.query", args):
+                yield cls.from_result(elem, cache=False)
+            return
+
+        pool = Request.executor() if lookahead else None
+        ahead: Optional[Future] = None
+        idx, total = 1, 0
+        try:
+            while limit is None or total < limit:
+                size = page_size if limit is None else min(page_size, limit - total)
+                page: Iterable[Union["Asset", "Collection"]]
+                if ahead is not None:
+                    page = ahead.result()
+                elif pool is not None:
+                    page = fetch(idx, size)
+                else:
+                    page = (cls.from_result(a, cache=False) for a in cls.post_iter("asset.query", page_args(idx, size)))
+                idx += size
+
+                ahead = None
+                following = page_size if limit is None else min(page_size, limit - total - size)
+                if pool is not None and following > 0:
+                    ahead = metrics.submit(pool, fetch, idx, following)
+
+                n = 0
+                for asset in page:
+                    n += 1
+                    yield asset
+                total += n
+                if n < size:
+                    return
+        finally:
+            if ahead is not None:
+                ahead.cancel()
+
+    @classmethod
+    def from_result(cls, xml_obj: "etree._Element", cache: bool = True) -> Union["Asset", "Collection"]:
+        """
+        Wraps an <asset> from a query result, returning a Collection for collection assets.
+        Streamed results pass cache=False so that long iterations do not fill Request.cache.
+        """
+        if cache:
+            Request.cache.put(("asset", xml_obj.get("id")), xml_obj)
+        if xml_obj.get("collection") == "true":
+            return cls.collection_class.from_xml(xml_obj)
+        return cls.from_xml(xml_obj)
 
     @classmethod
     def from_xml(cls, xml_obj: "etree._Element") -> "Asset":
@@ -384,64 +1364,346 @@ class Asset(Request):
 
     @property
     def has_exif(self) -> bool:
-        exif = self.data.xpath("./meta/mf-image-exif")
-        return len(exif) > 0
+        return XPATH_HAS_EXIF(self.data)
 
     def checksum(self, base: int = 10) -> str:
-        cs = self.data.xpath(f"./content/csum[@base='{base}']")
-        return "" if len(cs) == 0 else cs[0]
+        return first(XPATH_CHECKSUM(self.data, base=str(base)))
 
     @property
     def extension(self) -> str:
-        ext = self.data.xpath("./name/@ext")
-        return "" if len(ext) == 0 else ext[0]
+        return first(XPATH_EXTENSION(self.data))
 
     @property
     def mf_name(self) -> str:
-        val = self.data.xpath("./meta/mf-name/name/text()")
-        return "" if len(val) == 0 else val[0]
+        return first(XPATH_MF_NAME(self.data))
 
     @property
     def mf_source_name(self) -> str:
-        val = self.data.xpath("./meta/mf-source-name/name/text()")
-        return "" if len(val) == 0 else val[0]
+        return first(XPATH_MF_SOURCE_NAME(self.data))
 
     @property
     def mimetype(self) -> str:
-        ty = self.data.xpath("./content/type/text()")
-        return "" if len(ty) == 0 else ty[0]
+        return first(XPATH_MIMETYPE(self.data))
 
     @property
     def name(self) -> str:
-        name = self.data.find("name")
-        return "" if name is None else cast(str, name.text)
+        return first(XPATH_NAME(self.data))
 
     @property
     def parent(self) -> str:
-        parent = self.data.find("parent")
-        return "" if parent is None else cast(str, parent.text)
+        return first(XPATH_PARENT(self.data))
 
     @property
     def size(self) -> Optional[int]:
-        sz = self.data.xpath("./content/size/text()")
+        sz = XPATH_SIZE(self.data)
         return None if len(sz) == 0 else int(sz[0])
 
     @property
     def type(self) -> str:
-        ty = self.data.find("type")
-        return "" if ty is None else cast(str, ty.text)
+        return first(XPATH_TYPE(self.data))
+
+    def compact(self, keep_xml: bool = False) -> "AssetRecord":
+        """Returns a compact snapshot of this asset's fields"""
+        return AssetRecord.from_xml(self.data, keep_xml)
+
+    def content_location(self) -> str:
+        """The URL of this asset's content, see Asset.content_url"""
+        parts = urllib.parse.urlsplit(Request.url)
+        return self.content_url.format(base=f"{parts.scheme}://{parts.netloc}", id=self.id)
+
+    @contextmanager
+    def get_content(self, start: int = 0, end: Optional[int] = None) -> Generator[requests.Response, None, None]:
+        """
+        Opens a streaming request for the content, or the inclusive byte range start-end of it,
+        closing it when the block exits.
+
+        The request is sent with Request.transport, so downloads can be recorded and replayed,
+        timed out and retried by the policy of Asset.content_service, and reported to the
+        metrics sinks once the block exits, counting the bytes read.
+        """
+        headers = {k: v for k, v in self.headers.items() if k.lower() != "content-type"}
+        if start > 0 or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        policy = Request.policy(self.content_service)
+        timeout = Request.timeout if policy.timeout is None else policy.timeout
+
+        def open_content() -> requests.Response:
+            response = Request.transport.get(self.content_location(), headers, timeout, True)
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                response.close()
+                raise
+            return response
+
+        with metrics.start(self.content_service, b"") as call:
+            with call.received(Request.retried(policy, open_content)) as response:
+                yield response
+
+    def download(self, path: str, workers: int = 4, verify: bool = True) -> str:
+        """
+        Downloads the asset's content to path.
+
+        Content is streamed in blocks to path + ".part", which is renamed into place once
+        complete, so an interrupted download resumes where it stopped.  Content larger than
+        Asset.download_range_size is fetched as byte ranges on a pool of workers.
+
+        Args:
+            path (str): The file to write.
+            workers (int): Number of byte ranges fetched at once.
+            verify (bool): Check the content against the server's CRC32 checksum.
+
+        Returns:
+            str: The path written.
+
+        Raises:
+            ValueError: If the downloaded content does not match the checksum.
+        """
+        size = self.size
+        part = path + ".part"
+        if size is not None and size > self.download_range_size and workers > 1:
+            self.download_ranges(part, size, workers)
+            crc = crc32_file(part) if verify else 0
+        else:
+            crc = self.download_stream(part, size)
+
+        expected = self.checksum(16) if verify else ""
+        if expected and int(expected, 16) != crc:
+            os.remove(part)
+            raise ValueError(f"Checksum mismatch for asset {self.id}: expected {expected}, got {crc:X}")
+        os.replace(part, path)
+        return path
+
+    def download_stream(self, part: str, size: Optional[int] = None) -> int:
+        """
+        Streams the content to part, resuming from its current length, returning its CRC32.
+
+        A part left by download_ranges was allocated at full size, so its length says nothing of
+        what was written and the download starts again.
+        """
+        progress = part + ".ranges"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if (size is not None and offset > size) or os.path.exists(progress):
+            offset = 0
+        # Checksum what is already there so the CRC can be updated as blocks are written
+        crc = crc32_file(part, length=offset) if offset > 0 else 0
+        if size is not None and offset == size:
+            return crc
+
+        with self.get_content(offset) as response:
+            if offset > 0 and response.status_code != 206:
+                # The server sent everything, start again
+                offset, crc = 0, 0
+            with open(part, "r+b" if offset > 0 else "wb") as f:
+                f.seek(offset)
+                f.truncate()
+                if os.path.exists(progress):
+                    os.remove(progress)
+                for block in response.iter_content(self.download_block_size):
+                    f.write(block)
+                    crc = zlib.crc32(block, crc)
+        return crc & 0xFFFFFFFF
+
+    def download_ranges(self, part: str, size: int, workers: int) -> None:
+        """
+        Fetches the content to part as parallel byte ranges of Asset.download_range_size.
+
+        Completed ranges are recorded in part + ".ranges" so an interrupted download only
+        fetches the missing ones.
+        """
+        progress = part + ".ranges"
+        done: set[int] = set()
+        if os.path.exists(part) and os.path.exists(progress):
+            with open(progress) as f:
+                done = set(json.load(f))
+        else:
+            with open(part, "wb") as out:
+                out.truncate(size)
+
+        lock = threading.Lock()
+        fd = os.open(part, os.O_RDWR)
+
+        def fetch(start: int) -> None:
+            end = min(start + self.download_range_size, size) - 1
+            offset = start
+            with self.get_content(start, end) as response:
+                if response.status_code != 206:
+                    raise ValueError(f"Server ignored the byte range request for asset {self.id}")
+                for block in response.iter_content(self.download_block_size):
+                    os.pwrite(fd, block, offset)
+                    offset += len(block)
+            if offset != end + 1:
+                raise ValueError(f"Short read of bytes {start}-{end} of asset {self.id}")
+            with lock:
+                done.add(start)
+                with open(progress, "w") as f:
+                    json.dump(sorted(done), f)
+
+        try:
+            todo = [start for start in range(0, size, self.download_range_size) if start not in done]
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mediaflux-download") as pool:
+                for _ in pool.map(fetch, todo):
+                    pass
+        finally:
+            os.close(fd)
+        os.remove(progress)
+
+    @property
+    def cache_key(self) -> tuple:
+        return ("asset", self.id)
+
+    @property
+    def data(self) -> "etree._Element":
+        if self._data is None:
+            self._data = self.cached("asset.get", [("id", self.id)])
+        return self._data
+
+
+class AssetRecord:
+    """
+    Compact snapshot of an asset, with the same read API as Asset.
+
+    Fields are extracted once with the precompiled XPaths, and the metadata element is dropped
+    unless keep_xml is set, in which case data falls back to Asset.data.
+    """
+
+    __slots__ = (
+        "id",
+        "is_collection",
+        "has_exif",
+        "csum10",
+        "csum16",
+        "extension",
+        "mf_name",
+        "mf_source_name",
+        "mimetype",
+        "name",
+        "parent",
+        "size",
+        "type",
+        "_data",
+    )
+
+    # Fields left out of a from_values record are None
+    id: Optional[str]
+    is_collection: Optional[bool]
+    has_exif: Optional[bool]
+    csum10: Optional[str]
+    csum16: Optional[str]
+    extension: Optional[str]
+    mf_name: Optional[str]
+    mf_source_name: Optional[str]
+    mimetype: Optional[str]
+    name: Optional[str]
+    parent: Optional[str]
+    size: Optional[int]
+    type: Optional[str]
+    _data: Optional["etree._Element"]
+
+    @classmethod
+    def from_xml(cls, xml_obj: "etree._Element", keep_xml: bool = False) -> "AssetRecord":
+        obj = cls()
+        obj.id = xml_obj.get("id")
+        obj.is_collection = xml_obj.get("collection") == "true"
+        obj.has_exif = XPATH_HAS_EXIF(xml_obj)
+        obj.csum10 = first(XPATH_CHECKSUM(xml_obj, base="10"))
+        obj.csum16 = first(XPATH_CHECKSUM(xml_obj, base="16"))
+        obj.extension = first(XPATH_EXTENSION(xml_obj))
+        obj.mf_name = first(XPATH_MF_NAME(xml_obj))
+        obj.mf_source_name = first(XPATH_MF_SOURCE_NAME(xml_obj))
+        obj.mimetype = first(XPATH_MIMETYPE(xml_obj))
+        obj.name = first(XPATH_NAME(xml_obj))
+        obj.parent = first(XPATH_PARENT(xml_obj))
+        size = XPATH_SIZE(xml_obj)
+        obj.size = None if len(size) == 0 else int(size[0])
+        obj.type = first(XPATH_TYPE(xml_obj))
+        obj._data = xml_obj if keep_xml else None
+        return obj
+
+    @classmethod
+    def from_values(cls, xml_obj: "etree._Element", fields: list[str]) -> "AssetRecord":
+        """Builds a record from a get-value result, fields that were not requested are None"""
+        obj = cls()
+        for field in cls.__slots__:
+            setattr(obj, field, None)
+        obj.id = xml_obj.get("id")
+        for field in fields:
+            value = xml_obj.findtext(field) or ""
+            if field == "size":
+                obj.size = int(value) if value else None
+            elif field == "is_collection":
+                obj.is_collection = value == "true"
+            else:
+                setattr(obj, field, value)
+        return obj
+
+    def checksum(self, base: int = 10) -> Optional[str]:
+        if base == 10:
+            return self.csum10
+        if base == 16:
+            return self.csum16
+        return Asset(self.id).checksum(base)
 
     @property
     def data(self) -> "etree._Element":
         if self._data is None:
-            r = self.post("asset.get", [("id", self.id)])
-            self._data = None if r is None else r.getchildren()[0]
+            return Asset(self.id).data
         return self._data
 
 
+class AssetLike(Protocol):
+    """
+    The read API shared by Asset and AssetRecord, which is what Collection.get_assets yields.
+    Fields an AssetRecord was not built with are None.
+    """
+
+    @property
+    def id(self) -> Optional[str]: ...
+
+    @property
+    def is_collection(self) -> Optional[bool]: ...
+
+    @property
+    def has_exif(self) -> Optional[bool]: ...
+
+    def checksum(self, base: int = 10) -> Optional[str]: ...
+
+    @property
+    def extension(self) -> Optional[str]: ...
+
+    @property
+    def mf_name(self) -> Optional[str]: ...
+
+    @property
+    def mf_source_name(self) -> Optional[str]: ...
+
+    @property
+    def mimetype(self) -> Optional[str]: ...
+
+    @property
+    def name(self) -> Optional[str]: ...
+
+    @property
+    def parent(self) -> Optional[str]: ...
+
+    @property
+    def size(self) -> Optional[int]: ...
+
+    @property
+    def type(self) -> Optional[str]: ...
+
+    @property
+    def data(self) -> "etree._Element": ...
+
+
 class Collection(Asset):
+    # Number of member pages get_assets() fetches ahead of the one being consumed
+    prefetch = 0
+
     def __init__(self, id: Optional[str]) -> None:
         self._assets: Optional[list] = None
+        # Messages for member ids whose metadata could not be fetched, keyed by id
+        self.errors: dict[str, str] = {}
         super().__init__(id)
 
     @property
@@ -468,37 +1730,304 @@ class Collection(Asset):
             for id in ids:
                 yield id
 
-    def get_assets(self, get_all=False) -> Generator[Asset, None, None]:
-        for ix in range(0, self.count, 1000):
-            args = [("id", self.id), ("size", 1000), ("idx", ix + 1)]
-            if get_all:
-                args.append(("include-subcollections", "true"))
-            rv = self.post("asset.collection.members", args)
-            ids = rv.xpath("./id/text()")
-            if len(ids) > 0:
-                try:
-                    assets = self.post("asset.get", [("id", id) for id in ids])
-                    for a in assets.getchildren():
-                        yield Asset.from_xml(a)
-                except ValueError:
-                    # mediaflux is spitting errors on assets that it lists exist...
-                    for id in ids:
-                        try:
-                            assets = self.post("asset.get", [("id", id)])
-                        except ValueError:
-                            print(f"FAIL: {id}")
-                            continue
-                        yield Asset.from_xml(assets.getchildren()[0])
-
-    @property
-    def assets(self) -> Generator[Asset, None, None]:
+    def page_args(self, ix: int, get_all: bool = False) -> list[tuple]:
+        """Arguments for the asset.collection.members page starting at offset ix"""
+        args: list[tuple] = [("id", self.id), ("size", 1000), ("idx", ix + 1)]
+        if get_all:
+            args.append(("include-subcollections", "true"))
+        return args
+
+    def record_error(self, id: str, error: Exception) -> None:
+        """Default error callback, collecting the ids that could not be fetched in self.errors"""
+        self.errors[id] = str(error)
+
+    def get_batch(self, ids: list[str], on_error: ErrorCallback) -> Generator[Asset, None, None]:
+        """
+        Yields the assets for the given ids in order, only fetching those not in Request.cache.
+
+        Fetched assets are matched to the ids by their id, holding back any that arrive early,
+        and ids the server does not return are passed to on_error.
+        """
+        cached = {}
+        for id in ids:
+            data = Request.cache.get(("asset", id))
+            if data is not None:
+                cached[id] = data
+        if Request.disk_cache is not None:
+            cached.update(self.disk_batch([id for id in ids if id not in cached]))
+
+        failed = set()
+
+        def report(id: str, error: Exception) -> None:
+            failed.add(id)
+            on_error(id, error)
+
+        fetched = self.fetch_batch([id for id in ids if id not in cached], report)
+        received: dict[str, Asset] = {}
+        for id in ids:
+            if id in cached:
+                yield Asset.from_xml(cached[id])
+                continue
+            while id not in received and id not in failed:
+                asset = next(fetched, None)
+                if asset is None:
+                    break
+                received[cast(str, asset.id)] = asset
+            if id in received:
+                yield received.pop(id)
+            elif id not in failed:
+                on_error(id, ValueError(f"Asset {id} is missing from the asset.get reply"))
+
+    def disk_batch(self, ids: list[str]) -> dict[str, "etree._Element"]:
+        """Returns the metadata in Request.disk_cache for those ids that have not changed since"""
+        stored = cast(DiskCache, Request.disk_cache).get_many(ids)
+        if len(stored) == 0:
+            return {}
+        current = self.stimes(list(stored))
+        rv = {}
+        for id, (stime, xml) in stored.items():
+            if current.get(id) == stime:
+                rv[id] = etree.fromstring(xml)
+        return rv
+
+    def fetch_batch(self, ids: list[str], on_error: ErrorCallback) -> Generator[Asset, None, None]:
+        """
+        Streams asset.get for the given ids.
+
+        Mediaflux fails the whole call when it cannot get one of the ids, so a failing batch is
+        split in halves until the broken ids are isolated and passed to on_error.  The assets
+        are not added to Request.cache, which would otherwise fill with every member streamed.
+        """
+        if len(ids) == 0:
+            return
+        started = False
+        fetched = []
+        try:
+            for a in self.post_iter("asset.get", [("id", id) for id in ids]):
+                started = True
+                if Request.disk_cache is not None:
+                    fetched.append(a)
+                yield Asset.from_xml(a)
+            if Request.disk_cache is not None:
+                Request.disk_cache.put_many(fetched)
+        except ValueError as e:
+            if started:
+                raise
+            if len(ids) == 1:
+                on_error(ids[0], e)
+                return
+            mid = len(ids) // 2
+            yield from self.fetch_batch(ids[:mid], on_error)
+            yield from self.fetch_batch(ids[mid:], on_error)
+
+    def project_batch(self, ids: list[str], fields: list[str], on_error: ErrorCallback) -> list[AssetRecord]:
+        """
+        Returns AssetRecords holding only the given fields for the ids, in order.  Ids the
+        server does not return are passed to on_error, as in get_batch.
+        """
+        records = {r.id: r for r in self.project(self.id_query(ids), fields, len(ids))}
+        rv = []
+        for id in ids:
+            if id in records:
+                rv.append(records[id])
+            else:
+                on_error(id, ValueError(f"Asset {id} is missing from the asset.query reply"))
+        return rv
+
+    def iter_page(
+        self,
+        ix: int,
+        get_all: bool = False,
+        on_error: Optional[ErrorCallback] = None,
+        fields: Optional[list[str]] = None,
+    ) -> Generator[AssetLike, None, None]:
+        """Streams the members of the page starting at offset ix along with their metadata"""
+        rv = self.post("asset.collection.members", self.page_args(ix, get_all))
+        ids = rv.xpath("./id/text()")
+        if len(ids) == 0:
+            return
+        report = self.record_error if on_error is None else on_error
+        if fields is not None:
+            yield from self.project_batch(ids, fields, report)
+        else:
+            yield from self.get_batch(ids, report)
+
+    def get_page(
+        self,
+        ix: int,
+        get_all: bool = False,
+        on_error: Optional[ErrorCallback] = None,
+        fields: Optional[list[str]] = None,
+    ) -> list[AssetLike]:
+        """Fetches the members of the page starting at offset ix along with their metadata"""
+        return list(self.iter_page(ix, get_all, on_error, fields))
+
+    def get_assets(
+        self,
+        get_all=False,
+        prefetch: Optional[int] = None,
+        on_error: Optional[ErrorCallback] = None,
+        compact: bool = False,
+        keep_xml: bool = False,
+        fields: Optional[list[str]] = None,
+    ) -> Generator[AssetLike, None, None]:
+        """
+        Yields the assets in this collection in member order.
+
+        Args:
+            get_all (bool): Include the members of sub-collections.
+            prefetch (int): Number of pages to fetch on worker threads ahead of the page being
+                consumed.  Defaults to Collection.prefetch, 0 fetches in lockstep.
+            on_error (callable): Called with (id, exception) for each member whose metadata
+                could not be fetched, possibly from a worker thread.  Defaults to recording
+                the failure in self.errors.
+            compact (bool): Yield AssetRecords rather than Assets.
+            keep_xml (bool): Keep the metadata element on compact records.
+            fields (list): AssetRecord fields to fetch.  When given, only those values are
+                requested from the server and AssetRecords holding them are yielded.
+        """
+        assets = self.iter_assets(get_all, prefetch, on_error, fields)
+        if compact and fields is None:
+            for asset in assets:
+                yield AssetRecord.from_xml(asset.data, keep_xml)
+        else:
+            yield from assets
+
+    def iter_assets(
+        self,
+        get_all=False,
+        prefetch: Optional[int] = None,
+        on_error: Optional[ErrorCallback] = None,
+        fields: Optional[list[str]] = None,
+    ) -> Generator[AssetLike, None, None]:
+        depth = self.prefetch if prefetch is None else prefetch
+        offsets = range(0, self.count_all if get_all else self.count, 1000)
+
+        if depth <= 0:
+            for ix in offsets:
+                yield from self.iter_page(ix, get_all, on_error, fields)
+            return
+
+        pool = Request.executor()
+        pending: deque[Future] = deque()
+        try:
+            for ix in offsets:
+                pending.append(metrics.submit(pool, self.get_page, ix, get_all, on_error, fields))
+                if len(pending) > depth:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def walk(
+        self, max_workers: int = 8, on_error: Optional[ErrorCallback] = None
+    ) -> Generator[tuple[int, str, Asset], None, None]:
+        """
+        Walks the collection tree breadth first, fetching sibling collections concurrently.
+
+        Args:
+            max_workers (int): Number of collections fetched at once, at most Request.workers.
+            on_error (callable): As for get_assets, failures default to this collection's errors.
+
+        Yields:
+            tuple: (depth, path, asset) where depth is 0 for direct members and path is the
+                path of the collection holding the asset, "/" for this collection.
+        """
+        report = self.record_error if on_error is None else on_error
+
+        def members(collection: Collection) -> list:
+            return list(collection.iter_assets(prefetch=0, on_error=report))
+
+        level: list[tuple[Collection, str]] = [(self, "/")]
+        depth = 0
+        pool = Request.executor()
+        pending: deque[tuple[str, Future]] = deque()
+        try:
+            while level:
+                next_level: list[tuple[Collection, str]] = []
+                collections = iter(level)
+                # Keep up to max_workers collections in flight, yielding them in order
+                for collection, path in itertools.islice(collections, max_workers):
+                    pending.append((path, metrics.submit(pool, members, collection)))
+                while pending:
+                    path, page = pending.popleft()
+                    for collection, following in itertools.islice(collections, 1):
+                        pending.append((following, metrics.submit(pool, members, collection)))
+                    for asset in page.result():
+                        yield depth, path, asset
+                        if asset.is_collection:
+                            collection = cast(Collection, Collection.from_xml(asset.data))
+                            next_level.append((collection, f"{path}{asset.name}/"))
+                level = next_level
+                depth += 1
+        finally:
+            for _, page in pending:
+                page.cancel()
+
+    def download(  # type: ignore[override]
+        self,
+        dest: str,
+        max_workers: int = 8,
+        range_workers: int = 1,
+        verify: bool = True,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> list[str]:
+        """
+        Mirrors the collection tree under dest.
+
+        Files that already exist with the right size are skipped, and partial files are
+        resumed.  Assets whose names would place them outside dest, such as "..", are passed
+        to on_error rather than written.
+
+        Args:
+            dest (str): The local directory standing in for this collection.
+            max_workers (int): Number of assets downloaded at once.
+            range_workers (int): Number of byte ranges fetched at once for each large asset.
+            verify (bool): Check each file against the server's CRC32 checksum.
+            on_error (callable): As for get_assets, failures default to self.errors.
+
+        Returns:
+            list: The paths downloaded.
+        """
+        report = self.record_error if on_error is None else on_error
+
+        def fetch(asset: Asset, path: str) -> Optional[str]:
+            try:
+                return asset.download(path, range_workers, verify)
+            except (OSError, ValueError, requests.RequestException) as e:
+                report(cast(str, asset.id), e)
+                return None
+
+        downloads = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mediaflux-mirror") as pool:
+            for _, path, asset in self.walk(on_error=report):
+                local = os.path.join(dest, path.strip("/"), asset.name)
+                if not within(dest, local):
+                    report(cast(str, asset.id), ValueError(f"Asset name {asset.name!r} leads outside {dest}"))
+                    continue
+                if asset.is_collection:
+                    os.makedirs(local, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(local), exist_ok=True)
+                if os.path.exists(local) and os.path.getsize(local) == asset.size:
+                    continue
+                downloads.append(metrics.submit(pool, fetch, asset, local))
+        return [path for path in (f.result() for f in downloads) if path is not None]
+
+    @property
+    def assets(self) -> Generator[AssetLike, None, None]:
         return self.get_assets()
 
     @property
-    def assets_all(self) -> Generator[Asset, None, None]:
+    def assets_all(self) -> Generator[AssetLike, None, None]:
         return self.get_assets(True)
 
 
+Asset.collection_class = Collection
+
+
 class Server(Request):
     def __init__(self) -> None:
         self._version: Optional[dict] = None
@@ -0,0 +1,127 @@
+from collections import deque
+import fnmatch
+import random
+import threading
+from typing import Optional, Union
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# HTTP statuses worth retrying, the server or a proxy in front of it is briefly unavailable
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+# Services that only read, so they can be retried or sent twice without side effects
+READ_ONLY = (
+    "asset.content",
+    "asset.get",
+    "asset.query",
+    "asset.collection.members",
+    "asset.collection.members.count",
+    "server.version",
+    "*.describe",
+    "*.exists",
+    "*.list",
+)
+
+
+class Policy:
+    """How calls to a service are timed out, retried and hedged"""
+
+    def __init__(
+        self,
+        timeout: Optional[Union[float, tuple[float, Optional[float]]]] = None,
+        retries: int = 3,
+        idempotent: bool = False,
+        backoff: float = 0.5,
+        backoff_max: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_delay: float = 0.05,
+    ) -> None:
+        """
+        Args:
+            timeout (float or tuple): Seconds to wait for the server, or a (connect, read) pair.
+                None falls back to Request.timeout.
+            retries (int): Attempts made after the first one fails.
+            idempotent (bool): Whether the call may be repeated.  Calls that are not are only
+                retried when the connection could not be opened, so the server never saw them.
+            backoff (float): Base of the exponential backoff between retries, in seconds.
+            backoff_max (float): Longest wait between retries.
+            hedge_percentile (float): When set, for example 0.95, a second identical call is
+                sent if the first takes longer than this percentile of recent calls to the
+                service, and the first answer wins.  Only for idempotent services.
+            hedge_min_delay (float): Shortest wait before sending a hedged call.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.idempotent = idempotent
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile if idempotent else None
+        self.hedge_min_delay = hedge_min_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt (from 0), with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+    def retryable(self, e: Exception) -> bool:
+        """Whether a failed attempt should be retried"""
+        if isinstance(e, requests.HTTPError):
+            return self.idempotent and e.response is not None and e.response.status_code in RETRY_STATUS
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        if isinstance(e, requests.ConnectionError):
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+            return self.idempotent or isinstance(reason, NewConnectionError)
+        return self.idempotent and isinstance(e, requests.Timeout)
+
+
+class LatencyTracker:
+    """Recent response times of each service, for picking hedging delays"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        """
+        Args:
+            window (int): Number of recent calls kept per service.
+            min_samples (int): Calls needed before percentiles are reported.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, name: str, p: float) -> Optional[float]:
+        """Returns the p (0 to 1) percentile of recent calls, None until there are enough"""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+def default_policies() -> dict[str, Policy]:
+    """Read-only services are retried on any transient failure, with a read timeout"""
+    return {pattern: Policy(timeout=(10, 300), idempotent=True) for pattern in READ_ONLY}
+
+
+def find_policy(policies: dict[str, Policy], name: Optional[str], default: Policy) -> Policy:
+    """Returns the policy for a service, exact names first and then patterns in order"""
+    if name is None:
+        return default
+    policy = policies.get(name)
+    if policy is not None:
+        return policy
+    for pattern, policy in policies.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            return policy
+    return default
@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
+import sys
+import time
+from typing import Iterable, Optional
+
+import click
+
+from . import cli, orm
+from .util import RateLimiter
+
+# Sample argument values used to exercise filters, by argument type
+SAMPLE_VALUES: dict[str, list] = {
+    "asset-id": [100],
+    "date": ["01-Jan-2024"],
+    "integer": [100],
+    "string": ["hello"],
+}
+
+
+class QueryResult:
+    """
+    Outcome of one query.  count is the number of matches in "count" mode, and 0 or 1 in
+    "check" mode; error holds the message of a failed query.
+    """
+
+    __slots__ = ("query", "count", "elapsed", "error")
+
+    def __init__(self, query: str, count: Optional[int], elapsed: float, error: Optional[str] = None) -> None:
+        self.query = query
+        self.count = count
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        return {"query": self.query, "count": self.count, "elapsed": self.elapsed, "error": self.error}
+
+
+def filter_queries(filters: Iterable[orm.Filter]) -> list[str]:
+    """
+    Returns a query for every combination of sample argument values of each filter, using
+    every value of enumerated arguments.
+    """
+    rv = []
+    for f in filters:
+        ops = {
+            arg.name: list(arg.restrictions.values()) if arg.type == "enumeration" else SAMPLE_VALUES[arg.type]
+            for arg in f.args
+        }
+        for c in itertools.product(*ops.values()):
+            rv.append(f.query_str(**dict(zip(ops.keys(), c))))
+    return rv
+
+
+def run_query(query: str, mode: str = "count") -> QueryResult:
+    """Runs one query, catching service and HTTP errors into the result"""
+    start = time.perf_counter()
+    try:
+        if mode == "count":
+            count = orm.Asset.query_count(query)
+        elif mode == "check":
+            count = int(orm.Asset.query_check(query))
+        else:
+            raise ValueError(f'Unknown mode "{mode}", expecting "count" or "check"')
+    except (ValueError, OSError) as e:
+        return QueryResult(query, None, time.perf_counter() - start, str(e))
+    return QueryResult(query, count, time.perf_counter() - start)
+
+
+def run_queries(
+    queries: Iterable[str],
+    mode: str = "count",
+    workers: int = 16,
+    rate: Optional[float] = None,
+) -> list[QueryResult]:
+    """
+    Runs many queries concurrently without fetching any asset metadata.
+
+    Args:
+        queries: The where clauses.
+        mode (str): "count" counts the matches of each query, "check" only asks for the first
+            matching id, which is enough to validate a query and usually quicker.
+        workers (int): Queries in flight at once.
+        rate (float): Maximum queries started per second, None for no limit.
+
+    Returns:
+        A QueryResult per query, in the order given.
+    """
+    if mode not in ("count", "check"):
+        raise ValueError(f'Unknown mode "{mode}", expecting "count" or "check"')
+    limiter = RateLimiter(rate)
+
+    def run(query: str) -> QueryResult:
+        limiter.wait()
+        return run_query(query, mode)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mediaflux-query") as pool:
+        return list(pool.map(run, queries))
+
+
+@click.command()
+@click.argument("files", nargs=-1, type=click.File("r"))
+@click.option("--filters", is_flag=True, help="Also run sample queries for every filter on the server")
+@click.option("--mode", type=click.Choice(["count", "check"]), default="count", help="What to ask of each query")
+@click.option("--workers", type=int, default=16, help="Queries in flight at once")
+@click.option("--rate", type=float, default=None, help="Maximum queries started per second")
+def main(files, filters: bool, mode: str, workers: int, rate: Optional[float]) -> None:
+    """Runs the queries in FILES, one per line, printing a JSON line per query"""
+    cli.connect()
+    queries = [line.strip() for f in files for line in f if line.strip()]
+    if filters:
+        for ns in orm.Namespace.filter_spaces():
+            queries += filter_queries(ns.describe_filters())
+
+    results = run_queries(queries, mode, workers, rate)
+    for result in results:
+        click.echo(json.dumps(result.to_dict()))
+    failed = sum(not r.ok for r in results)
+    click.echo(f"{len(results)} queries, {failed} failed", err=True)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+"""
+A local stand-in for a Mediaflux server, for tests and benchmarks.
+
+It answers the XML service protocol over HTTP for the services this package uses, serving an
+in-memory tree of assets and collections, and their content with byte ranges.
+"""
+
+from email.parser import BytesParser
+from email.policy import HTTP
+import functools
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import re
+import threading
+import time
+from typing import Callable, Mapping, Optional, cast
+import urllib.parse
+import zlib
+
+from lxml import etree
+
+from . import orm
+from .transport import CallableTransport
+
+
+class StandInAsset:
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        parent: Optional[str],
+        collection: bool = False,
+        content: Optional[bytes] = None,
+        meta: Optional[list["etree._Element"]] = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.parent = parent
+        self.collection = collection
+        self.content = content
+        self.meta = meta or []
+        self.members: list[str] = []
+        self.ctime = int(time.time() * 1000)
+        self.stime = 1
+
+    def xml(self) -> "etree._Element":
+        """The asset as asset.get describes it"""
+        e = etree.Element("asset", id=self.id, version="1")
+        if self.collection:
+            e.set("collection", "true")
+        if self.parent is not None:
+            etree.SubElement(e, "parent").text = self.parent
+        name = etree.SubElement(e, "name")
+        name.text = self.name
+        if "." in self.name:
+            name.set("ext", self.name.rsplit(".", 1)[1])
+        etree.SubElement(e, "type").text = "collection" if self.collection else MIMETYPES.get(name.get("ext"), "")
+        etree.SubElement(e, "ctime", millisec=str(self.ctime)).text = time.strftime(
+            "%d-%b-%Y %H:%M:%S", time.localtime(self.ctime / 1000)
+        )
+        etree.SubElement(e, "stime").text = str(self.stime)
+        if self.meta:
+            meta = etree.SubElement(e, "meta")
+            meta.extend(etree.fromstring(etree.tostring(m)) for m in self.meta)
+        if self.content is not None:
+            content = etree.SubElement(e, "content")
+            etree.SubElement(content, "type").text = MIMETYPES.get(name.get("ext"), "content/unknown")
+            etree.SubElement(content, "size").text = str(len(self.content))
+            crc = zlib.crc32(self.content)
+            etree.SubElement(content, "csum", base="10").text = str(crc)
+            etree.SubElement(content, "csum", base="16").text = f"{crc:X}"
+        return e
+
+
+MIMETYPES = {
+    "jpg": "image/jpeg",
+    "tif": "image/tiff",
+    "dng": "image/x-adobe-dng",
+    "pdf": "application/pdf",
+    "mp4": "video/mp4",
+}
+
+
+class Fault:
+    """A failure or delay injected into one call"""
+
+    __slots__ = ("status", "delay", "truncate")
+
+    def __init__(self, status: Optional[int], delay: float, truncate: Optional[int] = None) -> None:
+        self.status = status
+        self.delay = delay
+        self.truncate = truncate
+
+
+class StandIn:
+    """
+    Serves an in-memory Mediaflux on a local port.
+
+    Example:
+        with StandIn() as server:
+            root = server.add_collection("DAM-2")
+            server.add_asset("a.jpg", root, b"...")
+            server.connect()
+            orm.Collection(root).count
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        Args:
+            latency (float): Seconds each service call waits before answering.
+        """
+        self.latency = latency
+        self.assets: dict[str, StandInAsset] = {}
+        # Names of the services called, in order, "asset.content" for content downloads
+        self.calls: list[str] = []
+        # Range headers of the content downloads, in order, None for whole downloads
+        self.ranges: list[Optional[str]] = []
+        # Number of HTTP connections accepted
+        self.connections = 0
+        # Faults to inject by service name, see inject
+        self.faults: dict[str, list[Fault]] = {}
+        self._next_id = 1000
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self.services: dict[str, Callable[["etree._Element", list], "etree._Element"]] = {
+            "server.version": self.server_version,
+            "asset.get": self.asset_get,
+            "asset.query": self.asset_query,
+            "asset.create": self.asset_create,
+            "asset.collection.members": self.collection_members,
+            "asset.collection.members.count": self.collection_members_count,
+            "service.execute": self.service_execute,
+        }
+        # Filter namespaces, filters and forms by their identifying argument values
+        self.definitions: dict[str, dict[tuple, "etree._Element"]] = {}
+        for kind, prefix in DEFINITION_SERVICES.items():
+            self.definitions[kind] = {}
+            for action in ("list", "describe", "exists", "create", "destroy"):
+                service = getattr(self, f"definition_{action}")
+                self.services[f"{prefix}.{action}"] = functools.partial(service, kind)
+
+    def inject(
+        self,
+        service: str,
+        status: Optional[int] = None,
+        delay: float = 0.0,
+        times: int = 1,
+        truncate: Optional[int] = None,
+    ) -> None:
+        """
+        Makes the next calls to a service fail or answer late, for testing timeouts and retries.
+
+        Args:
+            service (str): The service name.
+            status (int): HTTP status to answer with instead of calling the service.
+            delay (float): Seconds to wait before answering.
+            times (int): Number of calls affected.
+            truncate (int): Send only this many bytes of the response body, then close the
+                connection, as a server or proxy failing mid-response would.
+        """
+        with self._lock:
+            self.faults.setdefault(service, []).extend([Fault(status, delay, truncate)] * times)
+
+    def fault(self, service: str) -> Optional["Fault"]:
+        with self._lock:
+            faults = self.faults.get(service)
+            return faults.pop(0) if faults else None
+
+    @property
+    def url(self) -> str:
+        if self._httpd is None:
+            raise ValueError("Stand-in server is not running")
+        return f"http://127.0.0.1:{self._httpd.server_port}/__mflux_svc__"
+
+    def start(self) -> "StandIn":
+        handler = type("Handler", (StandInHandler,), {"standin": self})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "StandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def connect(self) -> None:
+        """Points Request at this server"""
+        orm.Request.url = self.url
+        orm.Request.headers = {"Content-Type": "application/xml"}
+
+    # Building the asset tree
+
+    def new_id(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            return str(self._next_id)
+
+    def add(self, asset: StandInAsset) -> str:
+        self.assets[asset.id] = asset
+        if asset.parent is not None:
+            self.assets[asset.parent].members.append(asset.id)
+        return asset.id
+
+    def add_collection(self, name: str, parent: Optional[str] = None) -> str:
+        return self.add(StandInAsset(self.new_id(), name, parent, collection=True))
+
+    def add_asset(
+        self,
+        name: str,
+        parent: Optional[str],
+        content: bytes = b"",
+        meta: Optional[list["etree._Element"]] = None,
+    ) -> str:
+        return self.add(StandInAsset(self.new_id(), name, parent, content=content, meta=meta))
+
+    def populate(self, size: int, depth: int = 0, fanout: int = 2, name: str = "synthetic") -> str:
+        """
+        Builds a synthetic collection tree, returning the id of its root.
+
+        Args:
+            size (int): Assets in every collection.
+            depth (int): Levels of sub-collections below the root.
+            fanout (int): Sub-collections in every collection above the last level.
+            name (str): Name of the root collection.
+        """
+        extensions = list(MIMETYPES)
+
+        def fill(id: str, level: int) -> None:
+            for i in range(size):
+                ext = extensions[i % len(extensions)]
+                meta = etree.Element("mf-name")
+                etree.SubElement(meta, "name").text = f"Asset {i} of {id}"
+                self.add_asset(f"asset-{i:06d}.{ext}", id, b"x" * (i % 97), [meta])
+            if level < depth:
+                for i in range(fanout):
+                    fill(self.add_collection(f"{name}-{level + 1}-{i}", id), level + 1)
+
+        root = self.add_collection(name)
+        fill(root, 0)
+        return root
+
+    def members(self, id: str, recursive: bool = False) -> list[str]:
+        rv = []
+        for member in self.assets[id].members:
+            rv.append(member)
+            if recursive and self.assets[member].collection:
+                rv += self.members(member, True)
+        return rv
+
+    # Answering calls
+
+    def respond(self, body: bytes, headers: Mapping[str, str]) -> tuple[int, bytes]:
+        """Answers the body of an HTTP request, returning the status and the response body"""
+        status, out, truncate = self.answer(body, headers)
+        return status, out if truncate is None else out[:truncate]
+
+    def answer(self, body: bytes, headers: Mapping[str, str]) -> tuple[int, bytes, Optional[int]]:
+        """As respond, also returning the length the response is to be cut to, if any"""
+        truncate = None
+        if headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        attachments: list[bytes] = []
+        content_type = headers.get("Content-Type") or ""
+        if content_type.split(";")[0].strip() == "multipart/form-data":
+            message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "request":
+                    body = cast(bytes, part.get_payload(decode=True))
+                elif part.get_filename() is not None:
+                    attachments.append(cast(bytes, part.get_payload(decode=True)))
+
+        response = etree.Element("response")
+        reply = etree.SubElement(response, "reply")
+        try:
+            service = etree.fromstring(body).find("service")
+            if service is None:
+                raise ValueError("Expecting a <service> element")
+            name = service.get("name", "")
+            fault = self.fault(name)
+            if fault is not None:
+                time.sleep(fault.delay)
+                if fault.status is not None:
+                    return fault.status, b"", None
+                truncate = fault.truncate
+            if self.latency:
+                time.sleep(self.latency)
+            args = service.find("args")
+            reply.append(self.call(name, etree.Element("args") if args is None else args, attachments))
+            reply.set("type", "result")
+        except ValueError as e:
+            reply.set("type", "error")
+            etree.SubElement(reply, "message").text = str(e)
+        return 200, etree.tostring(response, xml_declaration=True, encoding="utf-8"), truncate
+
+    def content(self, id: Optional[str], byte_range: Optional[str]) -> tuple[int, dict[str, str], bytes]:
+        """Answers a content download, returning the status, headers and body"""
+        self.calls.append("asset.content")
+        self.ranges.append(byte_range)
+        fault = self.fault("asset.content")
+        if fault is not None:
+            time.sleep(fault.delay)
+            if fault.status is not None:
+                return fault.status, {}, b""
+        asset = self.assets.get(id or "")
+        if asset is None or asset.content is None:
+            return 404, {}, b""
+        data = asset.content
+        if byte_range is None:
+            return 200, {}, data
+        m = BYTE_RANGE.fullmatch(byte_range)
+        if m is None or int(m.group(1)) >= len(data):
+            return 416, {"Content-Range": f"bytes */{len(data)}"}, b""
+        start = int(m.group(1))
+        end = len(data) - 1 if not m.group(2) else min(int(m.group(2)), len(data) - 1)
+        return 206, {"Content-Range": f"bytes {start}-{end}/{len(data)}"}, data[start : end + 1]
+
+    def fetch(self, url: str, headers: Mapping[str, str]) -> tuple[int, dict[str, str], bytes]:
+        """Answers a GET of url, returning the status, headers and body"""
+        parts = urllib.parse.urlsplit(url)
+        if parts.path != "/mflux/content.mfjp":
+            return 404, {}, b""
+        id = urllib.parse.parse_qs(parts.query).get("id", [None])[0]
+        return self.content(id, headers.get("Range"))
+
+    def transport(self) -> CallableTransport:
+        """A transport answering calls in this process, without starting the HTTP server"""
+        return CallableTransport(self.respond, self.fetch)
+
+    # Services, each returns the <result> element or raises ValueError for an error reply
+
+    def call(self, name: str, args: "etree._Element", attachments: list) -> "etree._Element":
+        self.calls.append(name)
+        service = self.services.get(name)
+        if service is None:
+            raise ValueError(f"Service '{name}' does not exist")
+        return service(args, attachments)
+
+    def get_asset(self, id: Optional[str]) -> StandInAsset:
+        asset = self.assets.get(id or "")
+        if asset is None:
+            raise ValueError(f"Asset {id} does not exist")
+        return asset
+
+    def server_version(self, args, attachments) -> "etree._Element":
+        result = etree.Element("result")
+        etree.SubElement(result, "vendor").text = "Arcitecta Pty. Ltd."
+        etree.SubElement(result, "version").text = "4.16.0"
+        return result
+
+    def asset_get(self, args, attachments) -> "etree._Element":
+        result = etree.Element("result")
+        for id in args.xpath("./id/text()"):
+            result.append(self.get_asset(id).xml())
+        return result
+
+    def matches(self, where: str) -> list[StandInAsset]:
+        """
+        A small subset of the query language: "id=1 or id=2", "name = 'x'" and
+        "asset in collection 1", anything else matches every asset that is not a collection.
+        Any of these may be followed by "and xpath(path)='value'" conditions.  Unbalanced
+        quotes are a syntax error.
+        """
+        where = where.strip()
+        if where.replace("\\'", "").count("'") % 2 == 1:
+            raise ValueError(f"Syntax error in query: {where}")
+        where, *conditions = where.split(" and xpath(")
+        if where.startswith("(") and where.endswith(")"):
+            where = where[1:-1]
+
+        if where.startswith("id="):
+            ids = [term.strip()[3:] for term in where.split(" or ")]
+            rv = [self.assets[id] for id in ids if id in self.assets]
+        elif where.startswith("name = "):
+            name = where.split("'")[1]
+            rv = [a for a in self.assets.values() if a.name == name]
+        elif where.startswith("asset in collection "):
+            rv = [self.assets[id] for id in self.members(where.rsplit(" ", 1)[1], True)]
+        else:
+            rv = [a for a in self.assets.values() if not a.collection]
+
+        for condition in conditions:
+            path, value = condition.split(")=", 1)
+            value = value.strip("'").replace("\\'", "'")
+            rv = [a for a in rv if value in values(a.xml(), path)]
+        return rv
+
+    def asset_query(self, args, attachments) -> "etree._Element":
+        matches = self.matches(args.findtext("where") or "")
+        idx = int(args.findtext("idx") or 1)
+        size = int(args.findtext("size") or 100)
+        page = matches[idx - 1 : idx - 1 + size]
+        action = args.findtext("action") or "get-id"
+
+        result = etree.Element("result")
+        if action == "count":
+            etree.SubElement(result, "value").text = str(len(matches))
+        elif action == "get-meta":
+            result.extend(a.xml() for a in page)
+        elif action == "sum":
+            xpath = args.findtext("xpath") or ""
+            total = sum((float(v) for a in matches for v in values(a.xml(), xpath)), 0.0)
+            etree.SubElement(result, "value").text = str(int(total)) if total.is_integer() else str(total)
+        elif action == "get-distinct-values":
+            xpath = args.findtext("xpath") or ""
+            counts: dict[str, int] = {}
+            for a in matches:
+                for v in values(a.xml(), xpath):
+                    counts[v] = counts.get(v, 0) + 1
+            for v, n in sorted(counts.items()):
+                etree.SubElement(result, "value", nbe=str(n)).text = v
+        elif action == "get-value":
+            xpaths = args.findall("xpath")
+            for a in page:
+                full = a.xml()
+                value = etree.SubElement(result, "asset", id=a.id)
+                for xpath in xpaths:
+                    found = values(full, xpath.text)
+                    if found:
+                        etree.SubElement(value, xpath.get("ename") or "value").text = found[0]
+        else:
+            for a in page:
+                etree.SubElement(result, "id").text = a.id
+        return result
+
+    def asset_create(self, args, attachments) -> "etree._Element":
+        pid = args.findtext("pid")
+        if pid is not None:
+            self.get_asset(pid)
+        meta = args.find("meta")
+        content = attachments[0] if attachments else None
+        id = self.add(
+            StandInAsset(
+                self.new_id(),
+                args.findtext("name") or "",
+                pid,
+                content=content,
+                meta=None if meta is None else list(meta),
+            )
+        )
+        result = etree.Element("result")
+        etree.SubElement(result, "id").text = id
+        return result
+
+    def collection_members(self, args, attachments) -> "etree._Element":
+        members = self.members(args.findtext("id"), args.findtext("include-subcollections") == "true")
+        idx = int(args.findtext("idx") or 1)
+        size = int(args.findtext("size") or 100)
+        result = etree.Element("result")
+        for id in members[idx - 1 : idx - 1 + size]:
+            etree.SubElement(result, "id").text = id
+        return result
+
+    def collection_members_count(self, args, attachments) -> "etree._Element":
+        members = self.members(args.findtext("id"), args.findtext("include-subcollections") == "true")
+        result = etree.Element("result")
+        etree.SubElement(result, "count").text = str(len(members))
+        return result
+
+    def definition_key(self, kind: str, args: "etree._Element") -> tuple:
+        return tuple(args.findtext(arg) for arg in DEFINITION_KEYS[kind])
+
+    def definition_list(self, kind: str, args, attachments) -> "etree._Element":
+        result = etree.Element("result")
+        scope = self.definition_key(kind, args)[:-1]
+        for key in self.definitions[kind]:
+            if key[:-1] == scope:
+                etree.SubElement(result, kind).text = key[-1]
+        return result
+
+    def definition_describe(self, kind: str, args, attachments) -> "etree._Element":
+        key = self.definition_key(kind, args)
+        if key not in self.definitions[kind]:
+            raise ValueError(f"No {kind} {':'.join(key)}")
+        result = etree.Element("result")
+        result.append(etree.fromstring(etree.tostring(self.definitions[kind][key])))
+        return result
+
+    def definition_exists(self, kind: str, args, attachments) -> "etree._Element":
+        result = etree.Element("result")
+        etree.SubElement(result, "exists").text = str(self.definition_key(kind, args) in self.definitions[kind]).lower()
+        return result
+
+    def definition_create(self, kind: str, args, attachments) -> "etree._Element":
+        key = self.definition_key(kind, args)
+        if key in self.definitions[kind]:
+            raise ValueError(f"The {kind} {':'.join(key)} already exists")
+        if kind == "filter" and key[:1] not in self.definitions["namespace"]:
+            raise ValueError(f"No namespace {key[0]}")
+        # Namespaces describe themselves as <namespace name="...">
+        e = etree.Element(kind, {"name": key[0]} if kind == "namespace" else dict(zip(DEFINITION_KEYS[kind], key)))
+        for child in args:
+            if child.tag in DEFINITION_KEYS[kind]:
+                continue
+            child = etree.fromstring(etree.tostring(child))
+            # Describe reports types as <type><name>, the reverse of Filter.create
+            for t in child.iter("type"):
+                if t.get("type") is not None:
+                    etree.SubElement(t, "name").text = t.attrib.pop("type")
+                    t.insert(0, t[-1])
+            e.append(child)
+        self.definitions[kind][key] = e
+        return etree.Element("result")
+
+    def definition_destroy(self, kind: str, args, attachments) -> "etree._Element":
+        key = self.definition_key(kind, args)
+        if self.definitions[kind].pop(key, None) is None:
+            raise ValueError(f"No {kind} {':'.join(key)}")
+        if kind == "namespace":
+            for k in [k for k in self.definitions["filter"] if k[0] == key[0]]:
+                del self.definitions["filter"][k]
+        return etree.Element("result")
+
+    def service_execute(self, args, attachments) -> "etree._Element":
+        result = etree.Element("result")
+        for service in args.findall("service"):
+            reply = etree.SubElement(result, "reply", service=service.get("name"))
+            try:
+                response = self.call(service.get("name"), service, [])
+            except ValueError as e:
+                error = etree.SubElement(reply, "error")
+                etree.SubElement(error, "message").text = str(e)
+                continue
+            etree.SubElement(reply, "response").extend(list(response))
+        return result
+
+
+# Service name prefix and identifying arguments of each kind of definition
+DEFINITION_SERVICES = {"namespace": "asset.filter.namespace", "filter": "asset.filter", "form": "asset.form"}
+DEFINITION_KEYS = {"namespace": ("namespace",), "filter": ("namespace", "name"), "form": ("name",)}
+
+
+def cast_xpath(path: str) -> str:
+    """Relative xpaths in requests are relative to the asset"""
+    return path if path.startswith((".", "/", "@")) else f"./{path}"
+
+
+def values(asset: "etree._Element", path: str) -> list[str]:
+    """The text of the nodes an xpath selects in an asset"""
+    return [v if isinstance(v, str) else v.text or "" for v in asset.xpath(cast_xpath(path))]
+
+
+# A single byte range, the only form Asset.get_content requests
+BYTE_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    standin: StandIn
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def setup(self) -> None:
+        # One handler serves every request on a kept-alive connection
+        super().setup()
+        with self.standin._lock:
+            self.standin.connections += 1
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, out, truncate = self.standin.answer(body, cast(Mapping[str, str], self.headers))
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        if truncate is not None:
+            out = out[:truncate]
+            self.close_connection = True
+        self.wfile.write(out)
+
+    def do_GET(self) -> None:
+        status, headers, out = self.standin.fetch(self.path, cast(Mapping[str, str], self.headers))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(out)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(out)
@@ -0,0 +1,191 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+from typing import Callable, Iterable, Optional, cast
+
+import click
+
+from . import cli, orm
+from .util import MergeDict, add
+
+# Computes the partial stats of a shard from its assets, must be a module level function so
+# that it can be sent to worker processes
+Mapper = Callable[[Iterable[orm.AssetLike]], dict]
+
+
+class Shard:
+    """A unit of work: the direct members of a collection, or its whole subtree"""
+
+    __slots__ = ("id", "recursive")
+
+    def __init__(self, id: str, recursive: bool) -> None:
+        self.id = id
+        self.recursive = recursive
+
+    @property
+    def name(self) -> str:
+        return f"{self.id}-all" if self.recursive else f"{self.id}-members"
+
+
+def asset_stats(records: Iterable[orm.AssetLike]) -> dict:
+    """The default mapper: asset count, content size, and counts by mimetype and extension"""
+    count = 0
+    size = 0
+    mimetypes: Counter = Counter()
+    extensions: Counter = Counter()
+    for record in records:
+        if record.is_collection:
+            continue
+        count += 1
+        size += record.size or 0
+        mimetypes[record.mimetype or ""] += 1
+        extensions[(record.extension or "").lower()] += 1
+    return {"count": count, "size": size, "mimetype": dict(mimetypes), "extension": dict(extensions)}
+
+
+# Fields asset_stats reads
+ASSET_STATS_FIELDS = ["is_collection", "size", "mimetype", "extension"]
+
+
+def shards(collection: str, depth: int = 1) -> list[Shard]:
+    """
+    Splits a collection tree into shards: the direct members of every collection down to depth
+    and the whole subtree of each collection at depth.
+    """
+    rv = [Shard(collection, False)]
+    for member in orm.Collection(collection).get_assets(fields=["is_collection"]):
+        if member.is_collection:
+            id = cast(str, member.id)
+            rv += shards(id, depth - 1) if depth > 1 else [Shard(id, True)]
+    return rv
+
+
+def connect_worker(url: str, headers: dict[str, str]) -> None:
+    """Process pool initializer, workers start without the parent's connection settings"""
+    orm.Request.url = url
+    orm.Request.headers = headers
+
+
+def map_shard(shard: Shard, mapper: Mapper, fields: list[str]) -> tuple[str, dict]:
+    """Computes the partial stats of a shard from its streamed asset records"""
+    collection = orm.Collection(shard.id)
+    records = collection.get_assets(shard.recursive, fields=fields)
+    return shard.name, mapper(records)
+
+
+def merge_pair(pair: tuple[dict, Optional[dict]]) -> dict:
+    """Merges right into left, which is modified"""
+    left, right = pair
+    if right is not None:
+        add(left, right)
+    return left
+
+
+def reduce_tree(partials: list[dict]) -> MergeDict:
+    """
+    Merges partial results pairwise, level by level, so that no single merge grows with the
+    number of partials.  The partials given are left untouched.
+
+    Merges run in this process: adding two partials costs less than pickling them to a worker
+    and the result back.
+    """
+    if len(partials) == 0:
+        return MergeDict()
+    level: list[dict] = [MergeDict() + p for p in partials]
+    while len(level) > 1:
+        pairs = [(level[ix], level[ix + 1] if ix + 1 < len(level) else None) for ix in range(0, len(level), 2)]
+        level = [merge_pair(pair) for pair in pairs]
+    return MergeDict(level[0])
+
+
+class Checkpoint:
+    """
+    A directory of partial results, one JSON file per finished shard.  Values must be JSON
+    serialisable, Counters come back as dicts and merge the same way.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def load(self) -> dict[str, dict]:
+        rv = {}
+        for fn in os.listdir(self.path):
+            if fn.endswith(".json"):
+                with open(os.path.join(self.path, fn), encoding="utf-8") as f:
+                    rv[fn[:-5]] = json.load(f)
+        return rv
+
+    def save(self, name: str, partial: dict) -> None:
+        # Write then rename so that an interrupted run never leaves half a file behind
+        fn = os.path.join(self.path, f"{name}.json")
+        with open(fn + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(partial, f)
+        os.replace(fn + ".tmp", fn)
+
+
+def collection_stats(
+    collection: str,
+    mapper: Mapper = asset_stats,
+    fields: Optional[list[str]] = None,
+    processes: Optional[int] = None,
+    depth: int = 1,
+    checkpoint: Optional[str] = None,
+) -> MergeDict:
+    """
+    Computes stats over a collection tree with map-reduce on a process pool.
+
+    The tree is split into shards (see shards), each worker process streams the asset records
+    of a shard and maps them to a partial result, and the partials are merged with a tree
+    reduction using util.add.
+
+    Args:
+        collection (str): Id of the root collection.
+        mapper (Callable): Computes a partial result from an iterable of AssetRecords.
+        fields (list): AssetRecord fields the mapper needs, defaults to those of asset_stats.
+        processes (int): Size of the process pool, defaults to the number of CPUs.
+        depth (int): How many collection levels are split into separate shards.
+        checkpoint (str): Directory where partial results are saved as shards finish, shards
+            already saved there are not computed again.
+
+    Returns:
+        MergeDict: The merged stats.
+    """
+    fields = ASSET_STATS_FIELDS if fields is None else fields
+    store = None if checkpoint is None else Checkpoint(checkpoint)
+    done = {} if store is None else store.load()
+    split = shards(collection, depth)
+
+    partials = dict(done)
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=connect_worker,
+        initargs=(orm.Request.url, orm.Request.headers),
+    ) as pool:
+        futures = [pool.submit(map_shard, shard, mapper, fields) for shard in split if shard.name not in done]
+        for future in as_completed(futures):
+            name, partial = future.result()
+            if store is not None:
+                store.save(name, partial)
+            partials[name] = partial
+    # Reduce in shard order so that results with lists come out the same on every run
+    return reduce_tree([partials[shard.name] for shard in split])
+
+
+@click.command()
+@click.argument("collection")
+@click.option("--processes", type=int, default=None, help="Worker processes, defaults to the CPU count")
+@click.option("--depth", type=int, default=1, help="Collection levels split into separate shards")
+@click.option("--checkpoint", type=click.Path(file_okay=False), default=None, help="Directory of partial results for resuming")
+def main(collection: str, processes: Optional[int], depth: int, checkpoint: Optional[str]) -> None:
+    """Prints the asset count, size and mimetype and extension counts of COLLECTION as JSON"""
+    cli.connect()
+    stats = collection_stats(collection, processes=processes, depth=depth, checkpoint=checkpoint)
+    json.dump(stats, sys.stdout, indent=2, sort_keys=True)
+    click.echo()
+
+
+if __name__ == "__main__":
+    main()
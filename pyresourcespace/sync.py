@@ -0,0 +1,261 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
+from lxml import etree
+import os
+import sys
+from typing import Optional, Sequence, Union
+
+import click
+
+from . import cli, orm
+
+Definition = Union[orm.Namespace, orm.Filter, orm.Form]
+
+
+class Change:
+    """A create, update or destroy of one namespace, filter or form"""
+
+    __slots__ = ("action", "obj", "error")
+
+    def __init__(self, action: str, obj: Definition) -> None:
+        self.action = action
+        self.obj = obj
+        self.error: Optional[Exception] = None
+
+    @property
+    def kind(self) -> str:
+        return self.obj.cache_key[0]
+
+    @property
+    def key(self) -> str:
+        return ":".join(self.obj.cache_key[1:])
+
+    def calls(self) -> list[tuple]:
+        if self.action == "destroy":
+            return [self.obj.destroy_call()]
+        return self.obj.create_calls(self.action == "update")
+
+    def __str__(self) -> str:
+        return f"{self.action} {self.kind} {self.key}"
+
+
+def load_definitions(root: str) -> list[Definition]:
+    """
+    Loads the exported definitions under a directory, as written by export().
+
+    Files are recognised by their root element, <namespace>, <filter> or <form>.  Filters
+    exported without a namespace attribute take it from a "namespace:name.xml" file name.
+    """
+    paths = sorted(os.path.join(d, fn) for d, _, fns in os.walk(root) for fn in fns if fn.endswith(".xml"))
+    rv: list[Definition] = []
+    for path in paths:
+        fn = os.path.basename(path)
+        xml = etree.parse(path, etree.XMLParser(remove_blank_text=True)).getroot()
+        if xml.tag == "namespace":
+            rv.append(orm.Namespace.from_xml(xml))
+        elif xml.tag == "filter":
+            if xml.get("namespace") is None and ":" in fn:
+                xml.set("namespace", fn.split(":", 1)[0])
+                xml.set("name", xml.get("name") or fn[:-4].split(":", 1)[1])
+            rv.append(orm.Filter.from_xml(xml))
+        elif xml.tag == "form":
+            rv.append(orm.Form.from_xml(xml))
+        else:
+            raise ValueError(f"{fn}: unknown definition <{xml.tag!s}>")
+    return rv
+
+
+def normalize(xml: "etree._Element") -> bytes:
+    """
+    Canonical form of a definition for comparison: C14N with whitespace stripped and filter
+    argument types in the form asset.filter.create takes them.
+    """
+    return etree.tostring(orm.transform_type_elements(copy.deepcopy(xml)), method="c14n2", strip_text=True)
+
+
+def describe_all(objs: Sequence[Definition]) -> list[Definition]:
+    """Fetches the current definitions of objects that exist on the server in one batch"""
+    with orm.Request.batch() as batch:
+        calls = [(obj, batch.post(*obj.describe_call())) for obj in objs]
+    for obj, call in calls:
+        obj._data = call.result().getchildren()[0]
+        orm.Request.cache.put(obj.cache_key, obj._data)
+    return list(objs)
+
+
+def server_state(local: list[Definition], workers: int = 8) -> dict[tuple, Definition]:
+    """
+    Fetches the server's definitions of everything that could change, keyed by cache_key:
+    the local namespaces and forms, and every filter in the local namespaces.
+
+    Filter lists and descriptions are fetched concurrently, a batch per namespace.
+    """
+    namespaces = {obj.namespace for obj in local if isinstance(obj, orm.Namespace)}
+    namespaces |= {obj.namespace for obj in local if isinstance(obj, orm.Filter)}
+    forms = {obj.name for obj in local if isinstance(obj, orm.Form)}
+
+    with orm.Request.batch() as batch:
+        ns_list = batch.post("asset.filter.namespace.list")
+        form_list = batch.post("asset.form.list") if forms else None
+    existing_ns = [orm.Namespace(ns) for ns in ns_list.result().xpath("./namespace/text()") if ns in namespaces]
+    existing_forms = [] if form_list is None else [orm.Form(f) for f in form_list.result().xpath("./form/text()") if f in forms]
+
+    def fetch(ns: orm.Namespace) -> list[Definition]:
+        return describe_all([ns, *ns.filters])
+
+    rv: dict[tuple, Definition] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch, ns) for ns in existing_ns]
+        if existing_forms:
+            futures.append(pool.submit(describe_all, existing_forms))
+        for future in futures:
+            rv.update((obj.cache_key, obj) for obj in future.result())
+    return rv
+
+
+def plan(local: list[Definition], prune: bool = False, workers: int = 8) -> list[Change]:
+    """
+    Compares local definitions with the server's and returns the changes needed, in the order
+    they must be applied.
+
+    Args:
+        local (list): Definitions, see load_definitions.
+        prune (bool): Also destroy filters in the local namespaces that have no local definition.
+        workers (int): Concurrent requests used to fetch the server state.
+    """
+    server = server_state(local, workers)
+    replaced: set[Optional[str]] = set()
+    namespaces: list[Change] = []
+    filters: list[Change] = []
+    forms: list[Change] = []
+    for obj in local:
+        current = server.get(obj.cache_key)
+        if current is None:
+            change = Change("create", obj)
+        elif normalize(current.data) != normalize(obj.data):
+            change = Change("update", obj)
+        else:
+            continue
+        if isinstance(obj, orm.Namespace):
+            namespaces.append(change)
+            if change.action == "update":
+                replaced.add(obj.namespace)
+        else:
+            (filters if isinstance(obj, orm.Filter) else forms).append(change)
+
+    # Replacing a namespace destroys its filters, so they are all created again
+    keys = {c.obj.cache_key for c in filters}
+    for obj in local:
+        if isinstance(obj, orm.Filter) and obj.namespace in replaced:
+            if obj.cache_key in keys:
+                next(c for c in filters if c.obj.cache_key == obj.cache_key).action = "create"
+            else:
+                filters.append(Change("create", obj))
+
+    if prune:
+        wanted = {obj.cache_key for obj in local}
+        for key, obj in server.items():
+            if isinstance(obj, orm.Filter) and key not in wanted and obj.namespace not in replaced:
+                filters.insert(0, Change("destroy", obj))
+    return namespaces + filters + forms
+
+
+def groups(changes: list[Change]) -> list[list[Change]]:
+    """
+    Splits changes into the groups that must be sent in one batch: each namespace change with
+    the changes to the filters in that namespace, so that a replaced namespace is never left
+    without its filters, and every other change on its own.
+    """
+    namespaces = {c.obj.namespace for c in changes if isinstance(c.obj, orm.Namespace)}
+    rv: list[list[Change]] = []
+    by_namespace: dict[Optional[str], list[Change]] = {}
+    for change in changes:
+        if isinstance(change.obj, orm.Namespace):
+            group = by_namespace.setdefault(change.obj.namespace, [])
+            group.insert(0, change)
+            if len(group) == 1:
+                rv.append(group)
+        elif isinstance(change.obj, orm.Filter) and change.obj.namespace in namespaces:
+            group = by_namespace.setdefault(change.obj.namespace, [])
+            group.append(change)
+            if len(group) == 1:
+                rv.append(group)
+        else:
+            rv.append([change])
+    return rv
+
+
+def apply(changes: list[Change], batch_size: int = 100) -> list[Change]:
+    """
+    Sends the calls for the changes, batching up to batch_size calls per round trip.  An
+    update's destroy and create travel in the same batch, as do a namespace's changes and those
+    of its filters, even when they add up to more than batch_size calls.  Unchanged definitions
+    are not touched.
+
+    Returns:
+        The changes that failed, each with the error of its first failed call.
+    """
+    failed: list[Change] = []
+    pending = groups(changes)
+    ix = 0
+    while ix < len(pending):
+        chunk: list[tuple[Change, list[orm.BatchCall]]] = []
+        ncalls = 0
+        with orm.Request.batch() as batch:
+            while ix < len(pending):
+                calls = [(change, change.calls()) for change in pending[ix]]
+                size = sum(len(c) for _, c in calls)
+                if ncalls > 0 and ncalls + size > batch_size:
+                    break
+                chunk += [(change, [batch.post(*c) for c in cs]) for change, cs in calls]
+                ncalls += size
+                ix += 1
+        for change, results in chunk:
+            orm.Request.cache.invalidate(change.obj.cache_key)
+            for call in results:
+                try:
+                    call.result()
+                except ValueError as e:
+                    change.error = e
+                    failed.append(change)
+                    break
+    return failed
+
+
+def sync(root: str, dry_run: bool = False, prune: bool = False, workers: int = 8) -> list[Change]:
+    """
+    Brings the server's filter namespaces, filters and forms in line with the exported
+    definitions in a directory, sending calls only for those that differ.
+
+    Args:
+        root (str): Directory of definitions, see load_definitions.
+        dry_run (bool): Only work out the changes.
+        prune (bool): Also destroy filters in the local namespaces that have no local definition.
+        workers (int): Concurrent requests used to fetch the server state.
+
+    Returns:
+        The changes, applied unless dry_run is set.  Failed changes have their error set.
+    """
+    changes = plan(load_definitions(root), prune, workers)
+    if not dry_run:
+        apply(changes)
+    return changes
+
+
+@click.command()
+@click.argument("root", type=click.Path(exists=True, file_okay=False))
+@click.option("--dry-run", is_flag=True, help="Show the changes without making them")
+@click.option("--prune", is_flag=True, help="Destroy filters that have no local definition")
+@click.option("--workers", type=int, default=8, help="Concurrent requests when reading the server")
+def main(root: str, dry_run: bool, prune: bool, workers: int) -> None:
+    """Syncs the filter namespaces, filters and forms exported in ROOT to the server"""
+    cli.connect()
+    changes = sync(root, dry_run, prune, workers)
+    for change in changes:
+        click.echo(f"{change}{'' if change.error is None else f': FAILED {change.error}'}")
+    click.echo(f"{len(changes)} change{'' if len(changes) == 1 else 's'}{' (dry run)' if dry_run else ''}")
+    sys.exit(0 if all(c.error is None for c in changes) else 1)
+
+
+if __name__ == "__main__":
+    main()
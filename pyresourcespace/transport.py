@@ -0,0 +1,237 @@
+"""
+Transports carry service calls between Request and a server.
+
+A transport takes the URL, headers and body of a call, or the URL of content to download,
+and returns a requests.Response, so everything above it (retries, parsing, streaming,
+metrics) works the same whichever is used:
+- HTTPTransport sends calls over the pooled per-thread sessions, the default
+- CallableTransport hands them to a function in the same process, see StandIn.transport
+- Recorder saves the responses of another transport to a directory, or answers calls from
+  such a directory without any network
+"""
+
+import gzip
+import hashlib
+from http.client import responses
+import io
+import os
+import re
+import threading
+from typing import Callable, Mapping, Optional, Protocol, Union, cast
+import urllib.parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+# A timeout in seconds, or a (connect, read) pair
+Timeout = Optional[Union[float, tuple[float, Optional[float]]]]
+
+
+class Transport(Protocol):
+    """Sends the body of a service call, returning the HTTP response"""
+
+    def post(self, url: str, headers: Mapping[str, str], data, timeout: Timeout, stream: bool) -> requests.Response:
+        """
+        Args:
+            url (str): The service URL, Request.url.
+            headers (dict): The request headers.
+            data (bytes or file-like): The body, a file-like object for uploads.
+            timeout: Seconds to wait for the server, or a (connect, read) pair.
+            stream (bool): Whether the caller reads the body from response.raw as it arrives.
+        """
+        ...
+
+    def get(self, url: str, headers: Mapping[str, str], timeout: Timeout, stream: bool) -> requests.Response:
+        """Fetches content such as an asset download, the arguments are as for post"""
+        ...
+
+
+class HTTPTransport(Transport):
+    """Posts calls on the sessions returned by session, Request.session by default"""
+
+    def __init__(self, session: Callable[[], requests.Session]) -> None:
+        self.session = session
+
+    def post(self, url: str, headers: Mapping[str, str], data, timeout: Timeout, stream: bool) -> requests.Response:
+        return self.session().post(url, headers=headers, data=data, timeout=timeout, stream=stream)
+
+    def get(self, url: str, headers: Mapping[str, str], timeout: Timeout, stream: bool) -> requests.Response:
+        return self.session().get(url, headers=headers, timeout=timeout, stream=stream)
+
+
+def read_body(data) -> bytes:
+    """The whole body of a call, reading file-like bodies"""
+    return data if isinstance(data, bytes) else data.read()
+
+
+def make_response(
+    url: str, status: int, body: bytes, stream: bool, headers: Optional[Mapping[str, str]] = None
+) -> requests.Response:
+    """Builds a response as requests would from a server's answer, a service reply by default"""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.reason = responses.get(status, "")
+    response.headers = CaseInsensitiveDict({"Content-Type": "text/xml; charset=utf-8", **(headers or {})})
+    response.headers["Content-Length"] = str(len(body))
+    response.raw = HTTPResponse(body=io.BytesIO(body), headers=response.headers, status=status, preload_content=False)
+    if not stream:
+        response.content  # Read the body now, as requests does
+    return response
+
+
+class CallableTransport(Transport):
+    """
+    Answers calls in the same process with handler(body, headers), which returns the HTTP
+    status and the response body, and content downloads with content(url, headers), which
+    also returns the response headers.  Timeouts are not applied.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[bytes, Mapping[str, str]], tuple[int, bytes]],
+        content: Optional[Callable[[str, Mapping[str, str]], tuple[int, Mapping[str, str], bytes]]] = None,
+    ) -> None:
+        self.handler = handler
+        self.content = content
+
+    def post(self, url: str, headers: Mapping[str, str], data, timeout: Timeout, stream: bool) -> requests.Response:
+        status, body = self.handler(read_body(data), CaseInsensitiveDict(headers))
+        return make_response(url, status, body, stream)
+
+    def get(self, url: str, headers: Mapping[str, str], timeout: Timeout, stream: bool) -> requests.Response:
+        if self.content is None:
+            raise ValueError(f"No content handler to download {url}")
+        status, response_headers, body = self.content(url, CaseInsensitiveDict(headers))
+        response_headers = {"Content-Type": "application/octet-stream", **response_headers}
+        return make_response(url, status, body, stream, response_headers)
+
+
+# Boundary of a multipart body, which is random and so left out of recording keys
+BOUNDARY = re.compile(r"boundary=([^;\s]+)")
+# Service name of a <request>, for naming recordings
+SERVICE_NAME = re.compile(rb'<service name="([^"]+)"')
+
+
+def request_key(body: bytes, headers: Mapping[str, str]) -> str:
+    """Identifies a call by its decompressed body, headers such as the token are left out"""
+    if headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    boundary = BOUNDARY.search(headers.get("Content-Type", ""))
+    if boundary is not None:
+        body = body.replace(boundary.group(1).strip('"').encode(), b"BOUNDARY")
+    m = SERVICE_NAME.search(body)
+    name = m.group(1).decode() if m else "call"
+    return f"{name}-{hashlib.sha256(body).hexdigest()[:24]}"
+
+
+def content_key(url: str, byte_range: Optional[str]) -> str:
+    """Identifies a download by the path and query of its URL and the byte range requested"""
+    parts = urllib.parse.urlsplit(url)
+    target = f"{parts.path}?{parts.query}\n{byte_range or ''}"
+    return f"content-{hashlib.sha256(target.encode('utf-8')).hexdigest()[:24]}"
+
+
+class ReplayMiss(LookupError):
+    """
+    A call has no recorded response.  Deliberately neither a ValueError nor a requests error,
+    so it is not mistaken for a failed call and skipped, bisected or retried.
+    """
+
+
+class Recorder(Transport):
+    """
+    Records calls to a directory and replays them.
+
+    Each response is saved as <service>-<hash of the request>-<n>.xml, where n counts the
+    identical calls made in a run, so a call repeated after a change gets its later answer.
+    Content downloads are saved as content-<hash of the URL and byte range>-<n>.bin.
+    When replaying, the responses of a call are served in recorded order and the last one
+    is repeated once they run out.  Only response bodies are saved, with a 200 status or a
+    206 for byte ranges, and no headers, so recordings hold no tokens.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", inner: Optional[Transport] = None) -> None:
+        """
+        Args:
+            path (str): Directory of the recordings.
+            mode (str): "record" sends every call with inner and saves the response, "replay"
+                answers from the recordings only, raising ReplayMiss for other calls, and
+                "auto" replays what was recorded and records the rest.
+            inner (Transport): Transport used to record, required unless replaying.
+        """
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f'Unknown mode "{mode}", expecting "record", "replay" or "auto"')
+        if mode != "replay" and inner is None:
+            raise ValueError(f'A transport to record from is needed in "{mode}" mode')
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        # Calls seen in this run, by key
+        self._seen: dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def filename(self, key: str, n: int, suffix: str = ".xml") -> str:
+        return os.path.join(self.path, f"{key}-{n}{suffix}")
+
+    def post(self, url: str, headers: Mapping[str, str], data, timeout: Timeout, stream: bool) -> requests.Response:
+        body = read_body(data)
+        inner = cast(Transport, self.inner)
+        return self.exchange(
+            request_key(body, headers), ".xml", url, 200, stream, lambda: inner.post(url, headers, body, timeout, False)
+        )
+
+    def get(self, url: str, headers: Mapping[str, str], timeout: Timeout, stream: bool) -> requests.Response:
+        byte_range = CaseInsensitiveDict(headers).get("Range")
+        inner = cast(Transport, self.inner)
+        return self.exchange(
+            content_key(url, byte_range),
+            ".bin",
+            url,
+            200 if byte_range is None else 206,
+            stream,
+            lambda: inner.get(url, headers, timeout, False),
+            {"Content-Type": "application/octet-stream"},
+        )
+
+    def exchange(
+        self,
+        key: str,
+        suffix: str,
+        url: str,
+        status: int,
+        stream: bool,
+        send: Callable[[], requests.Response],
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> requests.Response:
+        """Answers a call from the recordings, or sends it and saves the body if it has the expected status"""
+        with self._lock:
+            n = self._seen.get(key, 0)
+            self._seen[key] = n + 1
+
+        if self.mode != "record":
+            recorded = self.replay(key, n, suffix)
+            if recorded is not None:
+                return make_response(url, status, recorded, stream, headers)
+            if self.mode == "replay":
+                raise ReplayMiss(f"No recorded response for {key} in {self.path}")
+
+        response = send()
+        if response.status_code == status:
+            fn = self.filename(key, n, suffix)
+            with open(fn + ".tmp", "wb") as f:
+                f.write(response.content)
+            os.replace(fn + ".tmp", fn)
+        return make_response(url, response.status_code, response.content, stream, headers)
+
+    def replay(self, key: str, n: int, suffix: str = ".xml") -> Optional[bytes]:
+        """The nth recorded response to a call, or the last one recorded before it"""
+        for ix in range(n, -1, -1):
+            try:
+                with open(self.filename(key, ix, suffix), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        return None
@@ -1,12 +1,32 @@
+import copy
+import mmap
+import os
+import threading
+import time
+from typing import Optional
+import zlib
+
+# Bytes checksummed per step by crc32_file
+CRC_BLOCK = 16 * 1024 * 1024
+
+
 def add(self: dict, other: dict) -> None:
+    """
+    Merges other into self: nested dicts (including Counters) are merged recursively, sets are
+    unioned and other values such as numbers and lists are added.  The merge is associative, so
+    partial results can be combined in any grouping.
+    """
     for key, value in other.items():
         if key in self:
-            if type(self[key]) is dict:
+            if isinstance(self[key], dict):
                 add(self[key], other[key])
+            elif isinstance(self[key], set):
+                self[key] |= value
             else:
                 self[key] += value  # Add values for common keys
         else:
-            self[key] = value  # Add new keys
+            # Copy containers so that later merges into self leave other untouched
+            self[key] = copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value  # Add new keys
 
 
 class MergeDict(dict):
@@ -22,3 +42,50 @@ class MergeDict(dict):
         """
         add(self, other)
         return self
+
+
+def crc32_file(path: str, crc: int = 0, length: Optional[int] = None) -> int:
+    """
+    Computes the CRC32 of a file, as Mediaflux does for content checksums, without reading it
+    into memory.
+
+    Args:
+        path (str): The file to checksum.
+        crc (int): CRC of any preceding data to continue from.
+        length (int): Only checksum the first length bytes.
+
+    Returns:
+        int: The unsigned CRC32.
+    """
+    size = os.path.getsize(path) if length is None else length
+    if size == 0:
+        return crc & 0xFFFFFFFF
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as m:
+        with memoryview(m) as view:
+            for ix in range(0, size, CRC_BLOCK):
+                crc = zlib.crc32(view[ix : ix + CRC_BLOCK], crc)
+    return crc & 0xFFFFFFFF
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads so that at most rate start per second"""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        """
+        Args:
+            rate (float): Calls per second, None for no limit.
+        """
+        self.interval = 0.0 if not rate else 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Blocks until the caller may start its call"""
+        if self.interval == 0.0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,151 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+from typing import Generator, Optional
+
+import click
+
+from . import cli, orm
+from .util import crc32_file
+
+
+class ServerFile:
+    """The server's view of a file: asset id, content size and CRC32"""
+
+    __slots__ = ("id", "size", "crc")
+
+    def __init__(self, id: Optional[str], size: Optional[int], csum16: Optional[str]) -> None:
+        self.id = id
+        self.size = size
+        self.crc = int(csum16, 16) if csum16 else None
+
+
+class VerifyReport:
+    """Outcome of comparing a local tree with a collection, paths are relative to the tree root"""
+
+    def __init__(self) -> None:
+        self.matched: list[str] = []
+        # (path, local CRC32, server CRC32), the CRCs are None for size mismatches
+        self.mismatched: list[tuple[str, Optional[int], Optional[int]]] = []
+        # Files whose asset has no checksum on the server, so only their size was compared
+        self.unchecked: list[str] = []
+        # Files on the server with no local copy
+        self.missing: list[str] = []
+        # Local files with no asset on the server
+        self.extra: list[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return len(self.mismatched) == 0 and len(self.missing) == 0
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.matched)} matched, {len(self.mismatched)} mismatched, "
+            f"{len(self.unchecked)} unchecked, {len(self.missing)} missing, {len(self.extra)} extra"
+        )
+
+
+def local_files(root: str) -> Generator[str, None, None]:
+    """Yields the path of every file under root, relative to root and using / separators"""
+    for dirpath, _, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        for name in filenames:
+            yield name if rel == "." else f"{rel.replace(os.sep, '/')}/{name}"
+
+
+def server_files(collection: orm.Collection, match: str = "source") -> dict[str, ServerFile]:
+    """
+    Returns the collection's assets keyed by relative path.
+
+    Args:
+        collection (Collection): The collection standing in for the local tree root.
+        match (str): "source" keys assets by mf-source-name, "path" by their position in the
+            collection tree.
+    """
+    rv: dict[str, ServerFile] = {}
+    if match == "source":
+        fields = ["is_collection", "mf_source_name", "size", "csum16"]
+        for record in collection.get_assets(True, fields=fields):
+            if not record.is_collection and record.mf_source_name:
+                rv[record.mf_source_name.lstrip("/")] = ServerFile(record.id, record.size, record.checksum(16))
+    elif match == "path":
+        for _, path, asset in collection.walk():
+            if not asset.is_collection:
+                rv[(path + asset.name).lstrip("/")] = ServerFile(asset.id, asset.size, asset.checksum(16))
+    else:
+        raise ValueError(f'Unknown match "{match}", expecting "source" or "path"')
+    return rv
+
+
+def verify(
+    root: str,
+    collection: orm.Collection,
+    match: str = "source",
+    processes: Optional[int] = None,
+) -> VerifyReport:
+    """
+    Checks the files under root against the CRC32 checksums Mediaflux holds for a collection.
+
+    Files are checksummed on a process pool with mmap-backed reads, and only when their size
+    matches the server's.
+
+    Args:
+        root (str): The local directory.
+        collection (Collection): The collection it should mirror.
+        match (str): How files are matched to assets, see server_files.
+        processes (int): Size of the process pool, defaults to the number of CPUs.
+    """
+    report = VerifyReport()
+    expected = server_files(collection, match)
+
+    todo: list[str] = []
+    for path in local_files(root):
+        server = expected.get(path)
+        if server is None:
+            report.extra.append(path)
+        elif server.size is not None and server.size != os.path.getsize(os.path.join(root, path)):
+            report.mismatched.append((path, None, None))
+        elif server.crc is None:
+            report.unchecked.append(path)
+        else:
+            todo.append(path)
+
+    seen = set(todo) | set(report.unchecked) | {m[0] for m in report.mismatched}
+    report.missing = [path for path in expected if path not in seen]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        crcs = pool.map(crc32_file, [os.path.join(root, path) for path in todo], chunksize=64)
+        for path, crc in zip(todo, crcs):
+            if crc == expected[path].crc:
+                report.matched.append(path)
+            else:
+                report.mismatched.append((path, crc, expected[path].crc))
+    return report
+
+
+@click.command()
+@click.argument("collection")
+@click.argument("root", type=click.Path(exists=True, file_okay=False))
+@click.option("--match", type=click.Choice(["source", "path"]), default="source", help="How files map to assets")
+@click.option("--processes", type=int, default=None, help="Checksum processes, defaults to the CPU count")
+def main(collection: str, root: str, match: str, processes: Optional[int]) -> None:
+    """Verifies the files under ROOT against the checksums of COLLECTION"""
+    cli.connect()
+    report = verify(root, orm.Collection(collection), match, processes)
+    for path, local, server in report.mismatched:
+        if local is None:
+            click.echo(f"SIZE MISMATCH: {path}")
+        else:
+            click.echo(f"CHECKSUM MISMATCH: {path} local {local:X} server {server:X}")
+    for path in report.unchecked:
+        click.echo(f"NO SERVER CHECKSUM: {path}")
+    for path in report.missing:
+        click.echo(f"MISSING: {path}")
+    for path in report.extra:
+        click.echo(f"EXTRA: {path}")
+    click.echo(report.summary())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
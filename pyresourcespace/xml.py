@@ -1,35 +1,205 @@
-def etree_to_dict(element):
+from datetime import datetime
+import io
+from lxml import etree
+from typing import Any, BinaryIO, Callable, Generator, Iterable, Optional, Union
+
+MONTHS = {m: ix + 1 for ix, m in enumerate("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split())}
+
+
+def mf_date(text: str) -> Union[datetime, str]:
+    """Parses a Mediaflux date such as "16-Oct-2026 22:19:50", returning other text unchanged"""
+    # Split by hand, strptime is several times slower
+    try:
+        date, _, clock = text.partition(" ")
+        day, month, year = date.split("-")
+        hour, minute, second = (clock or "0:0:0").split(":")
+        second, _, fraction = second.partition(".")
+        return datetime(
+            int(year),
+            MONTHS[month],
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            int(fraction[:6].ljust(6, "0")) if fraction else 0,
+        )
+    except (KeyError, ValueError):
+        return text
+
+
+class Schema:
+    """
+    Controls the shape of the dicts built by etree_to_dict and iter_dicts.
+
+    Without a schema the output matches the original converter: repeated tags become lists,
+    and every element with children or attributes becomes a dict with a "text" key.  With a
+    schema the output has the same shape whatever the document:
+    - tags in lists are always lists, other repeated tags still become lists
+    - elements without children are their (coerced) text, or a dict with "_attributes" and
+      "text" when they have attributes to keep
+    - elements with children only get a "text" key if text is set
+    """
+
+    def __init__(
+        self,
+        lists: Iterable[str] = (),
+        attributes: Optional[Iterable[str]] = None,
+        types: Optional[dict[str, Callable[[str], Any]]] = None,
+        text: bool = False,
+    ) -> None:
+        """
+        Args:
+            lists: Tags that are always lists.
+            attributes: Names of the attributes to keep, None keeps them all.
+            types: Converters for the text of elements by tag, and of attributes by "@name".
+                Text a converter rejects with ValueError is kept as it is.
+            text (bool): Keep the "text" key of elements with children.
+        """
+        self.lists = frozenset(lists)
+        self.attributes = None if attributes is None else frozenset(attributes)
+        self.types = types or {}
+        self.text = text
+
+    def attributes_of(self, element) -> dict:
+        """The element's attributes to keep, coerced"""
+        if self.attributes is None:
+            return {k: self.coerce("@" + k, v) for k, v in element.attrib.items()}
+        return {k: self.coerce("@" + k, v) for k, v in element.attrib.items() if k in self.attributes}
+
+    def coerce(self, key: str, text: str) -> Any:
+        convert = self.types.get(key)
+        if convert is None:
+            return text
+        try:
+            return convert(text)
+        except ValueError:
+            return text
+
+
+# Schema for asset metadata: asset, id and csum are always lists, numbers and dates are typed
+ASSET_SCHEMA = Schema(
+    lists=("asset", "id", "csum"),
+    types={
+        "@id": int,
+        "@version": int,
+        "@millisec": int,
+        "id": int,
+        "parent": int,
+        "size": int,
+        "stime": int,
+        "ctime": mf_date,
+        "mtime": mf_date,
+    },
+)
+
+
+def etree_to_dict(element, schema: Optional[Schema] = None):
     """
-    Recursively converts an lxml.etree.Element into a native Python dictionary.
+    Converts an lxml.etree.Element into a native Python dictionary.
+
+    Elements are visited in a single pass in document order, rather than recursively, so deep
+    documents do not hit the recursion limit.
 
     Args:
         element (etree.Element): The XML element to convert.
+        schema (Schema): Optional shape and types of the output, see Schema.
 
     Returns:
         dict or str: A Python dictionary representing the XML structure,
                      or a string if the element contains only text.
     """
     # If the element has no children, return its text or an empty string
-    if len(element) == 0 and len(element.attrib) == 0:
-        return element.text or ""
+    if len(element) == 0:
+        return leaf_value(element, schema)
 
-    # Otherwise, convert its children into a dictionary
-    result = {}
-    for child in element:
-        child_result = etree_to_dict(child)
-        tag = child.tag
+    # The dict of every element with children, and those elements in document order
+    result: dict = {}
+    dicts = {element: result}
+    parents = [(element, result)]
+    lists = frozenset() if schema is None else schema.lists
+    for child in element.iterdescendants("*"):
+        if len(child) == 0:
+            value = leaf_value(child, schema)
+        else:
+            value = dicts[child] = {}
+            parents.append((child, value))
 
         # If the tag already exists, turn it into a list or append to it
-        if tag in result:
-            if not isinstance(result[tag], list):
-                result[tag] = [result[tag]]  # Convert to a list if not already
-            result[tag].append(child_result)
+        siblings = dicts[child.getparent()]
+        tag = child.tag
+        if tag in siblings:
+            if type(siblings[tag]) is list:
+                siblings[tag].append(value)
+            else:
+                siblings[tag] = [siblings[tag], value]
+        elif tag in lists:
+            siblings[tag] = [value]
         else:
-            result[tag] = child_result
-
-    # Include attributes as a special "_attributes" key
-    if element.attrib:
-        result["_attributes"] = dict(element.attrib)
-    result["text"] = element.text or ""
+            siblings[tag] = value
 
+    # Attributes and text go after the children
+    for elem, value in parents:
+        if schema is None:
+            if elem.attrib:
+                value["_attributes"] = dict(elem.attrib)
+            value["text"] = elem.text or ""
+        else:
+            attributes = schema.attributes_of(elem)
+            if attributes:
+                value["_attributes"] = attributes
+            if schema.text and elem.text and elem.text.strip():
+                value["text"] = elem.text
     return result
+
+
+def leaf_value(element, schema: Optional[Schema]):
+    """The value of an element without children, its text unless it has attributes"""
+    if schema is None:
+        if len(element.attrib) == 0:
+            return element.text or ""
+        return {"_attributes": dict(element.attrib), "text": element.text or ""}
+    text = schema.coerce(element.tag, element.text or "")
+    attributes = schema.attributes_of(element) if len(element.attrib) else None
+    return {"_attributes": attributes, "text": text} if attributes else text
+
+
+def iter_dicts(
+    source: Union[bytes, BinaryIO],
+    tag: str = "asset",
+    schema: Optional[Schema] = None,
+) -> Generator[Any, None, None]:
+    """
+    Converts the <tag> children of a service response's <result> straight from its bytes,
+    yielding each as soon as it has been parsed.  Each element is dropped once converted, so
+    memory use does not grow with the size of the response.
+
+    Args:
+        source: The raw response, as bytes or a file-like object.
+        tag (str): The tag of the <result> children to yield.
+        schema (Schema): Optional shape and types of the output, see Schema.
+
+    Raises:
+        ValueError: If the <reply> type is not "result".
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    reply_type = None
+    # Only <reply> and <tag> elements are reported, the parser skips everything else in C
+    for event, elem in etree.iterparse(source, events=("start", "end"), tag=("reply", tag)):
+        parent = elem.getparent()
+        if elem.tag == "reply" and parent is not None and parent.getparent() is None:
+            if event == "start":
+                reply_type = elem.get("type")
+                continue
+            if reply_type == "error":
+                m = elem.find("message")
+                raise ValueError(f"Call failed: {'None' if m is None else m.text}")
+            if reply_type != "result":
+                raise ValueError(f"Unexpected reply type: {reply_type}")
+            return
+        parent = elem.getparent()
+        if event == "end" and reply_type == "result" and parent is not None and parent.tag == "result":
+            yield etree_to_dict(elem, schema)
+            parent.remove(elem)
+
+    raise ValueError("No <reply> element found in the response.")
@@ -1,17 +1,34 @@
 import click
 from dotenv import load_dotenv
-import itertools
 from lxml import etree
 import os
 import pytest
 
 from pymediaflux import orm
+from pymediaflux.queries import filter_queries
+from pymediaflux.standin import StandIn
+from pymediaflux.transport import Recorder
+
+# Transport to the real server, HTTP unless a recording is made or replayed
+HTTP = orm.Request.transport
 
 
 def _server_connect():
     # Load environment variables from .env file
     load_dotenv()
 
+    # MEDIAFLUX_RECORD=dir saves the server's responses, MEDIAFLUX_REPLAY=dir answers the
+    # tests from such a recording so they run offline
+    replay = os.getenv("MEDIAFLUX_REPLAY")
+    if replay:
+        orm.Request.transport = Recorder(replay, "replay")
+        orm.Request.url = "http://replay/__mflux_svc__"
+        orm.Request.headers = {"Content-Type": "application/xml"}
+        return
+    record = os.getenv("MEDIAFLUX_RECORD")
+    if record and not isinstance(orm.Request.transport, Recorder):
+        orm.Request.transport = Recorder(record, "record", HTTP)
+
     API_HOST = os.getenv("API_HOST")
     API_PORT = os.getenv("API_PORT")
     API_TOKEN = os.getenv("API_TOKEN")
@@ -43,28 +60,33 @@ def server_connect():
     _server_connect()
 
 
+@pytest.fixture
+def restore():
+    # Puts back the connection settings a test changes, with an empty metadata cache
+    saved = orm.Request.url, orm.Request.headers, orm.Request.transport, orm.Request.compress
+    min_size = orm.Request.compress_min_size
+    orm.Request.cache.clear()
+    yield
+    orm.Request.url, orm.Request.headers, orm.Request.transport, orm.Request.compress = saved
+    orm.Request.compress_min_size = min_size
+    orm.Request.cache.clear()
+
+
+@pytest.fixture
+def standin(restore):
+    # An in-memory server on a local port, for tests that must not touch the real one
+    orm.Request.transport = HTTP
+    with StandIn() as server:
+        server.connect()
+        yield server
+
+
 def pytest_generate_tests(metafunc):
-    # Tests for known query strings.  We generate srtineg for every operation in every filter
+    # Tests for known query strings.  We generate strings for every operation in every filter
     if "query_str" in metafunc.fixturenames:
-        params = []
         _server_connect()
-        namespaces = orm.Namespace().filter_spaces()
-
-        for ns in namespaces:
-            for f in ns.filters:
-                ops = {
-                    arg.name: {
-                        "asset-id": [100],
-                        "date": ["01-Jan-2024"],
-                        "integer": [100],
-                        "string": ["hello"],
-                        "enumeration": arg.restrictions.values(),
-                    }[arg.type]
-                    for arg in f.args
-                }
-                for c in itertools.product(*ops.values()):
-                    # Zip the dictionary keys with the current combination to form a new dictionary
-                    args = dict(zip(ops.keys(), c))
-                    params.append(f.query_str(**args))
+        params = []
+        for ns in orm.Namespace().filter_spaces():
+            params += filter_queries(ns.describe_filters())
 
         metafunc.parametrize("query_str", params)
@@ -0,0 +1,36 @@
+import pytest
+import pytest_check as check
+
+from pymediaflux import orm
+
+
+def test_aggregate(standin):
+    root = standin.add_collection("DAM-2")
+    sub = standin.add_collection("Scans", root)
+    for i in range(3):
+        standin.add_asset(f"img{i}.jpg", root, b"x" * 100)
+    standin.add_asset("scan.tif", sub, b"x" * 1000)
+    standin.add_asset("o'brien.pdf", sub, b"x" * 10)
+    where = f"asset in collection {root}"
+
+    # The Scans collection is an asset too, with no content
+    check.equal(orm.Asset.aggregate(where), {"count": 6, "size": 1310})
+    check.equal(orm.Asset.aggregate(where, metrics=["count"]), {"count": 6})
+
+    stats = orm.Asset.aggregate(where, by="mimetype")
+    check.equal(
+        stats,
+        {
+            "application/pdf": {"count": 1, "size": 10},
+            "image/jpeg": {"count": 3, "size": 300},
+            "image/tiff": {"count": 1, "size": 1000},
+        },
+    )
+
+    total = orm.Asset.aggregate(where, by="extension") + orm.Asset.aggregate(f"asset in collection {sub}", by="extension")
+    check.equal(total["tif"], {"count": 2, "size": 2000}, "Expecting results to merge with +")
+    check.equal(total["pdf"]["count"], 2)
+    check.is_false(any(c == "asset.get" for c in standin.calls), "Expecting no metadata to be fetched")
+
+    with pytest.raises(ValueError):
+        orm.Asset.aggregate(where, metrics=["mean"])
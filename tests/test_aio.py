@@ -0,0 +1,43 @@
+import asyncio
+import pytest_check as check
+
+from pymediaflux import aio, orm
+
+
+def test_aio_collection_assets(server_connect):
+    obj = aio.AsyncCollection("7069835")
+
+    async def collect():
+        return [asset.id async for asset in obj.aget_assets(True)]
+
+    ids = asyncio.run(collect())
+    check.equal(
+        ids,
+        [asset.id for asset in orm.Collection("7069835").assets_all],
+        "Expecting async assets to match the synchronous walk",
+    )
+
+
+def test_aio_query(server_connect):
+    results = asyncio.run(aio.AsyncAsset.aquery("filter 'powerhouse-toi:irn(value=\\'234\\')'"))
+
+    check.greater_equal(len(results), 5, f"Expecting at least 5 results, got {len(results)}")
+
+
+def test_aio_sync_methods(standin):
+    root = standin.populate(5, depth=1, fanout=2)
+    obj = aio.AsyncCollection(root)
+    expected = [a.id for _, _, a in orm.Collection(root).walk()]
+
+    check.equal([a.id for _, _, a in obj.walk()], expected, "Expecting the inherited walk to work")
+    check.equal([a.id for a in obj.iter_assets(prefetch=2)], standin.members(root))
+    check.equal(sum(1 for _ in obj.assets_all), 17)
+    check.equal(obj.prefetch, orm.Collection.prefetch, "Expecting the synchronous prefetch default to be kept")
+
+    async def collect():
+        return [asset.id async for asset in obj.aget_assets(True)], await obj.acount(True)
+
+    ids, count = asyncio.run(collect())
+    check.equal(ids, standin.members(root, True))
+    check.equal(count, 17)
+    check.equal(asyncio.run(aio.AsyncAsset.aquery_name("synthetic")).id, root)
@@ -0,0 +1,62 @@
+import pytest_check as check
+
+from pymediaflux import orm
+
+
+def collection(standin, n: int = 6) -> tuple[str, list[str]]:
+    root = standin.add_collection("DAM-2")
+    ids = [standin.add_asset(f"img{i}.jpg", root, b"jpeg") for i in range(n)]
+    return root, ids
+
+
+def test_bisect(standin):
+    root, ids = collection(standin)
+    # A member asset.get cannot describe fails every batch it is in
+    standin.assets[root].members.insert(3, "9999")
+
+    errors = []
+    assets = list(orm.Collection(root).get_assets(on_error=lambda id, e: errors.append((id, str(e)))))
+
+    check.equal([a.id for a in assets], ids, "Expecting the other members in order")
+    check.equal([id for id, _ in errors], ["9999"])
+    check.is_in("9999", errors[0][1])
+    check.greater(standin.calls.count("asset.get"), 2, "Expecting the failing batch to be split")
+
+
+def test_on_error_default(standin):
+    root, ids = collection(standin, 3)
+    standin.assets[root].members.append("9999")
+
+    c = orm.Collection(root)
+    check.equal(len(list(c.get_assets(prefetch=2))), 3)
+    check.equal(list(c.errors), ["9999"], "Expecting failures to be recorded on the collection")
+
+
+def test_match_by_id(standin):
+    root, ids = collection(standin)
+    asset_get = standin.services["asset.get"]
+
+    def shuffled(args, attachments):
+        # Answer out of order and leave out the second id
+        result = asset_get(args, attachments)
+        members = list(result)
+        result.remove(members[1])
+        result[:] = reversed(result[:])
+        return result
+
+    standin.services["asset.get"] = shuffled
+    errors = []
+    assets = list(orm.Collection(root).get_assets(on_error=lambda id, e: errors.append(id)))
+
+    check.equal([a.id for a in assets], ids[:1] + ids[2:])
+    check.equal(errors, [ids[1]], "Expecting the missing id to be reported")
+
+
+def test_project_missing(standin):
+    root, ids = collection(standin, 3)
+    standin.assets[root].members.insert(1, "9999")
+
+    c = orm.Collection(root)
+    records = list(c.get_assets(fields=["name"]))
+    check.equal([r.id for r in records], ids)
+    check.equal(list(c.errors), ["9999"], "Expecting ids missing from the projection to be reported")
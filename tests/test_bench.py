@@ -0,0 +1,17 @@
+import pytest_check as check
+
+from benchmarks import bench
+
+
+def test_bench():
+    results = bench.run(size=10, depth=1, fanout=2, repeat=1)
+    check.equal(results["config"]["size"], 10)
+    check.equal(results["results"]["assets_all"]["items"], 32, "Expecting 3 collections of 10 assets and 2 sub-collections")
+    check.equal(results["results"]["etree_to_dict"]["items"], 10)
+    check.greater(results["results"]["get_assets"]["calls"], 0, "Expecting the service calls to be counted")
+    check.is_true(all(r["python_peak_bytes"] > 0 for r in results["results"].values()))
+    check.is_true(all(r["peak_rss_bytes"] >= r["rss_growth_bytes"] >= 0 for r in results["results"].values()))
+
+    lines = bench.compare(results, results)
+    check.equal(len(lines), len(results["results"]) + 1)
+    check.is_in("+0.0%", lines[1])
@@ -0,0 +1,102 @@
+from lxml import etree
+import multiprocessing
+import time
+from typing import Optional, cast
+
+import pytest_check as check
+
+from pymediaflux import orm
+from pymediaflux.cache import DiskCache, MetadataCache
+
+
+def test_cache_lru():
+    cache = MetadataCache(maxsize=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    check.equal(cache.get("a"), 1, "Expecting recently used entry to be kept")
+    check.is_none(cache.get("b"), "Expecting least recently used entry to be evicted")
+
+
+def test_cache_ttl():
+    cache = MetadataCache(ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+
+    check.is_none(cache.get("a"), "Expecting entry to expire")
+
+
+def test_cache_asset_identity(server_connect):
+    orm.Request.cache.clear()
+    dam2 = orm.Asset.query_name("DAM-2")
+    misses = orm.Request.cache.misses
+
+    check.equal(orm.Asset.query_name("DAM-2").data, dam2.data, "Expecting repeated lookup to share metadata")
+    check.is_(orm.Asset(dam2.id).data, dam2.data, "Expecting Asset(id) to share metadata")
+    check.equal(orm.Request.cache.misses, misses, "Expecting no further fetches")
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path / "metadata.db"))
+    asset = etree.fromstring('<asset id="42"><stime>7</stime><name>a.jpg</name></asset>')
+    cache.put_many([asset])
+
+    stored = DiskCache(str(tmp_path / "metadata.db")).get_many(["42", "43"])
+    check.equal(list(stored), ["42"], "Expecting only the stored asset")
+    check.equal(stored["42"][0], "7", "Expecting the stime to be stored")
+    check.equal(etree.fromstring(stored["42"][1]).findtext("name"), "a.jpg", "Expecting the XML to be stored")
+
+
+def test_cache_streaming(standin):
+    root = standin.populate(50)
+    c = orm.Collection(root)
+    kept = orm.Asset(standin.members(root)[0])
+    kept.data
+
+    check.equal(sum(1 for _ in c.get_assets(compact=True)), 50)
+    check.equal(sum(1 for _ in c.get_assets(prefetch=2)), 50)
+    check.equal(sum(1 for _ in c.get_assets(fields=["name", "size"])), 50)
+    check.equal(sum(1 for _ in orm.Asset.query_iter(f"asset in collection {root}")), 50)
+    check.equal(sum(1 for _ in orm.Asset.query_iter(f"asset in collection {root}", page_size=20, lookahead=True)), 50)
+    check.equal(len(orm.Request.cache), 1, "Expecting streamed metadata to stay out of the cache")
+    check.is_(orm.Asset(kept.id).data, kept.data, "Expecting explicit lookups to be cached")
+
+
+def test_disk_cache_query(standin, tmp_path):
+    root = standin.populate(30)
+    ids = standin.members(root)
+    saved = orm.Request.disk_cache
+    orm.Request.disk_cache = DiskCache(str(tmp_path / "metadata.db"))
+    try:
+        query = f"asset in collection {root}"
+        first = orm.Asset.query(query)
+        check.equal([a.id for a in first], ids)
+        check.equal(standin.calls.count("asset.get"), 1)
+
+        orm.Request.cache.clear()
+        standin.assets[ids[3]].stime += 1
+        second = orm.Asset.query(query)
+        check.equal([a.id for a in second], ids)
+        check.equal([a.name for a in second], [a.name for a in first])
+        check.equal(standin.calls.count("asset.get"), 2, "Expecting only the changed asset to be fetched again")
+    finally:
+        orm.Request.disk_cache = saved
+
+
+# The cache a forked process inherits, see test_disk_cache_fork
+inherited: Optional[DiskCache] = None
+
+
+def test_disk_cache_fork(tmp_path):
+    global inherited
+    inherited = DiskCache(str(tmp_path / "metadata.db"))
+    parent = inherited.connection()
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        check.is_true(pool.apply(reconnected, (id(parent),)), "Expecting a forked process to open its own connection")
+    check.is_(inherited.connection(), parent)
+
+
+def reconnected(parent: int) -> bool:
+    return id(cast(DiskCache, inherited).connection()) != parent
@@ -22,3 +22,13 @@ def test_collection_members(server_connect):
         len(list(obj.members)),
         f"Expecting count({obj.count}) to match member length {len(list(obj.members))}",
     )
+
+
+def test_collection_prefetch_order(server_connect):
+    obj = orm.Collection("7069835")
+
+    check.equal(
+        [asset.id for asset in obj.get_assets(True, prefetch=4)],
+        [asset.id for asset in obj.get_assets(True)],
+        "Expecting prefetched assets in member order",
+    )
@@ -19,3 +19,16 @@ def test_dam_23(server_connect):
             path[asset.parent] + asset.mf_name,
             f"Check of source path failed for {asset.mf_source_name} ({asset.id})",
         )
+
+
+def test_dam_23_walk(server_connect):
+    dam2 = orm.Asset.query_name("DAM-2")
+
+    for depth, path, asset in dam2.walk():
+        if asset.is_collection:
+            continue
+        check.equal(
+            asset.mf_source_name,
+            path + asset.mf_name,
+            f"Check of source path failed for {asset.mf_source_name} ({asset.id}) at depth {depth}",
+        )
@@ -32,3 +32,14 @@ def test_dam_729_exif(server_connect):
         if asset.mimetype[:5] == "image" and not asset.name == "m83.tif":
             # m83.tif had no exif data
             check.is_true(asset.has_exif, f"Asset({asset.id}, {asset.name}) has no exif")
+
+
+def test_dam_729_mime_compact(server_connect):
+    dam2 = orm.Asset.query_name("DAM-2")
+
+    for asset, record in zip(dam2.assets_all, dam2.get_assets(True, compact=True)):
+        check.equal(
+            (record.mimetype, record.extension, record.has_exif),
+            (asset.mimetype, asset.extension, asset.has_exif),
+            f"Asset({asset.id}) compact record differs",
+        )
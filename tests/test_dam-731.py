@@ -23,3 +23,13 @@ def test_dam_731_base_16_checksum(server_connect):
         check.not_equal(
             asset.checksum(16), "", f"Expecting a base 16 checksum on {asset.name}"
         )
+
+
+def test_dam_731_checksum_fields(server_connect):
+    dam2 = orm.Asset.query_name("DAM-2")
+
+    for asset in dam2.get_assets(True, fields=["is_collection", "name", "csum10", "csum16"]):
+        if asset.is_collection:
+            continue
+        check.not_equal(asset.checksum(10), "", f"Expecting a base 10 checksum on {asset.name}")
+        check.not_equal(asset.checksum(16), "", f"Expecting a base 16 checksum on {asset.name}")
@@ -0,0 +1,106 @@
+import json
+import os
+import zlib
+
+import pytest
+import pytest_check as check
+
+from pymediaflux import metrics, orm
+
+CONTENT = bytes(range(256)) * 1200
+
+
+@pytest.fixture
+def asset(standin):
+    root = standin.add_collection("DAM-2")
+    return orm.Asset(standin.add_asset("big.tif", root, CONTENT))
+
+
+def test_download_stream(standin, asset, tmp_path):
+    path = str(tmp_path / "big.tif")
+    with metrics.scope() as stats:
+        check.equal(asset.download(path), path)
+
+    with open(path, "rb") as f:
+        check.equal(f.read(), CONTENT)
+    check.equal(standin.ranges, [None])
+    check.is_false(os.path.exists(path + ".part"))
+    check.equal(stats["asset.content"].calls, 1, "Expecting content downloads to be measured")
+    check.equal(stats["asset.content"].response_bytes, len(CONTENT))
+
+
+def test_download_ranges(standin, asset, tmp_path, monkeypatch):
+    monkeypatch.setattr(orm.Asset, "download_range_size", 100000)
+    path = str(tmp_path / "big.tif")
+    asset.download(path, workers=3)
+
+    with open(path, "rb") as f:
+        check.equal(f.read(), CONTENT)
+    expected = ["bytes=0-99999", "bytes=100000-199999", "bytes=200000-299999", "bytes=300000-307199"]
+    check.equal(sorted(standin.ranges), expected)
+    check.is_false(os.path.exists(path + ".part.ranges"))
+
+
+def test_download_resume(standin, asset, tmp_path):
+    path = str(tmp_path / "big.tif")
+    # What an interrupted download leaves behind
+    with open(path + ".part", "wb") as f:
+        f.write(CONTENT[:100000])
+    asset.download(path, workers=1)
+
+    with open(path, "rb") as f:
+        check.equal(f.read(), CONTENT)
+    check.equal(standin.ranges, ["bytes=100000-"], "Expecting only the rest to be fetched")
+
+
+def test_download_mixed_resume(standin, asset, tmp_path):
+    path = str(tmp_path / "big.tif")
+    # An interrupted range download: allocated at full size with only the first range written
+    with open(path + ".part", "wb") as f:
+        f.truncate(len(CONTENT))
+        f.write(CONTENT[:100000])
+    with open(path + ".part.ranges", "w") as f:
+        json.dump([0], f)
+    asset.download(path, workers=1, verify=False)
+
+    with open(path, "rb") as f:
+        check.equal(f.read(), CONTENT, "Expecting no zero-filled ranges to be kept")
+    check.equal(standin.ranges, [None], "Expecting the stream to start again")
+    check.is_false(os.path.exists(path + ".part.ranges"))
+
+
+def test_download_checksum(standin, asset, tmp_path):
+    path = str(tmp_path / "big.tif")
+    with open(path + ".part", "wb") as f:
+        f.write(b"\0" * 100000)
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        asset.download(path, workers=1)
+
+    check.is_false(os.path.exists(path + ".part"), "Expecting the corrupt part to be removed")
+    check.is_false(os.path.exists(path))
+    check.equal(asset.checksum(16), f"{zlib.crc32(CONTENT):X}")
+
+
+def test_download_retry(standin, asset, tmp_path):
+    standin.inject("asset.content", status=503)
+    path = str(tmp_path / "big.tif")
+    asset.download(path)
+
+    with open(path, "rb") as f:
+        check.equal(f.read(), CONTENT)
+    check.equal(standin.calls.count("asset.content"), 2, "Expecting the content policy to retry")
+
+
+def test_download_outside_dest(standin, tmp_path):
+    root = standin.add_collection("DAM-2")
+    standin.add_asset("a.jpg", root, b"a")
+    bad = standin.add_asset("../escaped.jpg", root, b"b")
+    sub = standin.add_collection("..", root)
+    standin.add_asset("deeper.jpg", sub, b"c")
+    dest = tmp_path / "mirror"
+
+    c = orm.Collection(root)
+    check.equal(c.download(str(dest)), [os.path.join(str(dest), "", "a.jpg")])
+    check.is_false((tmp_path / "escaped.jpg").exists(), "Expecting no file outside dest")
+    check.is_false((tmp_path / "deeper.jpg").exists())
+    check.equal(sorted(c.errors), sorted([bad, sub, standin.members(sub)[0]]))
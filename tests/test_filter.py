@@ -2,6 +2,7 @@ import pytest
 import pytest_check as check
 
 from pymediaflux import orm
+from pymediaflux.queries import filter_queries, run_queries
 
 
 def test_filter_description(server_connect):
@@ -35,4 +36,33 @@ def test_filter_toi_irn_in_toi(server_connect):
 @pytest.mark.timeout(5)
 def test_filter_query(query_str):
 
-    orm.Asset.query(query_str)
+    orm.Asset.query_count(query_str)
+
+
+def test_filter_queries(server_connect):
+    queries = filter_queries(orm.Namespace("powerhouse-toi").describe_filters())
+    results = run_queries(queries, mode="check", workers=16, rate=50)
+
+    check.equal([r.query for r in results], queries, "Expecting a result per query, in order")
+    check.equal([r.to_dict() for r in results if not r.ok], [], "Expecting every filter query to run")
+
+
+def test_filter_toi_irn_query_iter(server_connect):
+    query = "filter 'powerhouse-toi:irn(value=\\'234\\')'"
+
+    check.equal(
+        [asset.id for asset in orm.Asset.query_iter(query)],
+        [asset.id for asset in orm.Asset.query(query)],
+        "Expecting streamed query results to match Asset.query",
+    )
+
+
+def test_filter_toi_irn_query_pages(server_connect):
+    query = "filter 'powerhouse-toi:irn(value=\\'234\\')'"
+
+    check.equal(
+        [asset.id for asset in orm.Asset.query_iter(query, page_size=2, lookahead=True)],
+        [asset.id for asset in orm.Asset.query_iter(query)],
+        "Expecting paged query results to match a single query",
+    )
+    check.equal(len(list(orm.Asset.query_iter(query, page_size=2, limit=3))), 3, "Expecting limit to cap results")
@@ -0,0 +1,43 @@
+import pytest_check as check
+
+from pymediaflux import orm
+from pymediaflux.ingest import IngestItem, ingest
+
+
+def test_ingest(standin, tmp_path):
+    root = standin.add_collection("DAM-2")
+    for i in range(20):
+        (tmp_path / f"img{i}.jpg").write_bytes(f"image {i}".encode() * 1000)
+    paths = sorted(str(p) for p in tmp_path.glob("*.jpg"))
+
+    report = ingest(paths, orm.Collection(root), workers=4)
+    check.equal(len(report.created), 20, "Expecting every file to be created")
+    check.equal(orm.Collection(root).count, 20, "Expecting 20 members")
+
+    asset = orm.Asset(report.created[0].id)
+    check.equal(asset.size, 7000, "Expecting the whole file as content")
+    check.equal(asset.parent, root, "Expecting the asset in the target collection")
+
+    report = ingest(paths, orm.Collection(root), workers=4)
+    check.equal(len(report.skipped), 20, "Expecting identical files to be skipped")
+    check.equal(standin.calls.count("asset.create"), 20, "Expecting no further uploads")
+
+
+def test_ingest_journal(standin, tmp_path):
+    root = standin.add_collection("DAM-2")
+    files = tmp_path / "files"
+    files.mkdir()
+    for i in range(5):
+        (files / f"doc{i}.pdf").write_bytes(b"%PDF" * (i + 1))
+    items = [IngestItem(str(p)) for p in sorted(files.iterdir())]
+    items.append(IngestItem(str(files / "missing.pdf")))
+    journal = str(tmp_path / "ingest.jsonl")
+
+    report = ingest(items, orm.Collection(root), journal=journal, skip_existing=False)
+    check.equal(len(report.created), 5, "Expecting 5 assets")
+    check.equal(len(report.failed), 1, "Expecting the missing file to fail")
+
+    report = ingest(items, orm.Collection(root), journal=journal, skip_existing=False)
+    check.equal(len(report.skipped), 5, "Expecting journalled files to be skipped")
+    check.equal(len(report.failed), 1, "Expecting failed files to be retried")
+    check.equal(standin.calls.count("asset.create"), 5, "Expecting one upload per file")
@@ -0,0 +1,52 @@
+import logging
+
+import pytest
+import pytest_check as check
+
+from pymediaflux import metrics, orm
+
+
+def test_scope(standin):
+    root = standin.add_collection("DAM-2")
+    for i in range(5):
+        standin.add_asset(f"img{i}.jpg", root, b"jpeg")
+
+    with metrics.scope() as stats:
+        assets = list(orm.Collection(root).get_assets(prefetch=2))
+        with metrics.scope() as inner:
+            orm.Asset.query_count("name = 'img1.jpg'")
+        with pytest.raises(ValueError):
+            orm.Asset.query_count("name = 'img1.jpg")
+    orm.Asset.query_count("name = 'img1.jpg'")
+
+    check.equal(len(assets), 5)
+    check.equal(set(inner.services), {"asset.query"})
+    query = stats["asset.query"]
+    check.equal(query.calls, 2, "Expecting nested scopes to count in the outer scope too")
+    check.equal(query.errors, 1)
+    members = stats["asset.collection.members"]
+    check.equal(members.calls, 1, "Expecting calls on prefetch threads to count")
+    check.greater(members.response_bytes, members.request_bytes)
+    check.greater(members.parse_seconds, 0)
+    check.equal(sum(members.histogram), members.calls)
+    check.less_equal(members.percentile(0.99), members.max_seconds)
+    check.is_in("asset.collection.members", stats.report())
+    check.equal(stats.to_dict()["asset.query"]["calls"], 2)
+
+
+def test_sinks(standin, caplog):
+    seen = []
+    sinks = [metrics.CallbackSink(lambda call: seen.append((call.name, call.error))), metrics.LogSink()]
+    for sink in sinks:
+        metrics.add_sink(sink)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="pymediaflux.metrics"):
+            orm.Request.post("server.version")
+    finally:
+        for sink in sinks:
+            metrics.remove_sink(sink)
+    orm.Request.post("server.version")
+
+    check.equal(seen, [("server.version", None)], "Expecting calls after removal not to be seen")
+    check.is_in("server.version", caplog.text)
+    check.is_true(metrics.start("server.version", b"") is metrics.NO_CALL, "Expecting no recording without sinks")
@@ -30,3 +30,15 @@ def test_filter_namespace_list(server_connect):
     toi_ns = orm.Namespace("powerhouse-toi")
 
     check.equal(2, len(toi_ns.filters))
+
+
+def test_filter_namespace_describe_filters(server_connect):
+    toi_ns = orm.Namespace("powerhouse-toi")
+    batched = [f.description for f in toi_ns.describe_filters()]
+    orm.Request.cache.clear()
+
+    check.equal(
+        batched,
+        [orm.Filter("powerhouse-toi", f.name).description for f in toi_ns.filters],
+        "Expecting batched descriptions to match individual describes",
+    )
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+import pytest_check as check
+import requests
+from urllib3.exceptions import ProtocolError
+
+from pymediaflux import orm
+from pymediaflux.policy import LatencyTracker, Policy, default_policies
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    # Default policies without the backoff waits
+    policies = default_policies()
+    for p in policies.values():
+        p.backoff = 0.001
+    monkeypatch.setattr(orm.Request, "policies", policies)
+    monkeypatch.setattr(orm.Request, "default_policy", Policy(backoff=0.001))
+    monkeypatch.setattr(orm.Request, "latency", LatencyTracker())
+
+
+def test_retry(standin, fast_retries, tmp_path):
+    root = standin.add_collection("DAM-2")
+    aid = standin.add_asset("a.jpg", root, b"jpeg")
+
+    standin.inject("asset.get", status=503, times=2)
+    rv = orm.Request.post("asset.get", [("id", aid)])
+    check.equal(rv.findtext("asset/name"), "a.jpg", "Expecting transient failures of a read to be retried")
+    check.equal(standin.faults["asset.get"], [])
+
+    standin.inject("asset.get", status=503, times=4)
+    with pytest.raises(requests.HTTPError):
+        orm.Request.post("asset.get", [("id", aid)])
+
+    path = tmp_path / "b.jpg"
+    path.write_bytes(b"jpeg")
+    standin.inject("asset.create", status=500)
+    with pytest.raises(requests.HTTPError):
+        orm.Asset.create(str(path), root)
+    check.equal(len(standin.assets), 2, "Expecting a failed create not to be retried")
+
+
+def test_timeout(standin, fast_retries):
+    root = standin.add_collection("DAM-2")
+    orm.Request.set_policy("asset.collection.members.count", Policy(timeout=(1, 0.2), idempotent=True, backoff=0.001))
+    standin.inject("asset.collection.members.count", delay=1)
+    check.equal(orm.Collection(root).count, 0, "Expecting a call that timed out to be sent again")
+
+    orm.Request.set_policy("asset.collection.members.count", Policy(timeout=(1, 0.2), retries=0))
+    standin.inject("asset.collection.members.count", delay=1)
+    with pytest.raises(requests.Timeout):
+        orm.Collection(root).count
+
+
+def test_hedge(standin, fast_retries):
+    root = standin.add_collection("DAM-2")
+    aid = standin.add_asset("a.jpg", root, b"jpeg")
+    orm.Request.set_policy("asset.get", Policy(timeout=(1, 5), idempotent=True, hedge_percentile=0.9))
+    for _ in range(20):
+        orm.Request.latency.record("asset.get", 0.01)
+
+    standin.inject("asset.get", delay=2)
+    calls = len(standin.calls)
+    rv = orm.Request.post("asset.get", [("id", aid)])
+    check.equal(rv.findtext("asset/name"), "a.jpg")
+    check.equal(standin.calls[calls:], ["asset.get"], "Expecting the hedged call to answer before the slow one")
+    check.less(orm.Request.latency.percentile("asset.get", 0.5), 1)
+
+
+def test_hedge_stream(standin, fast_retries):
+    root = standin.add_collection("DAM-2")
+    for i in range(5):
+        standin.add_asset(f"img{i}.jpg", root, b"jpeg")
+    orm.Request.set_policy("asset.get", Policy(timeout=(1, 5), idempotent=True, hedge_percentile=0.9))
+    for _ in range(20):
+        list(orm.Collection(root).get_assets())
+    check.is_not_none(orm.Request.latency.percentile("asset.get:stream", 0.9), "Expecting streamed calls timed")
+
+    standin.inject("asset.get", delay=1.5)
+    calls = standin.calls.count("asset.get")
+    start = time.monotonic()
+    assets = list(orm.Collection(root).get_assets())
+    check.equal(len(assets), 5)
+    check.less(time.monotonic() - start, 1, "Expecting the hedged call to answer before the slow one")
+    time.sleep(1.5)
+    check.equal(standin.calls.count("asset.get"), calls + 2, "Expecting the slow call to finish too")
+
+
+def test_retry_stream(standin, fast_retries):
+    root = standin.add_collection("DAM-2")
+    for i in range(5):
+        standin.add_asset(f"img{i}.jpg", root, b"jpeg")
+
+    standin.inject("asset.get", truncate=60)
+    assets = list(orm.Collection(root).get_assets())
+    check.equal(len(assets), 5, "Expecting a read cut off before the first asset to be sent again")
+    check.equal(standin.calls.count("asset.get"), 2)
+
+    standin.inject("asset.query", truncate=60, times=4)
+    with pytest.raises(ProtocolError):
+        list(orm.Asset.query_iter(f"asset in collection {root}"))
+    check.equal(standin.faults["asset.query"], [], "Expecting every retry to be used")
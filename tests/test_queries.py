@@ -0,0 +1,22 @@
+import pytest_check as check
+
+from pymediaflux import orm
+from pymediaflux.queries import run_queries
+
+
+def test_run_queries(standin):
+    root = standin.add_collection("DAM-2")
+    for i in range(5):
+        standin.add_asset(f"img{i}.jpg", root, b"jpeg")
+    queries = ["name = 'img1.jpg'", "asset in collection " + root, "name = 'img1.jpg", "name = 'none'"]
+
+    results = run_queries(queries, workers=4, rate=100)
+    check.equal([r.query for r in results], queries, "Expecting results in query order")
+    check.equal([r.count for r in results], [1, 5, None, 0], "Expecting counts and None for the failure")
+    check.equal([r.ok for r in results], [True, True, False, True])
+    check.is_in("Syntax error", results[2].error)
+    check.is_true(all(r.elapsed > 0 for r in results), "Expecting every query to be timed")
+
+    results = run_queries(queries, mode="check")
+    check.equal([r.count for r in results], [1, 1, None, 0], "Expecting check mode to find at most one match")
+    check.equal(orm.Asset.query_count("asset in collection " + root), 5)
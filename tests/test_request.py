@@ -0,0 +1,83 @@
+from email.parser import BytesParser
+from email.policy import HTTP
+import gzip
+
+from lxml import etree
+import pytest
+import pytest_check as check
+
+from pymediaflux import orm
+from pymediaflux.transport import CallableTransport
+
+RESULT = b'<response><reply type="result"><result><version>1</version></result></reply></response>'
+
+
+@pytest.fixture
+def captured(restore):
+    # Calls answered in process, keeping the headers and raw body of each
+    calls = []
+
+    def handler(body, headers):
+        calls.append((headers, body))
+        return 200, RESULT
+
+    orm.Request.url, orm.Request.headers = "http://in-process/__mflux_svc__", {"Content-Type": "application/xml"}
+    orm.Request.transport = CallableTransport(handler)
+    orm.Request.compress_min_size = 1024
+    return calls
+
+
+def test_escape():
+    value = """Tom & Jerry <"cartoons"> 'classic'"""
+    payload = orm.Request.build_request('my."service"', [("where", value), ("size", 10)])
+    request = etree.fromstring(payload)
+
+    check.equal(request.find("service").get("name"), 'my."service"')
+    check.equal(request.findtext("service/args/where"), value)
+    check.equal(request.findtext("service/args/size"), "10")
+    check.is_in(b"Tom &amp; Jerry &lt;", payload)
+
+    where = orm.Filter("mf-dam", "keyword").query_str(value="A & B")
+    args = etree.fromstring(orm.Request.build_request("asset.query", [("where", where)]))
+    check.equal(args.findtext("service/args/where"), where, "Expecting values to be escaped once")
+
+
+def test_reuse():
+    orm.Request.build_request("test.reuse", [("where", "a"), ("size", 1)])
+    service, arg = orm.service_tags.cache_info().hits, orm.arg_tags.cache_info().hits
+    orm.Request.build_request("test.reuse", [("where", "b"), ("size", 2)])
+
+    check.equal(orm.service_tags.cache_info().hits, service + 1)
+    check.equal(orm.arg_tags.cache_info().hits, arg + 2)
+
+
+def test_compress(captured):
+    orm.Request.compress = True
+    small = [("where", "name = 'x'")]
+    large = [("where", " or ".join(f"name = 'img{i}.jpg'" for i in range(200)))]
+
+    orm.Request.post("asset.query", small)
+    orm.Request.post("asset.query", large)
+    orm.Request.compress = False
+    orm.Request.post("asset.query", large)
+
+    (h1, b1), (h2, b2), (h3, b3) = captured
+    check.is_none(h1.get("Content-Encoding"), "Expecting bodies below compress_min_size to be sent as is")
+    check.less(len(b1), orm.Request.compress_min_size)
+    check.equal(h2.get("Content-Encoding"), "gzip")
+    check.equal(gzip.decompress(b2), b3)
+    check.less(len(b2), len(b3))
+    check.is_none(h3.get("Content-Encoding"))
+
+
+def test_multipart_filename(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"jpeg")
+    body = orm.MultipartBody(b"<request/>", str(path), 'a"b\r\nX-Injected: 1.jpg')
+
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {body.content_type}\r\n\r\n".encode() + body.read())
+    parts = list(message.iter_parts())
+    check.equal(len(parts), 3, "Expecting the request, the attachment count and the file")
+    check.equal(parts[2].get_filename(), "a%22b%0D%0AX-Injected: 1.jpg")
+    check.is_none(parts[2].get("X-Injected"), "Expecting no injected header")
+    check.equal(parts[2].get_payload(decode=True), b"jpeg")
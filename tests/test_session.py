@@ -0,0 +1,83 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+import pytest_check as check
+
+from pymediaflux import orm
+
+
+def versions(n: int) -> None:
+    for _ in range(n):
+        orm.Request.post("server.version")
+
+
+def test_session_reuse(standin):
+    versions(20)
+    check.equal(standin.connections, 1, "Expecting repeated posts to share one kept-alive connection")
+
+    threads = [threading.Thread(target=versions, args=(5,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    check.equal(standin.connections, 5, "Expecting one connection per thread")
+    versions(5)
+    check.equal(standin.connections, 5, "Expecting the main thread to keep its connection")
+
+    orm.Request.configure(pool_size=orm.Request.pool_size)
+    versions(2)
+    check.equal(standin.connections, 6, "Expecting configure to rebuild the session")
+
+
+def test_session_fork(standin):
+    versions(2)
+    child = multiprocessing.get_context("fork").Process(target=versions, args=(3,))
+    child.start()
+    child.join(30)
+    check.equal(child.exitcode, 0, "Expecting the forked child's calls to succeed")
+    check.equal(standin.connections, 2, "Expecting the child to open its own connection")
+
+    versions(2)
+    check.equal(standin.connections, 2, "Expecting the parent's connection to survive the fork")
+    check.equal(standin.calls.count("server.version"), 7)
+
+
+@pytest.fixture
+def fresh_workers():
+    # Start without pools or worker sessions left over from other tests
+    orm.Request.shutdown()
+    workers = orm.Request.workers
+    yield
+    orm.Request.configure(workers=workers)
+    orm.Request.shutdown()
+
+
+def test_shared_workers(standin, fresh_workers):
+    root = standin.populate(30, depth=1, fanout=3)
+    orm.Request.configure(workers=2)
+    for _ in range(3):
+        check.equal(sum(1 for _ in orm.Collection(root).get_assets(prefetch=2)), 33)
+        check.equal(sum(1 for _ in orm.Collection(root).walk(max_workers=3)), 123)
+        query = orm.Asset.query_iter(f"asset in collection {root}", page_size=10, lookahead=True)
+        check.equal(sum(1 for _ in query), 123)
+    check.less_equal(standin.connections, 3, "Expecting the worker threads to be reused between calls")
+
+    pool = orm.Request.executor()
+    sessions = set(orm.Request._worker_sessions[pool])
+    check.equal(len(sessions), 2)
+
+    # Replacing the pool closes its sessions once its work is done
+    orm.Request.configure(workers=3)
+    pool.shutdown(wait=True)
+    deadline = time.monotonic() + 5
+    while pool in orm.Request._worker_sessions and time.monotonic() < deadline:
+        time.sleep(0.01)
+    check.is_not_in(pool, orm.Request._worker_sessions)
+    for sess in sessions:
+        check.equal(len(sess.get_adapter(orm.Request.url).poolmanager.pools), 0, "Expecting closed sessions")
+
+    orm.Request.executor().submit(orm.Request.post, "server.version").result()
+    orm.Request.shutdown()
+    check.equal(orm.Request._worker_sessions, {})
@@ -0,0 +1,56 @@
+from collections import Counter
+import copy
+import os
+import pytest_check as check
+
+from pymediaflux import stats
+from pymediaflux.util import MergeDict
+
+
+def test_reduce_tree():
+    partials = [{"n": i, "ids": [i], "ext": Counter({"jpg": i}), "by": {"a": {"n": 1}}} for i in range(7)]
+
+    before = copy.deepcopy(partials)
+    total = stats.reduce_tree(partials)
+    check.equal(partials, before, "Expecting the partials to be left untouched")
+    check.equal(total["n"], 21)
+    check.equal(total["ids"], list(range(7)), "Expecting lists to be concatenated in order")
+    check.equal(total["ext"], {"jpg": 21})
+    check.equal(total["by"], {"a": {"n": 7}})
+
+    left = MergeDict() + partials[0]
+    left + partials[1]
+    check.equal(partials[0]["by"], {"a": {"n": 1}}, "Expecting merges to leave their inputs untouched")
+
+    for n in (1, 2):
+        total = stats.reduce_tree(partials[:n])
+        total + partials[2]
+        check.equal(partials[:n], before[:n], f"Expecting a reduction of {n} to return a copy")
+
+
+def test_collection_stats(standin, tmp_path):
+    root = standin.add_collection("DAM-2")
+    for i in range(3):
+        standin.add_asset(f"img{i}.jpg", root, b"x" * 10)
+    for s in range(3):
+        sub = standin.add_collection(f"Box {s}", root)
+        for i in range(4):
+            standin.add_asset(f"scan{i}.TIF", sub, b"x" * 100)
+        standin.add_asset("notes.pdf", standin.add_collection("Docs", sub), b"x")
+
+    expected = {
+        "count": 18,
+        "size": 1233,
+        "mimetype": {"image/jpeg": 3, "content/unknown": 12, "application/pdf": 3},
+        "extension": {"jpg": 3, "tif": 12, "pdf": 3},
+    }
+    check.equal(stats.collection_stats(root, processes=2), expected)
+    check.equal(stats.collection_stats(root, processes=2, depth=3), expected, "Expecting depth not to matter")
+
+    checkpoint = str(tmp_path / "checkpoint")
+    check.equal(stats.collection_stats(root, processes=2, checkpoint=checkpoint), expected)
+    check.equal(len(os.listdir(checkpoint)), 4, "Expecting a partial result per shard")
+
+    queries = standin.calls.count("asset.query")
+    check.equal(stats.collection_stats(root, processes=2, checkpoint=checkpoint), expected)
+    check.equal(standin.calls.count("asset.query"), queries + 1, "Expecting only the shard listing to be fetched")
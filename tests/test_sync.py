@@ -0,0 +1,107 @@
+import pytest_check as check
+
+from pymediaflux import orm, sync
+
+NAMESPACE = """<namespace name="{ns}"><label>{label}</label></namespace>"""
+
+FILTER = """<filter namespace="{ns}" name="{name}">
+  <description>{description}</description>
+  <arg>
+    <name>year</name>
+    <type><name>integer</name></type>
+  </arg>
+  <query>ctime &gt;= date('01-Jan-[year]')</query>
+</filter>"""
+
+FORM = """<form name="{name}"><label>Project</label></form>"""
+
+
+def write_definitions(root, label="DAM", description="By year"):
+    for ns in ("dam", "warehouse"):
+        (root / f"{ns}.xml").write_text(NAMESPACE.format(ns=ns, label=label))
+        for name in ("by-year", "since"):
+            (root / f"{ns}:{name}.xml").write_text(FILTER.format(ns=ns, name=name, description=description))
+    (root / "project.xml").write_text(FORM.format(name="project"))
+
+
+def test_load_definitions(tmp_path):
+    write_definitions(tmp_path)
+    forms = [d for d in sync.load_definitions(str(tmp_path)) if isinstance(d, orm.Form)]
+    check.equal([(f.name, f.label) for f in forms], [("project", "Project")])
+
+
+def test_sync(standin, tmp_path):
+    write_definitions(tmp_path)
+
+    changes = sync.sync(str(tmp_path), dry_run=True)
+    check.equal(len(changes), 7, "Expecting everything to be created")
+    check.equal(len(standin.definitions["filter"]), 0, "Expecting a dry run to change nothing")
+
+    changes = sync.sync(str(tmp_path))
+    check.equal([str(c) for c in changes if c.error], [], "Expecting no failures")
+    check.equal(len(standin.definitions["filter"]), 4, "Expecting 4 filters")
+
+    creates = standin.calls.count("asset.filter.create")
+    check.equal(sync.sync(str(tmp_path)), [], "Expecting an unchanged tree to need no changes")
+    check.equal(standin.calls.count("asset.filter.create"), creates, "Expecting no filter to be recreated")
+
+    (tmp_path / "dam:since.xml").write_text(FILTER.format(ns="dam", name="since", description="Since"))
+    changes = sync.sync(str(tmp_path))
+    check.equal([str(c) for c in changes], ["update filter dam:since"], "Expecting only the edited filter")
+    check.equal(standin.definitions["filter"][("dam", "since")].findtext("description"), "Since")
+
+
+def test_sync_namespace(standin, tmp_path):
+    write_definitions(tmp_path)
+    sync.sync(str(tmp_path))
+
+    write_definitions(tmp_path, label="Digital assets")
+    (tmp_path / "warehouse.xml").write_text(NAMESPACE.format(ns="warehouse", label="DAM"))
+    changes = sync.sync(str(tmp_path))
+    check.equal(
+        [str(c) for c in changes],
+        ["update namespace dam", "create filter dam:by-year", "create filter dam:since"],
+        "Expecting a replaced namespace to have its filters created again",
+    )
+    check.equal(len(standin.definitions["filter"]), 4, "Expecting 4 filters")
+
+
+def test_sync_prune(standin, tmp_path):
+    write_definitions(tmp_path)
+    sync.sync(str(tmp_path))
+
+    (tmp_path / "dam:since.xml").unlink()
+    check.equal(sync.sync(str(tmp_path)), [], "Expecting filters to be kept without prune")
+    changes = sync.sync(str(tmp_path), prune=True)
+    check.equal([str(c) for c in changes], ["destroy filter dam:since"])
+    check.is_false(("dam", "since") in standin.definitions["filter"], "Expecting the filter to be destroyed")
+
+
+def test_sync_batches(standin, tmp_path):
+    write_definitions(tmp_path)
+    for i in range(5):
+        (tmp_path / f"dam:extra-{i}.xml").write_text(FILTER.format(ns="dam", name=f"extra-{i}", description="Extra"))
+    sync.sync(str(tmp_path))
+
+    (tmp_path / "dam.xml").write_text(NAMESPACE.format(ns="dam", label="Digital assets"))
+    changes = sync.plan(sync.load_definitions(str(tmp_path)))
+    check.equal(len(changes), 8, "Expecting the namespace and its 7 filters")
+    start = len(standin.calls)
+    check.equal(sync.apply(changes, batch_size=3), [])
+
+    expected = ["service.execute", "asset.filter.namespace.destroy", "asset.filter.namespace.create"]
+    expected += ["asset.filter.create"] * 7
+    check.equal(standin.calls[start:], expected, "Expecting the namespace and its filters in one batch")
+    check.equal(len(standin.definitions["filter"]), 9)
+
+
+def test_sync_errors(standin, tmp_path):
+    write_definitions(tmp_path)
+    sync.sync(str(tmp_path))
+
+    # An update of a filter that is gone: the destroy fails though the create succeeds
+    since = next(obj for obj in sync.load_definitions(str(tmp_path)) if obj.cache_key[1:] == ("dam", "since"))
+    del standin.definitions["filter"][("dam", "since")]
+    change = sync.Change("update", since)
+    check.equal(sync.apply([change]), [change], "Expecting a failed destroy to fail the change")
+    check.is_in("No filter dam:since", str(change.error))
@@ -0,0 +1,43 @@
+import zlib
+
+from click.testing import CliRunner
+import pytest_check as check
+
+from pymediaflux import orm, verify
+from pymediaflux.util import crc32_file
+
+
+def test_crc32_file(tmp_path):
+    data = bytes(range(256)) * 1000
+    (tmp_path / "a.bin").write_bytes(data)
+    (tmp_path / "empty.bin").write_bytes(b"")
+
+    check.equal(crc32_file(str(tmp_path / "a.bin")), zlib.crc32(data), "Expecting the CRC32 of the file")
+    check.equal(crc32_file(str(tmp_path / "a.bin"), length=100), zlib.crc32(data[:100]), "Expecting a prefix CRC32")
+    check.equal(crc32_file(str(tmp_path / "empty.bin")), 0, "Expecting 0 for an empty file")
+
+
+def test_local_files(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.jpg").write_bytes(b"a")
+    (tmp_path / "sub" / "b.jpg").write_bytes(b"b")
+
+    check.equal(sorted(verify.local_files(str(tmp_path))), ["a.jpg", "sub/b.jpg"], "Expecting relative paths")
+
+
+def test_no_server_checksum(standin, tmp_path, monkeypatch):
+    root = standin.add_collection("DAM-2")
+    standin.add_asset("a.jpg", root, b"a")
+    standin.assets[standin.add_asset("b.jpg", root, b"b")].content = None
+    (tmp_path / "a.jpg").write_bytes(b"a")
+    (tmp_path / "b.jpg").write_bytes(b"b")
+
+    report = verify.verify(str(tmp_path), orm.Collection(root), match="path", processes=1)
+    check.equal(report.matched, ["a.jpg"])
+    check.equal(report.unchecked, ["b.jpg"], "Expecting assets without a checksum to be reported apart")
+    check.equal(report.mismatched, [])
+
+    monkeypatch.setattr(verify.cli, "connect", lambda: None)
+    result = CliRunner().invoke(verify.main, [root, str(tmp_path), "--match", "path", "--processes", "1"])
+    check.equal(result.exit_code, 0, result.output)
+    check.is_in("NO SERVER CHECKSUM: b.jpg", result.output)
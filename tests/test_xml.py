@@ -0,0 +1,75 @@
+from datetime import datetime
+from lxml import etree
+import pytest
+import pytest_check as check
+
+from pymediaflux import orm
+from pymediaflux.xml import ASSET_SCHEMA, Schema, etree_to_dict, iter_dicts
+
+RESPONSE = b"""<response><reply type="result"><result>
+<asset id="1001" version="2">
+  <name ext="jpg">a.jpg</name>
+  <ctime millisec="1792190916000">16-Oct-2026 22:48:36</ctime>
+  <content><size>42</size><csum base="16">6C156477</csum></content>
+  <meta><mf-name><name>x</name><name>y</name></mf-name></meta>
+</asset>
+<asset id="1002" version="1"><name>b</name></asset>
+</result></reply></response>"""
+
+
+def test_etree_to_dict():
+    asset = etree.fromstring(RESPONSE)[0][0][0]
+
+    check.equal(
+        etree_to_dict(asset),
+        {
+            "name": {"_attributes": {"ext": "jpg"}, "text": "a.jpg"},
+            "ctime": {"_attributes": {"millisec": "1792190916000"}, "text": "16-Oct-2026 22:48:36"},
+            "content": {
+                "size": "42",
+                "csum": {"_attributes": {"base": "16"}, "text": "6C156477"},
+                "text": "",
+            },
+            "meta": {"mf-name": {"name": ["x", "y"], "text": ""}, "text": ""},
+            "_attributes": {"id": "1001", "version": "2"},
+            "text": "\n  ",
+        },
+        "Expecting the output of the original converter",
+    )
+    check.equal(etree_to_dict(etree.fromstring("<a>b</a>")), "b")
+
+
+def test_etree_to_dict_schema():
+    schema = Schema(lists=["csum", "name"], attributes=["id"], types={"@id": int, "size": int})
+    asset = etree.fromstring(RESPONSE)[0][0][0]
+
+    check.equal(
+        etree_to_dict(asset, schema),
+        {
+            "name": ["a.jpg"],
+            "ctime": "16-Oct-2026 22:48:36",
+            "content": {"size": 42, "csum": ["6C156477"]},
+            "meta": {"mf-name": {"name": ["x", "y"]}},
+            "_attributes": {"id": 1001},
+        },
+    )
+    asset = etree_to_dict(etree.fromstring(RESPONSE)[0][0][0], ASSET_SCHEMA)
+    check.equal(asset["ctime"]["text"], datetime(2026, 10, 16, 22, 48, 36))
+    check.equal(asset["content"]["csum"], [{"_attributes": {"base": "16"}, "text": "6C156477"}])
+
+
+def test_iter_dicts():
+    expected = [etree_to_dict(a, ASSET_SCHEMA) for a in etree.fromstring(RESPONSE)[0][0]]
+    check.equal(list(iter_dicts(RESPONSE, schema=ASSET_SCHEMA)), expected)
+
+    with pytest.raises(ValueError, match="Call failed: no such asset"):
+        list(iter_dicts(b'<response><reply type="error"><message>no such asset</message></reply></response>'))
+
+
+def test_post_dicts(standin):
+    root = standin.add_collection("DAM-2")
+    ids = [standin.add_asset(f"img{i}.jpg", root, b"jpeg") for i in range(3)]
+
+    assets = list(orm.Request.post_dicts("asset.get", [("id", id) for id in ids], schema=ASSET_SCHEMA))
+    check.equal([a["_attributes"]["id"] for a in assets], [int(id) for id in ids])
+    check.equal(assets[0]["content"]["size"], 4)